@@ -0,0 +1,99 @@
+import operator
+from collections import Counter
+from functools import partial, reduce
+from django.db import transaction
+from django.db.models import Case, F, PositiveSmallIntegerField, Q, Value, When
+from . import stream
+from .models import Budget, BudgetCategory, BudgetNotification, NotificationCounter
+
+BATCH_SIZE = 1000
+# Expense writes spanning more dates are matched by the range they cover
+MAX_COVERING_DAYS = 4
+
+NOTIFICATION_TYPES = {
+    BudgetCategory.ALERT_THRESHOLD: BudgetNotification.THRESHOLD_REACHED,
+    BudgetCategory.ALERT_EXCEEDED: BudgetNotification.LIMIT_EXCEEDED,
+}
+
+
+def alert_level():
+    """The alert level each category's counters call for, as a database expression"""
+    return Case(
+        When(spent_amount__gte=F('limit'), then=Value(BudgetCategory.ALERT_EXCEEDED)),
+        When(
+            spent_amount__gte=F('limit') * F('alert_threshold') / 100,
+            then=Value(BudgetCategory.ALERT_THRESHOLD)
+        ),
+        default=Value(BudgetCategory.ALERT_NONE),
+        output_field=PositiveSmallIntegerField()
+    )
+
+
+def message(category, level):
+    name = category.get_category_display()
+    if level == BudgetCategory.ALERT_EXCEEDED:
+        return f"{name} spending of {category.spent_amount} exceeded its {category.limit} limit in {category.budget.name}"
+    return (
+        f"{name} spending reached {category.percentage_used:.0f}% of its "
+        f"{category.limit} limit in {category.budget.name}"
+    )
+
+
+def evaluate(categories):
+    """Bring the alert level of ``categories`` (a queryset) up to date
+
+    Only categories whose level changed are read. A rise notifies once,
+    for the highest level reached; a fall (an expense edited or deleted)
+    only lowers the level, so crossing again later notifies again.
+    Notifications are pushed to open streams once the transaction commits.
+    Returns the created notifications.
+    """
+    level = alert_level()
+    with transaction.atomic():
+        changed = list(
+            categories.annotate(level=level).exclude(alert_level=F('level'))
+            .select_related('budget').select_for_update(of=('self',))
+        )
+        notifications = BudgetNotification.objects.bulk_create([
+            BudgetNotification(
+                budget_category=category,
+                notification_type=NOTIFICATION_TYPES[category.level],
+                message=message(category, category.level)
+            )
+            for category in changed
+            if category.level > category.alert_level and category.notification_enabled
+        ], batch_size=BATCH_SIZE)
+        for offset in range(0, len(changed), BATCH_SIZE):
+            BudgetCategory.objects.filter(
+                pk__in=[category.pk for category in changed[offset:offset + BATCH_SIZE]]
+            ).update(alert_level=level)
+        NotificationCounter.add(Counter(
+            notification.budget_category.budget.user_id for notification in notifications
+        ))
+        if notifications:
+            transaction.on_commit(partial(stream.publish, notifications))
+    return notifications
+
+
+def affected(deltas):
+    """Categories whose counters the expense ``deltas`` may have moved
+
+    Like ``spending.apply_deltas``, a few dates are matched against the
+    budgets covering each of them, and more against the budgets
+    overlapping their range.
+    """
+    days = {day for _, _, day in deltas}
+    if len(days) <= MAX_COVERING_DAYS:
+        windows = reduce(operator.or_, (Budget.covering(day, prefix='budget__') for day in days))
+    else:
+        windows = Q(budget__start_date__lte=max(days), budget__end_date__gt=min(days))
+    return BudgetCategory.objects.filter(
+        windows,
+        budget__user_id__in={user_id for user_id, _, _ in deltas},
+        category__in={category for _, category, _ in deltas}
+    )
+
+
+def sweep(today):
+    """Evaluate the categories of every budget whose period holds ``today``"""
+    return evaluate(BudgetCategory.objects.filter(Budget.covering(today, prefix='budget__')))
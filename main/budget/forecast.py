@@ -0,0 +1,143 @@
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from expenses.models import Expenses
+from .models import Budget, BudgetCategory
+
+CENTS = Decimal('0.01')
+PROJECTED_FIELDS = ['projected_spent', 'projected_threshold_date', 'forecasted_on']
+
+
+def _money(value):
+    return Decimal(repr(float(value))).quantize(CENTS)
+
+
+def active_categories(user_ids, today):
+    """Categories of the budgets of ``user_ids`` whose period holds ``today``"""
+    return list(
+        BudgetCategory.objects.filter(
+            Budget.covering(today, prefix='budget__'), budget__user_id__in=user_ids
+        ).select_related('budget').order_by('pk')
+    )
+
+
+def daily_spend(categories, today):
+    """(user_id, category, date, total) rows covering every window of ``categories`` up to ``today``"""
+    # Windows may reach archived expenses; the view's filters reach both tables
+    return Expenses.get_history_model().objects.filter(
+        user_id__in={category.budget.user_id for category in categories},
+        category__in={category.category for category in categories},
+        date__gte=min(category.budget.start_date for category in categories),
+        date__lte=today
+    ).order_by().values_list('user_id', 'category', 'date').annotate(total=Sum('amount'))
+
+
+def project(categories, rows, today):
+    """Burn-rate forecasts for ``categories`` from their users' daily spend ``rows``
+
+    Every day's spend is placed in a (category, day of period) matrix in
+    one pass, whichever budgets the day falls in. Each category is then
+    projected to its end date at its average daily rate so far; the
+    threshold date is the day the running total crossed ``alert_threshold``,
+    or the day it will at that rate, if that falls within the period.
+    """
+    if not categories:
+        return []
+    count = len(categories)
+    keys = {}
+    codes = np.fromiter(
+        (keys.setdefault((c.budget.user_id, c.category), len(keys)) for c in categories),
+        dtype=np.int64, count=count
+    )
+    starts = np.fromiter((c.budget.start_date.toordinal() for c in categories), dtype=np.int64, count=count)
+    ends = np.fromiter((c.budget.end_date.toordinal() for c in categories), dtype=np.int64, count=count)
+    limits = np.fromiter((c.limit for c in categories), dtype=np.float64, count=count)
+    thresholds = limits * np.fromiter((c.alert_threshold for c in categories), dtype=np.float64, count=count) / 100
+    # Days observed so far, today included
+    elapsed = today.toordinal() - starts + 1
+
+    rows = [row for row in rows if (row[0], row[1]) in keys]
+    row_codes = np.fromiter((keys[row[0], row[1]] for row in rows), dtype=np.int64, count=len(rows))
+    row_days = np.fromiter((row[2].toordinal() for row in rows), dtype=np.int64, count=len(rows))
+    row_amounts = np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows))
+
+    # Pair every row with each category sharing its key; overlapping budgets share rows
+    order = np.argsort(codes, kind='stable')
+    low = np.searchsorted(codes[order], row_codes, side='left')
+    matches = np.searchsorted(codes[order], row_codes, side='right') - low
+    pair_rows = np.repeat(np.arange(len(rows)), matches)
+    firsts = np.repeat(np.cumsum(matches) - matches, matches)
+    pair_categories = order[low[pair_rows] + np.arange(len(pair_rows)) - firsts]
+    offsets = row_days[pair_rows] - starts[pair_categories]
+    inside = (offsets >= 0) & (offsets < elapsed[pair_categories])
+
+    daily = np.zeros((count, int(elapsed.max())))
+    np.add.at(daily, (pair_categories[inside], offsets[inside]), row_amounts[pair_rows[inside]])
+    running = np.cumsum(daily, axis=1)
+    spent = running[:, -1]
+    rates = spent / elapsed
+    projected = spent + rates * (ends - today.toordinal() - 1)
+
+    reached = running >= thresholds[:, None]
+    crossed = reached[:, -1]
+    crossing = np.where(crossed, starts + np.argmax(reached, axis=1), 0)
+    ahead = ~crossed & (rates > 0)
+    crossing[ahead] = today.toordinal() + np.ceil(
+        (thresholds[ahead] - spent[ahead]) / rates[ahead]
+    ).astype(np.int64)
+    crossing[ahead & (crossing >= ends)] = 0
+
+    return [
+        {
+            'id': category.pk,
+            'budget': category.budget_id,
+            'category': category.category,
+            'limit': category.limit,
+            'end_date': category.budget.end_date,
+            'spent': _money(spent[index]),
+            'daily_rate': _money(rates[index]),
+            'projected_spent': _money(projected[index]),
+            'projected_overrun': max(_money(projected[index] - limits[index]), Decimal('0.00')),
+            'threshold_date': date.fromordinal(int(crossing[index])) if crossing[index] else None,
+        }
+        for index, category in enumerate(categories)
+    ]
+
+
+def for_users(user_ids, today=None):
+    """Forecasts for every active category of ``user_ids`` from two queries"""
+    today = today or date.today()
+    categories = active_categories(user_ids, today)
+    if not categories:
+        return [], []
+    return categories, project(categories, daily_spend(categories, today), today)
+
+
+def store(categories, forecasts, today):
+    """Save ``forecasts`` on their ``categories`` with one bulk update"""
+    for category, forecast in zip(categories, forecasts):
+        category.projected_spent = forecast['projected_spent']
+        category.projected_threshold_date = forecast['threshold_date']
+        category.forecasted_on = today
+    with transaction.atomic():
+        BudgetCategory.objects.bulk_update(categories, PROJECTED_FIELDS, batch_size=1000)
+    return len(categories)
+
+
+def forecast_all(today=None, chunk_size=500):
+    """Forecast and store every user's active categories, ``chunk_size`` users per batch
+
+    Returns the number of categories forecast and of users covered.
+    """
+    today = today or date.today()
+    user_ids = list(
+        Budget.objects.filter(Budget.covering(today))
+        .order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+    stored = 0
+    for offset in range(0, len(user_ids), chunk_size):
+        categories, forecasts = for_users(user_ids[offset:offset + chunk_size], today)
+        stored += store(categories, forecasts, today)
+    return stored, len(user_ids)
@@ -0,0 +1,20 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from budget.alerts import sweep
+
+
+class Command(BaseCommand):
+    help = "Notify on every budget category of an active budget that crossed its alert threshold or limit"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=date.fromisoformat,
+            help="Evaluate budgets whose period holds this date (YYYY-MM-DD, default today)"
+        )
+
+    def handle(self, *args, **options):
+        notifications = sweep(options['date'] or date.today())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(notifications)} notifications"
+        ))
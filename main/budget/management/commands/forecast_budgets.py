@@ -0,0 +1,28 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from budget.forecast import forecast_all
+
+
+class Command(BaseCommand):
+    help = "Project end-of-period spending for the categories of every active budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=date.fromisoformat,
+            help="Forecast as of this date (YYYY-MM-DD, default today)"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help="Users forecast together from one query"
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError("--chunk-size must be a positive number")
+        stored, users = forecast_all(today=options['date'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {stored} budget categories for {users} users"
+        ))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from budget.models import BudgetNotification
+
+
+class Command(BaseCommand):
+    help = "Delete old budget notifications in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help="Delete read notifications older than this many days"
+        )
+        parser.add_argument(
+            '--unread-days',
+            type=int,
+            help="Also delete unread notifications older than this many days"
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0 or (options['unread_days'] is not None and options['unread_days'] <= 0):
+            raise CommandError("--days and --unread-days must be positive numbers")
+        now = timezone.now()
+        deleted = BudgetNotification.purge(
+            now - timedelta(days=options['days']), batch_size=options['batch_size']
+        )
+        if options['unread_days'] is not None:
+            deleted += BudgetNotification.purge(
+                now - timedelta(days=options['unread_days']),
+                include_unread=True,
+                batch_size=options['batch_size']
+            )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} notifications"))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from budget.models import Budget
+from budget.spending import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the spent counters of every budget category against the expenses, "
+        "and with --fix overwrite the ones that disagree (also backfills new counters)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Overwrite mismatched counters")
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help="Budgets checked together from one query"
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError("--chunk-size must be a positive number")
+
+        checked = mismatched = 0
+        last_pk = 0
+        while True:
+            # Walk the budgets in primary key order so memory stays flat
+            budgets = list(
+                Budget.objects.filter(pk__gt=last_pk).order_by('pk')
+                .prefetch_related('categories')[:options['chunk_size']]
+            )
+            if not budgets:
+                break
+            last_pk = budgets[-1].pk
+            for category, stored, actual in reconcile(budgets, fix=options['fix']):
+                mismatched += 1
+                self.stdout.write(
+                    f"Budget {category.budget_id} {category.category}: "
+                    f"stored {stored[0]} ({stored[1]}), actual {actual[0]} ({actual[1]})"
+                )
+            checked += len(budgets)
+
+        action = "Fixed" if options['fix'] else "Found"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {mismatched} mismatched categories in {checked} budgets"
+        ))
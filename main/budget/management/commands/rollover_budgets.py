@@ -0,0 +1,38 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from budget.rollover import roll_over_all
+
+
+class Command(BaseCommand):
+    help = "Start the next period of every rollover-enabled budget whose period has ended"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=date.fromisoformat,
+            help="Roll over budgets ended by this date (YYYY-MM-DD, default today)"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help="Users rolled over together"
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="Processes to spread the chunks over"
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0 or options['workers'] <= 0:
+            raise CommandError("--chunk-size and --workers must be positive numbers")
+        created, users = roll_over_all(
+            today=options['date'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} budgets for {users} users"
+        ))
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budget", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budget",
+            name="rolled_over_from",
+            field=models.OneToOneField(
+                blank=True,
+                help_text="Budget of the previous period this one was rolled over from",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="rolled_over_to",
+                to="budget.budget",
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:54
+
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.db import migrations, models
+from budget import spending
+
+PERIOD_LENGTHS = {
+    "WEEKLY": relativedelta(weeks=1),
+    "MONTHLY": relativedelta(months=1),
+    "QUARTERLY": relativedelta(months=3),
+    "ANNUALLY": relativedelta(years=1),
+}
+
+
+def count_spent(apps, schema_editor):
+    Budget = apps.get_model("budget", "Budget")
+    BudgetCategory = apps.get_model("budget", "BudgetCategory")
+    Expenses = apps.get_model("expenses", "Expenses")
+    budgets = list(Budget.objects.only("user_id", "start_date", "period"))
+    # end_date is only stored from 0007 on
+    for budget in budgets:
+        budget.end_date = budget.start_date + PERIOD_LENGTHS.get(
+            budget.period, PERIOD_LENGTHS["ANNUALLY"]
+        )
+    spent = spending.spent_by_category(budgets, expenses=Expenses)
+    categories = spending.recount(
+        BudgetCategory.objects.only("budget_id", "category"), spent
+    )
+    BudgetCategory.objects.bulk_update(
+        categories, ["spent_amount", "spent_count"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budget", "0002_budget_rolled_over_from"),
+        ("expenses", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budgetcategory",
+            name="spent_amount",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal("0"),
+                editable=False,
+                help_text="Total of the user's expenses in this category within the budget period",
+                max_digits=12,
+            ),
+        ),
+        migrations.AddField(
+            model_name="budgetcategory",
+            name="spent_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_spent, migrations.RunPython.noop),
+    ]
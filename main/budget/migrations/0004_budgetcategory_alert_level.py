@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budget", "0003_budgetcategory_spent_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budgetcategory",
+            name="alert_level",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (0, "Below threshold"),
+                    (1, "Threshold reached"),
+                    (2, "Limit exceeded"),
+                ],
+                default=0,
+                editable=False,
+            ),
+        ),
+    ]
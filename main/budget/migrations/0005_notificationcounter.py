@@ -0,0 +1,63 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_unread(apps, schema_editor):
+    BudgetNotification = apps.get_model("budget", "BudgetNotification")
+    NotificationCounter = apps.get_model("budget", "NotificationCounter")
+    unread = (
+        BudgetNotification.objects.filter(read=False)
+        .values("budget_category__budget__user")
+        .annotate(total=Count("pk"))
+    )
+    NotificationCounter.objects.bulk_create(
+        [
+            NotificationCounter(
+                user_id=row["budget_category__budget__user"], unread_count=row["total"]
+            )
+            for row in unread
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("budget", "0004_budgetcategory_alert_level"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationCounter",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="notification_counter",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("unread_count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="budgetnotification",
+            name="budget_category",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="notifications",
+                to="budget.budgetcategory",
+            ),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budget", "0005_notificationcounter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budgetcategory",
+            name="forecasted_on",
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="budgetcategory",
+            name="projected_spent",
+            field=models.DecimalField(
+                decimal_places=2,
+                editable=False,
+                help_text="Spending projected for the end of the period at the current daily rate",
+                max_digits=12,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="budgetcategory",
+            name="projected_threshold_date",
+            field=models.DateField(
+                editable=False,
+                help_text="Day the alert threshold was or is projected to be crossed",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:40
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations, models
+
+PERIOD_LENGTHS = {
+    "WEEKLY": relativedelta(weeks=1),
+    "MONTHLY": relativedelta(months=1),
+    "QUARTERLY": relativedelta(months=3),
+    "ANNUALLY": relativedelta(years=1),
+}
+
+
+def fill_end_dates(apps, schema_editor):
+    Budget = apps.get_model("budget", "Budget")
+    budgets = list(Budget.objects.only("start_date", "period"))
+    for budget in budgets:
+        budget.end_date = budget.start_date + PERIOD_LENGTHS.get(
+            budget.period, PERIOD_LENGTHS["ANNUALLY"]
+        )
+    Budget.objects.bulk_update(budgets, ["end_date"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budget", "0006_budgetcategory_forecast"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budget",
+            name="end_date",
+            field=models.DateField(null=True, editable=False),
+        ),
+        migrations.RunPython(fill_end_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="budget",
+            name="end_date",
+            field=models.DateField(
+                editable=False, help_text="First day after the budget period"
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="budget",
+            name="budget_budg_user_id_b2e1d1_idx",
+        ),
+        migrations.AddIndex(
+            model_name="budget",
+            index=models.Index(
+                fields=["user", "start_date", "end_date"],
+                name="budget_budg_user_id_e80fb0_idx",
+            ),
+        ),
+    ]
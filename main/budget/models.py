@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -6,6 +8,8 @@ from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 from django.core.exceptions import ValidationError
 from expenses.models import Expenses
+
+
 class Budget(models.Model):
     PERIOD_CHOICES = [
         ('WEEKLY', 'Weekly'),
@@ -14,6 +18,13 @@ class Budget(models.Model):
         ('ANNUALLY', 'Annually'),
     ]
 
+    PERIOD_LENGTHS = {
+        'WEEKLY': relativedelta(weeks=1),
+        'MONTHLY': relativedelta(months=1),
+        'QUARTERLY': relativedelta(months=3),
+        'ANNUALLY': relativedelta(years=1),
+    }
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
     name = models.CharField(max_length=100)
     period = models.CharField(
@@ -22,6 +33,11 @@ class Budget(models.Model):
         default='MONTHLY'
     )
     start_date = models.DateField()
+    # Kept in step with start_date and period by save(), so windows can be matched in SQL
+    end_date = models.DateField(
+        editable=False,
+        help_text="First day after the budget period"
+    )
     total_limit = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -32,50 +48,101 @@ class Budget(models.Model):
         default=False,
         help_text="Enable rolling over unused budget to next period"
     )
+    rolled_over_from = models.OneToOneField(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='rolled_over_to',
+        help_text="Budget of the previous period this one was rolled over from"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-start_date', 'name']
         indexes = [
-            models.Index(fields=['user', 'start_date']),
+            models.Index(fields=['user', 'start_date', 'end_date']),
             models.Index(fields=['user', 'period']),
         ]
 
     def __str__(self):
         return f"{self.name} - {self.period} ({self.start_date})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded window so a change can recount the category counters
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.end_date = self.get_end_date()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'start_date', 'period'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'end_date'}
+        super().save(*args, **kwargs)
+
     def get_end_date(self):
-        if self.period == 'WEEKLY':
-            return self.start_date + relativedelta(weeks=1)
-        elif self.period == 'MONTHLY':
-            return self.start_date + relativedelta(months=1)
-        elif self.period == 'QUARTERLY':
-            return self.start_date + relativedelta(months=3)
-        else:  # ANNUALLY
-            return self.start_date + relativedelta(years=1)
+        return self.start_date + self.PERIOD_LENGTHS.get(self.period, self.PERIOD_LENGTHS['ANNUALLY'])
+
+    @classmethod
+    def covering(cls, day, prefix=''):
+        """Q matching budgets whose window holds ``day``; ``prefix`` reaches them through a relation"""
+        return Q(**{f'{prefix}start_date__lte': day, f'{prefix}end_date__gt': day})
 
     def get_next_period_start_date(self):
         return self.get_end_date()
 
+    def lineage(self, periods=None):
+        """Pks of the rollover chain through this budget, oldest period first
+
+        The user's (pk, rolled_over_from) links are read in one query and
+        walked in both directions; with ``periods`` only the latest are kept.
+        """
+        links = dict(
+            Budget.objects.filter(user_id=self.user_id)
+            .order_by().values_list('pk', 'rolled_over_from_id')
+        )
+        successors = {previous: pk for pk, previous in links.items() if previous is not None}
+        chain = [self.pk]
+        while links.get(chain[0]) is not None:
+            chain.insert(0, links[chain[0]])
+        while chain[-1] in successors:
+            chain.append(successors[chain[-1]])
+        return chain[-periods:] if periods else chain
+
+    @property
+    def total_spent(self):
+        return sum((category.spent_amount for category in self.categories.all()), Decimal('0'))
+
+    @property
+    def remaining_budget(self):
+        return self.total_limit - self.total_spent
+
     def get_budget_status(self):
         """Calculate current budget status including spending and remaining amounts"""
-        end_date = self.get_end_date()
-        total_spent = self.categories.aggregate(
-            spent=models.Sum('expenses__amount')
-        )['spent'] or Decimal('0')
-        
-        remaining = self.total_limit - total_spent
+        total_spent = self.total_spent
         percentage_used = (total_spent / self.total_limit * 100) if total_spent > 0 else 0
-        
+
         return {
             'total_limit': self.total_limit,
             'total_spent': total_spent,
-            'remaining': remaining,
+            'remaining': self.total_limit - total_spent,
             'percentage_used': percentage_used
         }
 
 class BudgetCategory(models.Model):
+    ALERT_NONE = 0
+    ALERT_THRESHOLD = 1
+    ALERT_EXCEEDED = 2
+
+    ALERT_LEVEL_CHOICES = [
+        (ALERT_NONE, 'Below threshold'),
+        (ALERT_THRESHOLD, 'Threshold reached'),
+        (ALERT_EXCEEDED, 'Limit exceeded'),
+    ]
+
     budget = models.ForeignKey(
         Budget,
         on_delete=models.CASCADE,
@@ -99,6 +166,35 @@ class BudgetCategory(models.Model):
         help_text="Percentage at which to trigger an alert"
     )
     notification_enabled = models.BooleanField(default=True)
+    # Maintained from Expenses writes by budget.signals
+    spent_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0'),
+        editable=False,
+        help_text="Total of the user's expenses in this category within the budget period"
+    )
+    spent_count = models.IntegerField(default=0, editable=False)
+    # Highest alert level already evaluated, so each crossing notifies once
+    alert_level = models.PositiveSmallIntegerField(
+        choices=ALERT_LEVEL_CHOICES,
+        default=ALERT_NONE,
+        editable=False
+    )
+    # Written by the nightly budget.forecast run
+    projected_spent = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        editable=False,
+        help_text="Spending projected for the end of the period at the current daily rate"
+    )
+    projected_threshold_date = models.DateField(
+        null=True,
+        editable=False,
+        help_text="Day the alert threshold was or is projected to be crossed"
+    )
+    forecasted_on = models.DateField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -115,25 +211,29 @@ class BudgetCategory(models.Model):
                 'limit': 'Category limit cannot exceed total budget limit'
             })
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @property
+    def remaining_amount(self):
+        return self.limit - self.spent_amount
+
+    @property
+    def percentage_used(self):
+        return (self.spent_amount / self.limit * 100) if self.spent_amount > 0 else 0
+
     def get_status(self):
         """Calculate current category status including spending and alerts"""
-        end_date = self.budget.get_end_date()
-        total_spent = Expenses.objects.filter(
-            user=self.budget.user,
-            category=self.category,
-            date__range=[self.budget.start_date, end_date]
-        ).aggregate(spent=models.Sum('amount'))['spent'] or Decimal('0')
-        
-        remaining = self.limit - total_spent
-        percentage_used = (total_spent / self.limit * 100) if total_spent > 0 else 0
-        alert_triggered = percentage_used >= self.alert_threshold
-        
+        percentage_used = self.percentage_used
         return {
             'limit': self.limit,
-            'spent': total_spent,
-            'remaining': remaining,
+            'spent': self.spent_amount,
+            'remaining': self.remaining_amount,
             'percentage_used': percentage_used,
-            'alert_triggered': alert_triggered
+            'alert_triggered': percentage_used >= self.alert_threshold
         }
 
 class BudgetNotification(models.Model):
@@ -150,7 +250,9 @@ class BudgetNotification(models.Model):
     budget_category = models.ForeignKey(
         BudgetCategory,
         on_delete=models.CASCADE,
-        related_name='notifications'
+        related_name='notifications',
+        # Both composite indexes below lead with the category
+        db_index=False
     )
     notification_type = models.CharField(
         max_length=20,
@@ -168,4 +270,93 @@ class BudgetNotification(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.get_notification_type_display()} - {self.created_at}"
\ No newline at end of file
+        return f"{self.get_notification_type_display()} - {self.created_at}"
+
+    @classmethod
+    def for_user(cls, user):
+        """The user's notifications, reached through the (budget_category, created_at) index"""
+        return cls.objects.filter(
+            budget_category__in=BudgetCategory.objects.filter(budget__user=user).values('pk')
+        )
+
+    @classmethod
+    def purge(cls, before, include_unread=False, batch_size=1000):
+        """Delete notifications created before ``before`` in batches, returning the count
+
+        Read notifications go first; unread ones only with ``include_unread``,
+        after which the affected users' unread counters are recounted.
+        """
+        old = cls.objects.filter(created_at__lt=before)
+        if not include_unread:
+            old = old.filter(read=True)
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    old.order_by('pk')
+                    .values_list('pk', 'read', 'budget_category__budget__user_id')[:batch_size]
+                )
+                if not batch:
+                    return deleted
+                cls.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+                NotificationCounter.recount({user_id for _, read, user_id in batch if not read})
+            deleted += len(batch)
+
+
+class NotificationCounter(models.Model):
+    """Unread BudgetNotification count per user, kept current on every write"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_counter'
+    )
+    unread_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - {self.unread_count} unread"
+
+    @classmethod
+    def get_unread_count(cls, user):
+        return cls.objects.filter(user=user).values_list('unread_count', flat=True).first() or 0
+
+    @classmethod
+    def _update_creating(cls, user_ids, **values):
+        """UPDATE the counters of ``user_ids``, first creating any that are missing
+
+        Counter rows exist for every user who ever had a notification, so
+        the common case is the single UPDATE.
+        """
+        updated = cls.objects.filter(user_id__in=user_ids).update(**values)
+        if updated < len(user_ids):
+            existing = set(cls.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+            missing = [cls(user_id=user_id) for user_id in user_ids if user_id not in existing]
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            cls.objects.filter(user_id__in=[counter.user_id for counter in missing]).update(**values)
+
+    @classmethod
+    def add(cls, counts):
+        """Add ``counts`` ({user_id: change}) to the users' counters"""
+        counts = {user_id: count for user_id, count in counts.items() if count}
+        if not counts:
+            return
+        change = Case(
+            *[When(user_id=user_id, then=Value(count)) for user_id, count in counts.items()],
+            output_field=models.IntegerField()
+        )
+        if all(count < 0 for count in counts.values()):
+            # Only increments can reach a user without a counter row yet
+            cls.objects.filter(user_id__in=counts).update(unread_count=F('unread_count') + change)
+        else:
+            cls._update_creating(set(counts), unread_count=F('unread_count') + change)
+
+    @classmethod
+    def recount(cls, user_ids):
+        """Reset the counters of ``user_ids`` from their unread notifications"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        unread = BudgetNotification.objects.filter(
+            budget_category__budget__user=OuterRef('user'), read=False
+        ).order_by().values('budget_category__budget__user').annotate(total=Count('pk')).values('total')
+        cls._update_creating(user_ids, unread_count=Coalesce(Subquery(unread), 0))
@@ -0,0 +1,124 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal
+import django
+from django.db import IntegrityError, transaction
+from . import alerts, spending
+from .models import Budget, BudgetCategory
+
+MIN_LIMIT = Decimal('0.01')
+
+
+def candidates(today):
+    """Rollover-enabled budgets that have no successor and ended by ``today``"""
+    return Budget.objects.filter(
+        rollover_enabled=True,
+        rolled_over_to__isnull=True,
+        end_date__lte=today
+    )
+
+
+def due(user_ids=None, today=None):
+    """Budgets of ``user_ids`` (everyone's if None) whose period ended by ``today``"""
+    today = today or date.today()
+    budgets = candidates(today).prefetch_related('categories')
+    if user_ids is not None:
+        budgets = budgets.filter(user_id__in=user_ids)
+    return list(budgets)
+
+
+def next_limit(category):
+    """The category's limit plus what was left unspent, never below MIN_LIMIT"""
+    return max(category.limit + category.remaining_amount, MIN_LIMIT)
+
+
+def roll_over(budgets):
+    """Create the next period of each of ``budgets``, returning the new budgets
+
+    Limits grow by the maintained spent counters, the new periods' counters
+    are priced for all budgets in one query, and the new rows are written
+    with one bulk insert per model before their alert levels are evaluated.
+    A budget that already has a successor violates the unique
+    ``rolled_over_from`` link, so a concurrent or repeated run fails instead
+    of creating a second period.
+    """
+    budgets = list(budgets)
+    if not budgets:
+        return []
+    with transaction.atomic():
+        successors = Budget.objects.bulk_create([
+            Budget(
+                user_id=budget.user_id,
+                name=budget.name,
+                period=budget.period,
+                start_date=budget.end_date,
+                # bulk_create skips save(), which derives the end date
+                end_date=budget.end_date + Budget.PERIOD_LENGTHS[budget.period],
+                total_limit=budget.total_limit,
+                rollover_enabled=budget.rollover_enabled,
+                rolled_over_from=budget
+            )
+            for budget in budgets
+        ])
+        # Nor does it send the signal that counts a new category's spending
+        BudgetCategory.objects.bulk_create(spending.recount([
+            BudgetCategory(
+                budget=successor,
+                category=category.category,
+                limit=next_limit(category),
+                alert_threshold=category.alert_threshold,
+                notification_enabled=category.notification_enabled
+            )
+            for budget, successor in zip(budgets, successors)
+            for category in budget.categories.all()
+        ], spending.spent_by_category(successors)))
+        alerts.evaluate(BudgetCategory.objects.filter(budget__in=successors))
+    return successors
+
+
+def roll_over_users(user_ids=None, today=None):
+    """Roll over the due budgets of ``user_ids`` until none is left, returning the count
+
+    A budget several periods behind gains one period per pass, and each
+    pass prices and inserts its budgets set-wise. A pass that collides
+    with a concurrent run is rolled back and the budgets still due are
+    selected again; the same budgets colliding twice is a real error.
+    """
+    created = 0
+    conflicted = None
+    while True:
+        budgets = due(user_ids, today)
+        if not budgets:
+            return created
+        try:
+            created += len(roll_over(budgets))
+        except IntegrityError:
+            pks = {budget.pk for budget in budgets}
+            if pks == conflicted:
+                raise
+            conflicted = pks
+
+
+def roll_over_all(today=None, chunk_size=500, workers=1):
+    """Roll over every user's due budgets, ``chunk_size`` users per task
+
+    With more than one worker the chunks are spread over a pool of
+    spawned processes, which set Django up afresh and open their own
+    database connections instead of inheriting the parent's.
+    """
+    today = today or date.today()
+    user_ids = list(
+        candidates(today).order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+    chunks = [user_ids[offset:offset + chunk_size] for offset in range(0, len(user_ids), chunk_size)]
+    if workers <= 1:
+        return sum(roll_over_users(chunk, today) for chunk in chunks), len(user_ids)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup
+    ) as pool:
+        created = sum(pool.map(roll_over_users, chunks, [today] * len(chunks)))
+    return created, len(user_ids)
@@ -1,29 +1,37 @@
 from rest_framework import serializers
 from .models import Budget, BudgetCategory, BudgetNotification
-from django.db.models import Sum
+from django.db.models import Sum, prefetch_related_objects
 from decimal import Decimal
 
 class BudgetCategorySerializer(serializers.ModelSerializer):
-    spent_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     remaining_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     percentage_used = serializers.FloatField(read_only=True)
     
     class Meta:
         model = BudgetCategory
         fields = [
-            'id', 'category', 'limit', 'alert_threshold', 
-            'notification_enabled', 'spent_amount', 
-            'remaining_amount', 'percentage_used'
+            'id', 'budget', 'category', 'limit', 'alert_threshold', 
+            'notification_enabled', 'spent_amount', 'spent_count',
+            'remaining_amount', 'percentage_used', 'projected_spent',
+            'projected_threshold_date', 'forecasted_on'
         ]
         read_only_fields = ['id']
 
-    def validate_limit(self, value):
-        budget = self.context['budget']
-        if value > budget.total_limit:
-            raise serializers.ValidationError(
-                "Category limit cannot exceed total budget limit"
-            )
-        return value
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None:
+            # Categories can only be added to the requesting user's budgets
+            fields['budget'].queryset = Budget.objects.filter(user=request.user)
+        return fields
+
+    def validate(self, data):
+        budget = data.get('budget') or self.context.get('budget') or self.instance.budget
+        if data.get('limit', getattr(self.instance, 'limit', None)) > budget.total_limit:
+            raise serializers.ValidationError({
+                'limit': "Category limit cannot exceed total budget limit"
+            })
+        return data
 
 class BudgetSerializer(serializers.ModelSerializer):
     categories = BudgetCategorySerializer(many=True, read_only=True)
@@ -37,11 +45,16 @@ class BudgetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Budget
         fields = [
-            'id', 'name', 'period', 'start_date', 'total_limit',
+            'id', 'name', 'period', 'start_date', 'end_date', 'total_limit',
             'rollover_enabled', 'categories', 'total_spent',
             'remaining_budget', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'end_date', 'created_at', 'updated_at']
+
+    def to_representation(self, instance):
+        # The totals and the nested categories all read the same category rows
+        prefetch_related_objects([instance], 'categories')
+        return super().to_representation(instance)
 
     def validate(self, data):
         # Ensure total_limit is greater than sum of existing category limits
@@ -0,0 +1,79 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from expenses.models import Expenses
+from expenses.signals import expenses_bulk_created, previous_values
+from . import alerts, spending
+from .models import Budget, BudgetCategory
+
+WINDOW_FIELDS = ('start_date', 'period')
+# Category fields the spent counters depend on
+COUNTED_FIELDS = ('budget_id', 'category')
+# Category fields the alert level depends on
+LEVEL_FIELDS = (*COUNTED_FIELDS, 'limit', 'alert_threshold')
+
+
+def _loaded(instance, field):
+    return getattr(instance, '_loaded_values', {}).get(field, getattr(instance, field))
+
+
+def _apply(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if deltas:
+        spending.apply_deltas(deltas)
+        alerts.evaluate(alerts.affected(deltas))
+
+
+@receiver(post_save, sender=Expenses)
+def update_spent_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = spending.collect_deltas([instance])
+    previous = previous_values(instance)
+    if previous is not None:
+        spending.collect_deltas([previous], sign=-1, deltas=deltas)
+    _apply(deltas)
+
+
+@receiver(post_delete, sender=Expenses)
+def update_spent_on_delete(sender, instance, **kwargs):
+    row = {field: _loaded(instance, field) for field in ('user_id', 'category', 'date', 'amount')}
+    _apply(spending.collect_deltas([row], sign=-1))
+
+
+@receiver(expenses_bulk_created, sender=Expenses)
+def update_spent_on_bulk_create(sender, instances, **kwargs):
+    _apply(spending.collect_deltas(instances))
+
+
+@receiver(pre_save, sender=BudgetCategory)
+def count_spent_for_new_category(sender, instance, raw=False, **kwargs):
+    # A new category, or one moved to another budget or expense category, starts from the expenses
+    if raw:
+        return
+    if instance._state.adding or any(
+        getattr(instance, field) != _loaded(instance, field) for field in COUNTED_FIELDS
+    ):
+        spending.recount([instance])
+    instance._level_changed = instance._state.adding or any(
+        getattr(instance, field) != _loaded(instance, field) for field in LEVEL_FIELDS
+    )
+    instance._loaded_values = {field: getattr(instance, field) for field in LEVEL_FIELDS}
+
+
+@receiver(post_save, sender=BudgetCategory)
+def evaluate_alert_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and getattr(instance, '_level_changed', False):
+        alerts.evaluate(BudgetCategory.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Budget)
+def recount_spent_on_window_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created and any(
+        getattr(instance, field) != _loaded(instance, field) for field in WINDOW_FIELDS
+    ):
+        categories = spending.recount(instance.categories.all())
+        BudgetCategory.objects.bulk_update(categories, ['spent_amount', 'spent_count'])
+        alerts.evaluate(instance.categories.all())
+    instance._loaded_values = {field: getattr(instance, field) for field in WINDOW_FIELDS}
@@ -0,0 +1,195 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from expenses.models import Expenses
+from . import alerts
+from .models import Budget, BudgetCategory
+
+ZERO = Decimal('0')
+# Every budget adds two filtered aggregate columns to the grouped query
+BUDGETS_PER_QUERY = 100
+# Expense writes touching more (user, category, date) keys are matched in one pass
+MAX_KEYED_UPDATES = 4
+
+
+def spent_by_category(budgets, expenses=None):
+    """{(budget_id, category): (spent, count)} for every category of ``budgets``
+
+    Each budget's window becomes a SUM and COUNT filtered on its user and
+    dates, and the user's expenses are grouped by category once, so any
+    number of budgets and categories costs one query (per
+    BUDGETS_PER_QUERY budgets). Windows are half open: an expense on a
+    budget's end date belongs to the next period, which starts on that date.
+    ``expenses`` is the model summed over, for migrations running against
+    historical models.
+    """
+    budgets = list(budgets)
+    # Budget windows may reach archived expenses; the view's filters reach both tables
+    history = expenses or Expenses.get_history_model()
+    spent = {}
+    for offset in range(0, len(budgets), BUDGETS_PER_QUERY):
+        windows = {
+            budget.pk: (budget.user_id, budget.start_date, budget.end_date)
+            for budget in budgets[offset:offset + BUDGETS_PER_QUERY]
+        }
+        columns = {}
+        for pk, (user_id, start, end) in windows.items():
+            within = Q(user_id=user_id, date__gte=start, date__lt=end)
+            columns[f'spent_{pk}'] = Sum('amount', filter=within)
+            columns[f'count_{pk}'] = Count('id', filter=within)
+        rows = history.objects.filter(
+            user_id__in={user_id for user_id, _, _ in windows.values()},
+            date__gte=min(start for _, start, _ in windows.values()),
+            date__lt=max(end for _, _, end in windows.values())
+        ).order_by().values('category').annotate(**columns)
+        for row in rows:
+            for pk in windows:
+                if row[f'count_{pk}']:
+                    spent[pk, row['category']] = (row[f'spent_{pk}'], row[f'count_{pk}'])
+    return spent
+
+
+def recount(categories, spent=None):
+    """Set the spent counters of ``categories`` from the expenses, without saving"""
+    categories = list(categories)
+    if spent is None:
+        spent = spent_by_category({category.budget for category in categories})
+    for category in categories:
+        category.spent_amount, category.spent_count = spent.get(
+            (category.budget_id, category.category), (ZERO, 0)
+        )
+    return categories
+
+
+def reconcile(budgets, fix=False):
+    """Categories of ``budgets`` whose counters disagree with the expenses
+
+    Returns (category, stored, actual) triples, where stored and actual are
+    (spent, count) pairs. With ``fix`` the counters are overwritten and the
+    alert level of every category of ``budgets`` is brought up to date, so
+    backfilled counters don't leave stale levels behind.
+    """
+    budgets = list(budgets)
+    spent = spent_by_category(budgets)
+    mismatched = []
+    for budget in budgets:
+        for category in budget.categories.all():
+            stored = (category.spent_amount, category.spent_count)
+            actual = spent.get((budget.pk, category.category), (ZERO, 0))
+            if stored != actual:
+                mismatched.append((category, stored, actual))
+    if fix:
+        for category, _, actual in mismatched:
+            category.spent_amount, category.spent_count = actual
+        with transaction.atomic():
+            if mismatched:
+                BudgetCategory.objects.bulk_update(
+                    [category for category, _, _ in mismatched], ['spent_amount', 'spent_count']
+                )
+            alerts.evaluate(BudgetCategory.objects.filter(budget__in=budgets))
+    return mismatched
+
+
+def collect_deltas(rows, sign=1, deltas=None):
+    """Fold expense rows (dicts or instances) into {(user_id, category, date): [amount, count]}"""
+    deltas = {} if deltas is None else deltas
+    for row in rows:
+        if not isinstance(row, dict):
+            row = {'user_id': row.user_id, 'category': row.category, 'date': row.date, 'amount': row.amount}
+        delta = deltas.setdefault((row['user_id'], row['category'], row['date']), [ZERO, 0])
+        delta[0] += sign * Decimal(row['amount'])
+        delta[1] += sign
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Add expense deltas to the categories of every budget whose window holds their date
+
+    A few keys are applied with one UPDATE each; more are matched against
+    the stored windows of the users' budgets and applied with a single UPDATE. Either
+    way the counters only ever move by F() increments.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    if len(deltas) <= MAX_KEYED_UPDATES:
+        for (user_id, category, day), (amount, count) in deltas.items():
+            BudgetCategory.objects.filter(
+                Budget.covering(day, prefix='budget__'),
+                budget__user_id=user_id,
+                category=category
+            ).update(
+                spent_amount=F('spent_amount') + amount,
+                spent_count=F('spent_count') + count
+            )
+        return
+
+    by_category = {}
+    for (user_id, category, day), delta in deltas.items():
+        by_category.setdefault((user_id, category), []).append((day, delta))
+    days = [day for _, _, day in deltas]
+    totals = {}
+    with transaction.atomic():
+        candidates = BudgetCategory.objects.filter(
+            budget__user_id__in={user_id for user_id, _, _ in deltas},
+            category__in={category for _, category, _ in deltas},
+            budget__start_date__lte=max(days),
+            budget__end_date__gt=min(days)
+        ).values_list('pk', 'budget__user_id', 'category', 'budget__start_date', 'budget__end_date')
+        for pk, user_id, category, start, end in candidates:
+            for day, (amount, count) in by_category.get((user_id, category), ()):
+                if start <= day < end:
+                    total = totals.setdefault(pk, [ZERO, 0])
+                    total[0] += amount
+                    total[1] += count
+        if not totals:
+            return
+        BudgetCategory.objects.filter(pk__in=totals).update(
+            spent_amount=F('spent_amount') + Case(
+                *[When(pk=pk, then=Value(amount)) for pk, (amount, _) in totals.items()],
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+            spent_count=F('spent_count') + Case(
+                *[When(pk=pk, then=Value(count)) for pk, (_, count) in totals.items()],
+                output_field=IntegerField()
+            )
+        )
+
+
+def period_history(budgets):
+    """Budget-vs-actual rows for ``budgets``, one per budget with its categories
+
+    Spending is read from the expenses with spent_by_category, so any
+    number of periods costs one query. Spending in categories the budget
+    sets no limit for is reported as ``unbudgeted_spent``.
+    """
+    budgets = list(budgets)
+    spent = spent_by_category(budgets)
+    periods = []
+    for budget in budgets:
+        limits = {category.category: category.limit for category in budget.categories.all()}
+        categories = []
+        for category, limit in limits.items():
+            amount, count = spent.get((budget.pk, category), (ZERO, 0))
+            categories.append({
+                'category': category,
+                'limit': limit,
+                'spent': amount,
+                'count': count,
+                'variance': limit - amount,
+            })
+        total = sum((row['spent'] for row in categories), ZERO)
+        periods.append({
+            'id': budget.pk,
+            'start_date': budget.start_date,
+            'end_date': budget.end_date,
+            'total_limit': budget.total_limit,
+            'spent': total,
+            'variance': budget.total_limit - total,
+            'unbudgeted_spent': sum((
+                amount for (pk, category), (amount, _) in spent.items()
+                if pk == budget.pk and category not in limits
+            ), ZERO),
+            'categories': categories,
+        })
+    return periods
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import math
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import Token
+from main.pubsub import get_broker
+from .models import BudgetNotification
+from .serializer import BudgetNotificationSerializer
+
+KEEPALIVE_SECONDS = 15
+MAX_POLL_SECONDS = 60
+
+
+class StreamToken(Token):
+    """Short-lived JWT that only opens notification streams
+
+    EventSource cannot send an Authorization header, so browsers pass this
+    token in the query string, where it may end up in access logs; it is
+    good for nothing else and expires a minute after it is issued.
+    """
+    token_type = 'stream'
+    lifetime = timedelta(minutes=1)
+
+
+def channel(user_id):
+    return f'budget-notifications:{user_id}'
+
+
+def publish(notifications):
+    """Push new notifications to their users' open streams
+
+    Call after the transaction that created them commits. Each notification
+    needs its budget_category and budget loaded.
+    """
+    broker = get_broker()
+    for notification in notifications:
+        broker.publish(
+            channel(notification.budget_category.budget.user_id),
+            BudgetNotificationSerializer(notification).data
+        )
+
+
+def _authenticate(request):
+    """The user of ``request``'s stream token, or the one the API's authentication classes find, or None"""
+    if 'token' in request.GET:
+        try:
+            return JWTAuthentication().get_user(StreamToken(request.GET['token']))
+        except (TokenError, AuthenticationFailed):
+            return None
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        user = Request(request, authenticators=authenticators).user
+    except AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+
+def _missed(user, last_id):
+    return list(
+        BudgetNotification.for_user(user).filter(pk__gt=last_id).order_by('pk')
+    )
+
+
+def _event(data):
+    return f"id: {data['id']}\nevent: notification\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def notification_stream(request):
+    """Server-Sent Events stream of the user's new budget notifications
+
+    Browsers authenticate with ?token=, a StreamToken from the
+    notifications' stream-token action; other clients may send the API's
+    usual credentials. Clients that reconnect with a Last-Event-ID header
+    (or ?last_event_id=) first receive what they missed. ?poll=<seconds>
+    turns the request into a long poll, of at most MAX_POLL_SECONDS, that
+    answers with a JSON list as soon as anything arrives.
+    An open connection waits on the in-process broker and does not touch
+    the database; serve it through main.asgi so it holds no worker thread.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=401
+        )
+    last_id = request.headers.get('Last-Event-ID', request.GET.get('last_event_id'))
+    try:
+        last_id = None if last_id is None else int(last_id)
+        poll = float(request.GET['poll']) if 'poll' in request.GET else None
+    except ValueError:
+        return JsonResponse({'detail': 'last_event_id and poll must be numbers.'}, status=400)
+    if poll is not None:
+        if not math.isfinite(poll) or poll <= 0:
+            return JsonResponse({'detail': 'poll must be a positive number of seconds.'}, status=400)
+        poll = min(poll, MAX_POLL_SECONDS)
+
+    if poll is not None:
+        async with get_broker().subscribe(channel(user.pk)) as queue:
+            missed = [] if last_id is None else await sync_to_async(_missed)(user, last_id)
+            if missed:
+                return JsonResponse(BudgetNotificationSerializer(missed, many=True).data, safe=False)
+            try:
+                data = await asyncio.wait_for(queue.get(), poll)
+            except asyncio.TimeoutError:
+                return JsonResponse([], safe=False)
+            return JsonResponse([data], safe=False)
+
+    async def events():
+        # Subscribe before replaying so nothing created in between is lost
+        async with get_broker().subscribe(channel(user.pk)) as queue:
+            seen = last_id or 0
+            if last_id is not None:
+                for notification in await sync_to_async(_missed)(user, last_id):
+                    seen = notification.pk
+                    yield _event(BudgetNotificationSerializer(notification).data)
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if data['id'] > seen:
+                    yield _event(data)
+
+    return StreamingHttpResponse(
+        events(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
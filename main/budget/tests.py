@@ -1,3 +1,691 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from expenses.models import Expenses
+from expenses.tests import seed_expenses
+from main.pubsub import SocketBroker, get_broker
+from main.testing import QueryBudgetTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from . import alerts, forecast, rollover, spending, stream
+from .models import Budget, BudgetCategory, BudgetNotification, NotificationCounter
 
-# Create your tests here.
+CATEGORIES = [code for code, _ in Expenses.CATEGORY_CHOICES]
+
+
+def seed_budgets(user, months=6):
+    """One monthly budget per month with a limit for every expense category"""
+    first = date.today().replace(day=1)
+    budgets = Budget.objects.bulk_create([
+        Budget(
+            user=user,
+            name='Household',
+            period='MONTHLY',
+            start_date=first - relativedelta(months=offset),
+            end_date=first - relativedelta(months=offset - 1),
+            total_limit=Decimal('5000.00'),
+            rollover_enabled=True
+        )
+        for offset in range(months)
+    ])
+    categories = BudgetCategory.objects.bulk_create(spending.recount(
+        [
+            BudgetCategory(budget=budget, category=category, limit=Decimal('400.00'))
+            for budget in budgets
+            for category in CATEGORIES
+        ],
+        spending.spent_by_category(budgets)
+    ))
+    BudgetNotification.objects.bulk_create([
+        BudgetNotification(
+            budget_category=category,
+            notification_type=BudgetNotification.THRESHOLD_REACHED,
+            message=f'{category.category} passed {category.alert_threshold}%'
+        )
+        for category in categories[::3]
+    ])
+    NotificationCounter.recount([user.pk])
+    return budgets
+
+
+class BudgetQueryTestCase(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='x')
+        cls.other = User.objects.create_user('other', password='x')
+        seed_expenses(cls.user, count=400, days=200)
+        seed_expenses(cls.other, count=100, days=200, seed=2)
+        cls.budgets = seed_budgets(cls.user)
+        seed_budgets(cls.other, months=2)
+        cls.budget = cls.budgets[0]
+        cls.category = cls.budget.categories.get(category=Expenses.FOOD)
+        cls.notification = BudgetNotification.objects.filter(
+            budget_category__budget__user=cls.user
+        ).first()
+
+
+@override_settings(ROOT_URLCONF='budget.urls')
+class BudgetViewSetQueryTests(BudgetQueryTestCase):
+
+    def test_list(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/budgets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Budget, ['user', 'start_date'])
+
+    def test_retrieve(self):
+        with self.assertMaxQueries(3):
+            response = self.client.get(f'/budgets/{self.budget.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_create(self):
+        with self.assertMaxQueries(2):
+            response = self.client.post('/budgets/', {
+                'name': 'Travel',
+                'period': 'QUARTERLY',
+                'start_date': date.today().isoformat(),
+                'total_limit': '1200.00',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_update(self):
+        with self.assertMaxQueries(5):
+            response = self.client.patch(
+                f'/budgets/{self.budget.pk}/', {'total_limit': '6000.00'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_destroy(self):
+        # One more for unlinking the budget's rolled-over successor, one for the unread counter
+        with self.assertMaxQueries(8):
+            response = self.client.delete(f'/budgets/{self.budget.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_status(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get(f'/budgets/{self.budget.pk}/status/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_rollover(self):
+        # The new period's categories are evaluated for alerts: one more read
+        with self.assertMaxQueries(7):
+            response = self.client.post(f'/budgets/{self.budget.pk}/rollover/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['categories']), len(CATEGORIES))
+        response = self.client.post(f'/budgets/{self.budget.pk}/rollover/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_history(self):
+        # Chain the seeded months as if each had been rolled over into the next
+        for budget, previous in zip(self.budgets, self.budgets[1:]):
+            Budget.objects.filter(pk=budget.pk).update(rolled_over_from=previous)
+        # The budget, the chain links, the periods and their categories, then one spending query
+        with self.assertMaxQueries(6):
+            response = self.client.get(f'/budgets/{self.budgets[2].pk}/history/')
+        self.assertEqual(response.status_code, 200)
+        periods = response.data['periods']
+        self.assertEqual([period['id'] for period in periods], [budget.pk for budget in reversed(self.budgets)])
+        for period in periods:
+            spent = dict(
+                Expenses.objects.filter(
+                    user=self.user, date__gte=period['start_date'], date__lt=period['end_date']
+                ).values_list('category').annotate(total=Sum('amount'))
+            )
+            for row in period['categories']:
+                self.assertEqual(row['spent'], spent.get(row['category'], Decimal('0')))
+                self.assertEqual(row['variance'], row['limit'] - row['spent'])
+            self.assertEqual(period['spent'] + period['unbudgeted_spent'], sum(spent.values()))
+
+        response = self.client.get(f'/budgets/{self.budgets[2].pk}/history/', {'periods': 2})
+        self.assertEqual([period['id'] for period in response.data['periods']], [b.pk for b in self.budgets[1::-1]])
+        response = self.client.get(f'/budgets/{self.budgets[2].pk}/history/', {'periods': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_covering_is_one_indexed_range_query(self):
+        day = date.today() - relativedelta(months=1)
+        with self.assertNumQueries(1) as captured:
+            budgets = list(Budget.objects.filter(Budget.covering(day), user=self.user))
+        self.assertEqual(budgets, [
+            budget for budget in Budget.objects.filter(user=self.user)
+            if budget.start_date <= day < budget.get_end_date()
+        ])
+        self.assertEqual(len(budgets), 1)
+        self.assertUsesIndex(captured, Budget, ['user', 'start_date', 'end_date'])
+
+    def test_forecast(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get('/budgets/forecast/')
+        self.assertEqual(response.status_code, 200)
+        # Only the current month's budget is still running
+        current = self.budgets[0]
+        self.assertEqual({row['budget'] for row in response.data['forecasts']}, {current.pk})
+        spent = dict(
+            Expenses.objects.filter(
+                user=self.user, date__gte=current.start_date, date__lte=date.today()
+            ).values_list('category').annotate(total=Sum('amount'))
+        )
+        for row in response.data['forecasts']:
+            self.assertEqual(row['spent'], spent.get(row['category'], Decimal('0.00')))
+            self.assertGreaterEqual(row['projected_spent'], row['spent'])
+
+
+@override_settings(ROOT_URLCONF='budget.urls')
+class BudgetCategoryViewSetQueryTests(BudgetQueryTestCase):
+
+    def test_list(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get('/categories/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get(f'/categories/{self.category.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_create(self):
+        BudgetCategory.objects.filter(budget=self.budget, category=Expenses.TRAVEL).delete()
+        # Includes counting the category's spending so far and checking its alert level
+        with self.assertMaxQueries(5):
+            response = self.client.post('/categories/', {
+                'budget': self.budget.pk,
+                'category': Expenses.TRAVEL,
+                'limit': '250.00',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_update(self):
+        with self.assertMaxQueries(6):
+            response = self.client.patch(
+                f'/categories/{self.category.pk}/', {'alert_threshold': '90.00'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_destroy(self):
+        with self.assertMaxQueries(5):
+            response = self.client.delete(f'/categories/{self.category.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_status(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(f'/categories/{self.category.pk}/status/')
+        self.assertEqual(response.status_code, 200)
+
+
+class SpendingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{n}', password='x') for n in range(2)]
+        for n, user in enumerate(cls.users):
+            seed_expenses(user, count=300, days=200, seed=n)
+            seed_budgets(user)
+        # A quarter overlapping the monthly budgets
+        Budget.objects.create(
+            user=cls.users[0], name='Quarter', period='QUARTERLY',
+            start_date=date.today().replace(day=1) - relativedelta(months=2),
+            total_limit=Decimal('9000.00')
+        ).categories.create(category=Expenses.FOOD, limit=Decimal('900.00'))
+
+    def test_matches_per_category_sums(self):
+        budgets = list(Budget.objects.all())
+        with self.assertNumQueries(1):
+            spent = spending.spent_by_category(budgets)
+        for category in BudgetCategory.objects.select_related('budget'):
+            budget = category.budget
+            expected = Expenses.objects.filter(
+                user_id=budget.user_id,
+                category=category.category,
+                date__gte=budget.start_date,
+                date__lt=budget.get_end_date()
+            ).aggregate(spent=Sum('amount'))['spent'] or Decimal('0')
+            self.assertEqual(spent.get((budget.pk, category.category), (0, 0))[0], expected)
+
+    def assertCountersMatch(self):
+        self.assertEqual(
+            spending.reconcile(Budget.objects.prefetch_related('categories')), []
+        )
+
+    def test_counters_follow_expense_writes(self):
+        self.assertCountersMatch()
+        user = self.users[0]
+        today = date.today()
+        expense = Expenses.objects.create(
+            user=user, amount=Decimal('42.00'), category=Expenses.FOOD,
+            payment_method=Expenses.CASH, date=today
+        )
+        self.assertCountersMatch()
+        # Move it to another category and into last month
+        expense.category = Expenses.TRAVEL
+        expense.date = today.replace(day=1) - relativedelta(days=1)
+        expense.amount = Decimal('18.25')
+        expense.save()
+        self.assertCountersMatch()
+        Expenses.objects.get(pk=expense.pk).delete()
+        self.assertCountersMatch()
+        seed_expenses(user, count=50, days=120, seed=9)
+        self.assertCountersMatch()
+
+    def test_window_change_recounts(self):
+        budget = Budget.objects.filter(user=self.users[1]).first()
+        budget.start_date -= relativedelta(months=1)
+        budget.period = 'QUARTERLY'
+        budget.save(update_fields=['start_date', 'period'])
+        budget.refresh_from_db()
+        self.assertEqual(budget.end_date, budget.start_date + relativedelta(months=3))
+        self.assertCountersMatch()
+
+    def test_moved_category_recounts(self):
+        quarter = Budget.objects.get(name='Quarter')
+        category = BudgetCategory.objects.filter(
+            budget__user=self.users[0], budget__period='MONTHLY'
+        ).exclude(category=Expenses.FOOD).first()
+        category.budget = quarter
+        category.save()
+        self.assertCountersMatch()
+
+    def test_reconcile_command_fixes_drift(self):
+        BudgetCategory.objects.filter(category=Expenses.FOOD).update(spent_amount=0, spent_count=0)
+        out = StringIO()
+        call_command('reconcile_budget_spending', fix=True, chunk_size=4, stdout=out)
+        self.assertIn('Fixed', out.getvalue())
+        self.assertCountersMatch()
+
+
+class RolloverTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{n}', password='x') for n in range(3)]
+        for n, user in enumerate(cls.users):
+            seed_expenses(user, count=200, days=200, seed=n)
+            seed_budgets(user, months=4)
+
+    def test_command_catches_up_and_is_idempotent(self):
+        call_command('rollover_budgets', chunk_size=2, stdout=StringIO())
+        self.assertEqual(rollover.due(), [])
+        # Each of the three ended months gains successors up to the current one
+        self.assertEqual(Budget.objects.filter(rolled_over_from__isnull=False).count(), 3 * 6)
+        count = Budget.objects.count()
+        call_command('rollover_budgets', stdout=StringIO())
+        self.assertEqual(Budget.objects.count(), count)
+
+    def test_concurrent_run_is_retried(self):
+        user_ids = [self.users[1].pk]
+        selected = rollover.due(user_ids)
+        # Another run rolls one of them over after this one selected them
+        rollover.roll_over(selected[:1])
+        selections = iter([selected])
+        due = rollover.due
+        with patch.object(rollover, 'due', side_effect=lambda *args: next(selections, None) or due(*args)):
+            rollover.roll_over_users(user_ids)
+        self.assertEqual(rollover.due(user_ids), [])
+        self.assertEqual(
+            Budget.objects.filter(user_id__in=user_ids, rolled_over_from__isnull=False).count(), 6
+        )
+
+    def test_limits_carry_unspent_amounts(self):
+        budgets = rollover.due([self.users[0].pk])
+        # Pricing the new periods and two inserts, plus the savepoint pair; then
+        # evaluating their alerts, which for this seed notifies three categories
+        # (read, notification insert, level update, counter update, savepoint pair)
+        with self.assertNumQueries(11):
+            successors = rollover.roll_over(budgets)
+        for budget, successor in zip(budgets, successors):
+            limits = dict(successor.categories.values_list('category', 'limit'))
+            for category in budget.categories.all():
+                self.assertEqual(limits[category.category], rollover.next_limit(category))
+        self.assertEqual(
+            spending.reconcile(Budget.objects.filter(pk__in=[s.pk for s in successors])), []
+        )
+
+
+class ForecastTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('forecaster', password='x')
+        cls.start = date(2024, 3, 4)
+        cls.week = Budget.objects.create(
+            user=cls.user, name='Week', period='WEEKLY', start_date=cls.start,
+            total_limit=Decimal('500.00')
+        )
+        cls.week.categories.create(category=Expenses.FOOD, limit=Decimal('100.00'))
+        cls.week.categories.create(category=Expenses.TRANSPORTATION, limit=Decimal('50.00'))
+        # Overlaps the week, so its FOOD category reads the same days
+        cls.month = Budget.objects.create(
+            user=cls.user, name='Month', period='MONTHLY', start_date=date(2024, 3, 1),
+            total_limit=Decimal('2000.00')
+        )
+        cls.month.categories.create(category=Expenses.FOOD, limit=Decimal('500.00'))
+        for offset, category, amount in [
+            (-1, Expenses.FOOD, '7.00'),
+            (0, Expenses.FOOD, '20.00'),
+            (1, Expenses.FOOD, '12.50'),
+            (1, Expenses.FOOD, '7.50'),
+            (2, Expenses.FOOD, '20.00'),
+            (0, Expenses.TRANSPORTATION, '45.00'),
+            # After the forecast date
+            (5, Expenses.FOOD, '90.00'),
+        ]:
+            Expenses.objects.create(
+                user=cls.user, amount=Decimal(amount), category=category,
+                payment_method=Expenses.CASH, date=cls.start + timedelta(days=offset)
+            )
+
+    def forecasts(self):
+        with self.assertNumQueries(2):
+            _, forecasts = forecast.for_users([self.user.pk], self.start + timedelta(days=3))
+        return {(row['budget'], row['category']): row for row in forecasts}
+
+    def test_projects_at_the_daily_rate(self):
+        forecasts = self.forecasts()
+        food = forecasts[self.week.pk, Expenses.FOOD]
+        # 60.00 over four days, three days left
+        self.assertEqual(food['spent'], Decimal('60.00'))
+        self.assertEqual(food['daily_rate'], Decimal('15.00'))
+        self.assertEqual(food['projected_spent'], Decimal('105.00'))
+        self.assertEqual(food['projected_overrun'], Decimal('5.00'))
+        # 20.00 short of the 80% threshold at 15.00 a day
+        self.assertEqual(food['threshold_date'], self.start + timedelta(days=5))
+
+        transport = forecasts[self.week.pk, Expenses.TRANSPORTATION]
+        self.assertEqual(transport['projected_spent'], Decimal('78.75'))
+        self.assertEqual(transport['threshold_date'], self.start)
+
+        monthly = forecasts[self.month.pk, Expenses.FOOD]
+        self.assertEqual(monthly['spent'], Decimal('67.00'))
+        self.assertEqual(monthly['projected_overrun'], Decimal('0.00'))
+        self.assertIsNone(monthly['threshold_date'])
+
+    def test_nightly_command_stores_forecasts(self):
+        call_command(
+            'forecast_budgets', date=self.start + timedelta(days=3), chunk_size=1, stdout=StringIO()
+        )
+        food = self.week.categories.get(category=Expenses.FOOD)
+        self.assertEqual(food.projected_spent, Decimal('105.00'))
+        self.assertEqual(food.projected_threshold_date, self.start + timedelta(days=5))
+        self.assertEqual(food.forecasted_on, self.start + timedelta(days=3))
+
+
+class AlertTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alerted', password='x')
+        cls.budget = Budget.objects.create(
+            user=cls.user, name='Food', period='MONTHLY',
+            start_date=date.today().replace(day=1), total_limit=Decimal('1000.00')
+        )
+        cls.category = cls.budget.categories.create(
+            category=Expenses.FOOD, limit=Decimal('100.00'), alert_threshold=Decimal('80.00')
+        )
+
+    def spend(self, amount):
+        return Expenses.objects.create(
+            user=self.user, amount=Decimal(amount), category=Expenses.FOOD,
+            payment_method=Expenses.CASH, date=date.today()
+        )
+
+    def notifications(self):
+        return list(self.category.notifications.order_by('pk').values_list('notification_type', flat=True))
+
+    def test_notifies_once_per_crossing(self):
+        self.spend('50.00')
+        self.assertEqual(self.notifications(), [])
+        self.spend('35.00')
+        self.spend('5.00')
+        self.assertEqual(self.notifications(), [BudgetNotification.THRESHOLD_REACHED])
+        expense = self.spend('20.00')
+        self.assertEqual(self.notifications(), [
+            BudgetNotification.THRESHOLD_REACHED, BudgetNotification.LIMIT_EXCEEDED
+        ])
+        # Dropping back below the limit and crossing it again notifies again
+        expense.delete()
+        self.spend('30.00')
+        self.assertEqual(self.notifications()[-1], BudgetNotification.LIMIT_EXCEEDED)
+        self.assertEqual(len(self.notifications()), 3)
+
+    def test_disabled_category_tracks_level_silently(self):
+        BudgetCategory.objects.filter(pk=self.category.pk).update(notification_enabled=False)
+        self.spend('150.00')
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.alert_level, BudgetCategory.ALERT_EXCEEDED)
+        self.assertEqual(self.notifications(), [])
+
+    def test_affected_is_limited_to_covering_budgets(self):
+        last_month = Budget.objects.create(
+            user=self.user, name='Food', period='MONTHLY',
+            start_date=self.budget.start_date - relativedelta(months=1), total_limit=Decimal('1000.00')
+        ).categories.create(category=Expenses.FOOD, limit=Decimal('100.00'))
+        today = date.today()
+        self.assertEqual(
+            list(alerts.affected({(self.user.pk, Expenses.FOOD, today): None})), [self.category]
+        )
+        # Enough dates to be matched by their range still leave last month out
+        days = [self.budget.start_date + timedelta(days=n) for n in range(alerts.MAX_COVERING_DAYS + 1)]
+        deltas = {(self.user.pk, Expenses.FOOD, day): None for day in days}
+        self.assertEqual(list(alerts.affected(deltas)), [self.category])
+        deltas = {(self.user.pk, Expenses.FOOD, day): None for day in (last_month.budget.start_date, today)}
+        self.assertEqual(set(alerts.affected(deltas)), {self.category, last_month})
+
+    def test_reconcile_fix_evaluates_levels(self):
+        self.spend('150.00')
+        # A backfill: counters and level as a freshly added column would leave them
+        BudgetCategory.objects.filter(pk=self.category.pk).update(
+            spent_amount=0, spent_count=0, alert_level=BudgetCategory.ALERT_NONE
+        )
+        spending.reconcile(Budget.objects.prefetch_related('categories'), fix=True)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.spent_amount, Decimal('150.00'))
+        self.assertEqual(self.category.alert_level, BudgetCategory.ALERT_EXCEEDED)
+
+    def test_sweep_is_set_based_and_idempotent(self):
+        for user in [User.objects.create_user(f'sweep{n}', password='x') for n in range(3)]:
+            seed_expenses(user, count=100, days=60, seed=user.pk)
+            seed_budgets(user, months=2)
+        # Inserts skipped the write-time evaluation, so the sweep finds every crossing
+        with self.assertNumQueries(6):
+            notifications = alerts.sweep(date.today())
+        self.assertTrue(notifications)
+        self.assertEqual(alerts.sweep(date.today()), [])
+        self.assertEqual(
+            NotificationCounter.get_unread_count(user),
+            BudgetNotification.for_user(user).filter(read=False).count()
+        )
+
+
+@override_settings(ROOT_URLCONF='budget.urls')
+class BudgetNotificationViewSetQueryTests(BudgetQueryTestCase):
+
+    def unread(self):
+        return BudgetNotification.objects.filter(budget_category__budget__user=self.user, read=False).count()
+
+    def test_list(self):
+        with self.assertMaxQueries(1) as captured:
+            response = self.client.get('/notifications/', {'page_size': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertUsesIndex(captured, BudgetNotification, ['budget_category'])
+
+    def test_list_pages_cover_everything(self):
+        seen = []
+        response = self.client.get('/notifications/', {'page_size': 7})
+        seen += [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            with self.assertMaxQueries(1):
+                response = self.client.get(response.data['next'])
+            seen += [row['id'] for row in response.data['results']]
+        self.assertEqual(
+            sorted(seen),
+            sorted(BudgetNotification.objects.filter(
+                budget_category__budget__user=self.user
+            ).values_list('pk', flat=True))
+        )
+
+    def test_retrieve(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(f'/notifications/{self.notification.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unread_count(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get('/notifications/unread_count/')
+        self.assertEqual(response.data['unread_count'], self.unread())
+
+    def test_stream_token(self):
+        with self.assertMaxQueries(0):
+            response = self.client.post('/notifications/stream-token/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expires_in'], 60)
+
+    def test_mark_read(self):
+        with self.assertMaxQueries(2):
+            response = self.client.post(f'/notifications/{self.notification.pk}/mark_read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), self.unread())
+        # Marking it again leaves the counter alone
+        response = self.client.post(f'/notifications/{self.notification.pk}/mark_read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), self.unread())
+
+    def test_mark_read_of_another_user(self):
+        other = BudgetNotification.objects.filter(budget_category__budget__user=self.other).first()
+        response = self.client.post(f'/notifications/{other.pk}/mark_read/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_mark_all_read(self):
+        with self.assertMaxQueries(2):
+            response = self.client.post('/notifications/mark_all_read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), 0)
+
+    def test_destroying_a_budget_recounts(self):
+        self.client.delete(f'/budgets/{self.budget.pk}/')
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), self.unread())
+
+    def test_purge(self):
+        pks = list(BudgetNotification.for_user(self.user).order_by('pk').values_list('pk', flat=True))
+        BudgetNotification.objects.filter(pk__in=pks[:10]).update(
+            created_at=timezone.now() - timedelta(days=120)
+        )
+        for pk in pks[:4]:
+            self.client.post(f'/notifications/{pk}/mark_read/')
+        call_command('purge_budget_notifications', batch_size=3, stdout=StringIO())
+        self.assertFalse(BudgetNotification.objects.filter(pk__in=pks[:4]).exists())
+        self.assertEqual(BudgetNotification.objects.filter(pk__in=pks).count(), len(pks) - 4)
+        call_command('purge_budget_notifications', unread_days=60, batch_size=3, stdout=StringIO())
+        self.assertEqual(BudgetNotification.objects.filter(pk__in=pks).count(), len(pks) - 10)
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), len(pks) - 10)
+
+
+@override_settings(ROOT_URLCONF='budget.urls')
+class NotificationStreamTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('listener', password='x')
+        cls.budget = Budget.objects.create(
+            user=cls.user, name='Food', period='MONTHLY',
+            start_date=date.today().replace(day=1), total_limit=Decimal('1000.00')
+        )
+        cls.category = cls.budget.categories.create(category=Expenses.FOOD, limit=Decimal('100.00'))
+        cls.notification = BudgetNotification.objects.create(
+            budget_category=cls.category,
+            notification_type=BudgetNotification.THRESHOLD_REACHED,
+            message='Food passed 80%'
+        )
+
+    def auth(self, **headers):
+        # The stream runs the API's authentication classes, which take JWT bearer tokens
+        return {'Authorization': f'Bearer {AccessToken.for_user(self.user)}', **headers}
+
+    async def test_replays_missed_then_streams_new(self):
+        response = await self.async_client.get(
+            '/notifications/stream/', headers=self.auth(**{'Last-Event-ID': str(self.notification.pk - 1)})
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        replayed = await asyncio.wait_for(anext(events), 5)
+        self.assertIn(f'id: {self.notification.pk}\n'.encode(), replayed)
+
+        pushed = {'id': self.notification.pk + 1, 'message': 'Food exceeded its limit'}
+        # Published from another thread, as a sync view or signal receiver would
+        await sync_to_async(get_broker().publish, thread_sensitive=False)(
+            stream.channel(self.user.pk), pushed
+        )
+        event = await asyncio.wait_for(anext(events), 5)
+        self.assertIn(b'Food exceeded its limit', event)
+        # Closing the bytes wrapper leaves the view's generator suspended; close it
+        # while this test's event loop still runs so its subscription is released
+        await events.aclose()
+        await response._iterator.aclose()
+
+    async def test_long_poll_times_out_empty(self):
+        response = await self.async_client.get(
+            '/notifications/stream/', {'poll': '0.05'}, headers=self.auth()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [])
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+        # A session login is not one of the API's authentication methods
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_query_string_takes_stream_tokens_only(self):
+        response = await self.async_client.post('/notifications/stream-token/', headers=self.auth())
+        token = json.loads(response.content)['token']
+        response = await self.async_client.get('/notifications/stream/', {'poll': '0.05', 'token': token})
+        self.assertEqual(response.status_code, 200)
+        # Access tokens stay out of URLs, and stream tokens expire quickly
+        access = AccessToken.for_user(self.user)
+        expired = stream.StreamToken.for_user(self.user)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        for token in (access, expired):
+            response = await self.async_client.get('/notifications/stream/', {'poll': '0.05', 'token': str(token)})
+            self.assertEqual(response.status_code, 401)
+
+    async def test_poll_must_be_a_positive_number(self):
+        for poll in ('0', '-1', 'nan', 'inf', 'soon'):
+            with self.subTest(poll=poll):
+                response = await self.async_client.get(
+                    '/notifications/stream/', {'poll': poll}, headers=self.auth()
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_alerts_publish_after_commit(self):
+        with patch.object(stream, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                Expenses.objects.create(
+                    user=self.user, amount=Decimal('95.00'), category=Expenses.FOOD,
+                    payment_method=Expenses.CASH, date=date.today()
+                )
+        (notifications,), _ = publish.call_args
+        self.assertEqual(notifications[0].notification_type, BudgetNotification.THRESHOLD_REACHED)
+
+
+class SocketBrokerTests(SimpleTestCase):
+
+    async def test_relays_between_brokers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Two brokers stand in for two worker processes
+            publisher, subscriber = SocketBroker(directory), SocketBroker(directory)
+            async with subscriber.subscribe('budget-notifications:1') as queue:
+                publisher.publish('budget-notifications:1', {'id': 1})
+                self.assertEqual(await asyncio.wait_for(queue.get(), 5), {'id': 1})
+            subscriber._transport.close()
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import stream, views
 
 router = DefaultRouter()
 router.register(r'budgets', views.BudgetViewSet, basename='budget')
@@ -8,5 +8,7 @@ router.register(r'categories', views.BudgetCategoryViewSet, basename='budgetcate
 router.register(r'notifications', views.BudgetNotificationViewSet, basename='budgetnotification')
 
 urlpatterns = [
+    # Ahead of the router, whose notification detail route would match "stream"
+    path('notifications/stream/', stream.notification_stream, name='budgetnotification-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
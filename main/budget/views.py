@@ -1,9 +1,13 @@
+from datetime import date
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum, F
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import Budget, BudgetCategory, BudgetNotification
+from . import forecast, rollover, spending
+from .stream import StreamToken
+from main.pagination import KeysetPagination
+from .models import Budget, BudgetCategory, BudgetNotification, NotificationCounter
 from .serializer import (
     BudgetSerializer, BudgetCategorySerializer,
     BudgetNotificationSerializer
@@ -16,14 +20,17 @@ class BudgetViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Budget.objects.filter(user=self.request.user).prefetch_related(
             'categories'
-        ).annotate(
-            total_spent=Sum('categories__expenses__amount'),
-            remaining_budget=F('total_limit') - Sum('categories__expenses__amount')
         )
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        # Deleting cascades to the budget's notifications
+        with transaction.atomic():
+            instance.delete()
+            NotificationCounter.recount([self.request.user.pk])
+
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
         budget = self.get_object()
@@ -39,30 +46,42 @@ class BudgetViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create new budget for next period
-        new_start_date = budget.get_next_period_start_date()
-        new_budget = Budget.objects.create(
-            user=request.user,
-            name=budget.name,
-            period=budget.period,
-            start_date=new_start_date,
-            total_limit=budget.total_limit,
-            rollover_enabled=budget.rollover_enabled
-        )
+        try:
+            new_budget, = rollover.roll_over([budget])
+        except IntegrityError:
+            return Response(
+                {"detail": "This budget has already been rolled over"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(BudgetSerializer(new_budget).data)
 
-        # Copy categories and adjust limits based on remaining amounts
-        for category in budget.categories.all():
-            status_data = category.get_status()
-            new_limit = category.limit + status_data['remaining']
-            BudgetCategory.objects.create(
-                budget=new_budget,
-                category=category.category,
-                limit=new_limit,
-                alert_threshold=category.alert_threshold,
-                notification_enabled=category.notification_enabled
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        try:
+            periods = int(request.query_params.get('periods', 24))
+        except ValueError:
+            return Response(
+                {"detail": "'periods' must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Up to one spending query's worth of periods
+        if not 1 <= periods <= spending.BUDGETS_PER_QUERY:
+            return Response(
+                {"detail": f"'periods' must be between 1 and {spending.BUDGETS_PER_QUERY}."},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        return Response(BudgetSerializer(new_budget).data)
+        budget = self.get_object()
+        budgets = Budget.objects.filter(
+            pk__in=budget.lineage(periods)
+        ).prefetch_related('categories').order_by('start_date')
+        return Response({'budget': budget.pk, 'periods': spending.period_history(budgets)})
+
+    @action(detail=False, methods=['get'])
+    def forecast(self, request):
+        today = date.today()
+        _, forecasts = forecast.for_users([request.user.pk], today)
+        return Response({'date': today, 'forecasts': forecasts})
 
 class BudgetCategoryViewSet(viewsets.ModelViewSet):
     serializer_class = BudgetCategorySerializer
@@ -71,11 +90,12 @@ class BudgetCategoryViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return BudgetCategory.objects.filter(
             budget__user=self.request.user
-        ).annotate(
-            spent_amount=Sum('expenses__amount'),
-            remaining_amount=F('limit') - Sum('expenses__amount'),
-            percentage_used=Sum('expenses__amount') * 100.0 / F('limit')
-        )
+        ).select_related('budget')
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            NotificationCounter.recount([self.request.user.pk])
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -92,23 +112,45 @@ class BudgetCategoryViewSet(viewsets.ModelViewSet):
         status_data = category.get_status()
         return Response(status_data)
 
+class NotificationPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    max_page_size = 100
+
+
 class BudgetNotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = BudgetNotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
-        return BudgetNotification.objects.filter(
-            budget_category__budget__user=self.request.user
-        )
+        return BudgetNotification.for_user(self.request.user)
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
-        notification = self.get_object()
-        notification.read = True
-        notification.save()
+        with transaction.atomic():
+            updated = self.get_queryset().filter(pk=pk, read=False).update(read=True)
+            if not updated:
+                # Already read, or not the user's notification at all
+                self.get_object()
+            NotificationCounter.add({request.user.pk: -updated})
         return Response({'status': 'notification marked as read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        self.get_queryset().update(read=True)
-        return Response({'status': 'all notifications marked as read'})
\ No newline at end of file
+        with transaction.atomic():
+            updated = self.get_queryset().filter(read=False).update(read=True)
+            NotificationCounter.add({request.user.pk: -updated})
+        return Response({'status': 'all notifications marked as read'})
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': NotificationCounter.get_unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], url_path='stream-token')
+    def stream_token(self, request):
+        """Token for the stream's ?token=, as EventSource cannot send headers"""
+        return Response({
+            'token': str(StreamToken.for_user(request.user)),
+            'expires_in': int(StreamToken.lifetime.total_seconds()),
+        })
@@ -0,0 +1,359 @@
+import csv
+import io
+import logging
+import re
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from .models import Expenses
+from .serializers import ExpenseSerializer
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'value date'),
+    'amount': ('amount', 'transaction amount', 'value'),
+    'debit': ('debit', 'withdrawal', 'withdrawals', 'money out'),
+    'credit': ('credit', 'deposit', 'deposits', 'money in'),
+    'description': ('description', 'memo', 'payee', 'name', 'details', 'narrative'),
+    'category': ('category',),
+    'payment_method': ('payment method', 'payment_method', 'type', 'transaction type'),
+}
+
+DAY_FIRST = '%d/%m/%Y'
+MONTH_FIRST = '%m/%d/%Y'
+DATE_FORMATS = ('%Y-%m-%d', DAY_FIRST, MONTH_FIRST, '%d.%m.%Y', '%Y%m%d')
+AMBIGUOUS = object()
+AMBIGUOUS_DATE_ERROR = "The statement's day/month order is ambiguous; pass date_format."
+
+CATEGORY_KEYWORDS = [
+    (Expenses.FOOD, (
+        'grocer', 'grocers', 'grocery', 'groceries', 'supermarket', 'restaurant', 'cafe',
+        'coffee', 'bakery', 'pizza',
+    )),
+    (Expenses.TRANSPORTATION, ('uber', 'lyft', 'taxi', 'fuel', 'petrol', 'parking', 'transit', 'railway')),
+    (Expenses.HOUSING, ('rent', 'mortgage', 'landlord')),
+    (Expenses.UTILITIES, (
+        'electric', 'electricity', 'water', 'internet', 'broadband', 'mobile', 'phone',
+        'utility', 'utilities',
+    )),
+    (Expenses.HEALTHCARE, ('pharmacy', 'clinic', 'hospital', 'dental', 'dentist', 'doctor')),
+    (Expenses.ENTERTAINMENT, ('netflix', 'spotify', 'cinema', 'theatre', 'steam')),
+    (Expenses.TRAVEL, ('airline', 'airlines', 'airways', 'hotel', 'airbnb', 'booking.com')),
+    (Expenses.EDUCATION, ('tuition', 'school', 'university', 'course', 'udemy')),
+    (Expenses.PERSONAL_CARE, ('salon', 'barber', 'spa', 'gym')),
+    (Expenses.SHOPPING, ('amazon', 'store', 'mall', 'market')),
+]
+
+# Whole words only, so 'rent' does not match 'current' nor 'spa' 'spar'
+CATEGORY_PATTERNS = [
+    (category, re.compile(r'\b(?:%s)\b' % '|'.join(map(re.escape, keywords))))
+    for category, keywords in CATEGORY_KEYWORDS
+]
+
+OFX_PAYMENT_METHODS = {
+    'POS': Expenses.DEBIT_CARD,
+    'DEBIT': Expenses.DEBIT_CARD,
+    'ATM': Expenses.CASH,
+    'CASH': Expenses.CASH,
+    'XFER': Expenses.BANK_TRANSFER,
+    'CHECK': Expenses.BANK_TRANSFER,
+    'PAYMENT': Expenses.BANK_TRANSFER,
+    'DIRECTDEBIT': Expenses.BANK_TRANSFER,
+    'REPEATPMT': Expenses.BANK_TRANSFER,
+}
+
+
+def _choice_lookup(choices):
+    lookup = {}
+    for code, label in choices:
+        lookup[code.lower()] = code
+        lookup[label.lower()] = code
+    return lookup
+
+
+CATEGORY_LOOKUP = _choice_lookup(Expenses.CATEGORY_CHOICES)
+PAYMENT_METHOD_LOOKUP = _choice_lookup(Expenses.PAYMENT_METHOD_CHOICES)
+
+
+def parse_amount(value):
+    if value is None:
+        return None
+    value = str(value).strip().replace(',', '').replace(' ', '')
+    if not value:
+        return None
+    if value.startswith('(') and value.endswith(')'):
+        value = '-' + value[1:-1]
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
+
+
+def parse_date(value, formats=DATE_FORMATS):
+    value = (value or '').strip()
+    for date_format in formats:
+        try:
+            return datetime.strptime(value[:10] if '-' in value else value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_csv(stream, encoding='utf-8-sig'):
+    """Yield one raw transaction dict per CSV row"""
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    reader = csv.reader(text)
+    header = [column.strip().lower() for column in next(reader, [])]
+    positions = {}
+    for key, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                positions[key] = header.index(alias)
+                break
+
+    for line, values in enumerate(reader, start=2):
+        if not any(values):
+            continue
+        row = {'line': line}
+        for key, position in positions.items():
+            row[key] = values[position] if position < len(values) else ''
+        yield row
+    text.detach()
+
+
+def parse_ofx(stream, encoding='latin-1', chunk_size=64 * 1024):
+    """Yield one raw transaction dict per STMTTRN block of an OFX/QFX file
+
+    The file is tokenised on '<' in fixed-size chunks so single-line XML
+    exports do not have to be held in memory at once.
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    buffer = ''
+    transaction = None
+    count = 0
+    credit_card = False
+
+    def tokens():
+        nonlocal buffer
+        while True:
+            chunk = text.read(chunk_size)
+            if not chunk:
+                break
+            buffer += chunk
+            parts = buffer.split('<')
+            buffer = parts.pop()
+            for part in parts:
+                if part:
+                    yield part
+        if buffer:
+            yield buffer
+
+    for token in tokens():
+        tag, _, value = token.partition('>')
+        tag = tag.strip().upper()
+        value = value.strip()
+        if tag == 'CCSTMTRS':
+            credit_card = True
+        elif tag == 'STMTTRN':
+            transaction = {}
+        elif tag == '/STMTTRN' and transaction is not None:
+            count += 1
+            yield {
+                'line': count,
+                'date': (transaction.get('DTPOSTED') or '')[:8],
+                'amount': transaction.get('TRNAMT'),
+                'description': ' '.join(
+                    filter(None, [transaction.get('NAME'), transaction.get('MEMO')])
+                ),
+                'payment_method': OFX_PAYMENT_METHODS.get(
+                    transaction.get('TRNTYPE', '').upper(),
+                    Expenses.CREDIT_CARD if credit_card else ''
+                ),
+            }
+            transaction = None
+        elif transaction is not None and not tag.startswith('/'):
+            transaction[tag] = value
+    text.detach()
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+    'qfx': parse_ofx,
+}
+
+
+class StatementImporter:
+    """Streams a bank statement into Expenses: parse, map, validate, insert"""
+    batch_size = 1000
+    progress_every = 10000
+    max_reported_errors = 100
+    # Rows held back while their dates read both day and month first
+    max_ambiguous_dates = 10000
+
+    def __init__(self, user, file_format, debits_negative=True,
+                 default_category=Expenses.MISCELLANEOUS,
+                 default_payment_method=Expenses.DEBIT_CARD,
+                 date_format=None, progress=None):
+        if file_format not in PARSERS:
+            raise ValueError(f"Unsupported statement format '{file_format}'")
+        self.user = user
+        self.parser = PARSERS[file_format]
+        self.debits_negative = debits_negative
+        self.default_category = default_category
+        self.default_payment_method = default_payment_method
+        # Without date_format the day/month order is settled by the file itself
+        self.date_formats = (date_format,) if date_format else None
+        self.progress = progress
+        self.stats = {
+            'rows_read': 0,
+            'imported': 0,
+            'skipped': 0,
+            'failed': 0,
+            'errors': [],
+            'elapsed_seconds': 0.0,
+            'rows_per_second': 0.0,
+        }
+
+    def map_category(self, row):
+        category = CATEGORY_LOOKUP.get((row.get('category') or '').strip().lower())
+        if category:
+            return category
+        description = (row.get('description') or '').lower()
+        for category, pattern in CATEGORY_PATTERNS:
+            if pattern.search(description):
+                return category
+        return self.default_category
+
+    def map_payment_method(self, row):
+        method = (row.get('payment_method') or '').strip()
+        return (
+            PAYMENT_METHOD_LOOKUP.get(method.lower())
+            or OFX_PAYMENT_METHODS.get(method.upper())
+            or self.default_payment_method
+        )
+
+    def parse_date(self, value):
+        """The date in ``value``, or AMBIGUOUS until the file settles its day/month order
+
+        Slashed dates are read day first or month first for the whole file,
+        decided by the first value that only one of the two orders can read.
+        """
+        if self.date_formats is not None:
+            return parse_date(value, self.date_formats)
+        day_first = parse_date(value, (DAY_FIRST,))
+        month_first = parse_date(value, (MONTH_FIRST,))
+        if day_first and month_first and day_first != month_first:
+            return AMBIGUOUS
+        if bool(day_first) != bool(month_first):
+            rejected = MONTH_FIRST if day_first else DAY_FIRST
+            self.date_formats = tuple(f for f in DATE_FORMATS if f != rejected)
+        return parse_date(value, DATE_FORMATS)
+
+    @staticmethod
+    def dated(line, raw, data, date):
+        data['date'] = date.isoformat() if date else raw
+        return line, data
+
+    def mapped(self, rows):
+        pending = []
+        for row in rows:
+            self.stats['rows_read'] += 1
+            debit = parse_amount(row.get('debit'))
+            amount = parse_amount(row.get('amount'))
+            if debit:
+                amount = abs(debit)
+            elif parse_amount(row.get('credit')):
+                # The credit side of a debit/credit statement
+                self.stats['skipped'] += 1
+                continue
+            elif amount is not None:
+                # Credits (refunds, deposits) are not expenses
+                if (amount < 0) != self.debits_negative:
+                    self.stats['skipped'] += 1
+                    continue
+                amount = abs(amount)
+            item = (row['line'], row.get('date'), {
+                'amount': amount,
+                'description': (row.get('description') or '').strip()[:255],
+                'category': self.map_category(row),
+                'payment_method': self.map_payment_method(row),
+            })
+            date = self.parse_date(row.get('date'))
+            if date is AMBIGUOUS:
+                pending.append(item)
+                if len(pending) >= self.max_ambiguous_dates:
+                    self.fail_ambiguous(pending)
+                    pending = []
+                continue
+            # Held-back rows follow as soon as a date settles the order
+            if pending and self.date_formats is not None:
+                for line, raw, data in pending:
+                    yield self.dated(line, raw, data, self.parse_date(raw))
+                pending = []
+            yield self.dated(*item, date)
+        self.fail_ambiguous(pending)
+
+    def fail_ambiguous(self, items):
+        for line, _, _ in items:
+            self.fail(line, {'date': [AMBIGUOUS_DATE_ERROR]})
+
+    def fail(self, line, errors):
+        self.stats['failed'] += 1
+        if len(self.stats['errors']) < self.max_reported_errors:
+            self.stats['errors'].append({'line': line, 'errors': errors})
+
+    def validated(self, rows):
+        for line, data in rows:
+            serializer = ExpenseSerializer(data=data)
+            if serializer.is_valid():
+                yield Expenses(user=self.user, **serializer.validated_data)
+                continue
+            self.fail(line, serializer.errors)
+
+    @staticmethod
+    def batched(items, size):
+        items = iter(items)
+        while True:
+            batch = list(islice(items, size))
+            if not batch:
+                return
+            yield batch
+
+    def run(self, stream):
+        """Import the statement in one transaction, so a failure leaves none of it behind
+
+        Progress reports count the rows inserted so far, which commit together at the end.
+        """
+        started = time.monotonic()
+        next_report = self.progress_every
+        pipeline = self.validated(self.mapped(self.parser(stream)))
+        with transaction.atomic():
+            for batch in self.batched(pipeline, self.batch_size):
+                Expenses.bulk_insert(batch, batch_size=self.batch_size)
+                self.stats['imported'] += len(batch)
+                self._update_rate(started)
+                if self.stats['rows_read'] >= next_report:
+                    next_report += self.progress_every
+                    self._report()
+        self._update_rate(started)
+        self._report()
+        return self.stats
+
+    def _update_rate(self, started):
+        elapsed = time.monotonic() - started
+        self.stats['elapsed_seconds'] = round(elapsed, 3)
+        self.stats['rows_per_second'] = round(self.stats['rows_read'] / elapsed, 1) if elapsed else 0.0
+
+    def _report(self):
+        logger.info(
+            "Statement import for user %s: %s rows read, %s imported, %s skipped, "
+            "%s failed (%s rows/s)",
+            self.user.pk, self.stats['rows_read'], self.stats['imported'],
+            self.stats['skipped'], self.stats['failed'], self.stats['rows_per_second']
+        )
+        if self.progress is not None:
+            self.progress(self.stats)
@@ -0,0 +1,173 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from .models import Expenses, ExpenseInsight
+
+CATEGORIES = [code for code, _ in Expenses.CATEGORY_CHOICES]
+CENTS = Decimal('0.01')
+
+# Scales the median absolute deviation (or the mean absolute deviation when
+# the MAD is zero) to the standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def _money(value):
+    return Decimal(repr(float(value))).quantize(CENTS)
+
+
+def group_medians(groups, values, counts):
+    """Median of ``values`` within each group id in ``groups`` (0..len(counts) - 1)"""
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+
+class InsightEngine:
+    """Flags unusual expenses with robust statistics over columnar arrays
+
+    Two kinds of insight are produced:
+
+    - ``amount_outlier``: an expense whose robust z-score, ``(amount -
+      median) / (1.4826 * MAD)`` within its user and category, is above
+      ``threshold``.
+    - ``category_spike``: a week whose category total is more than
+      ``spike_threshold`` standard deviations above the mean of the
+      preceding ``baseline_weeks`` weeks.
+
+    Rows of any number of users are scored together; all grouping is done
+    with NumPy on arrays built from a single query.
+    """
+    columns = ('id', 'user_id', 'date', 'category', 'amount')
+
+    def __init__(self, days=365, threshold=3.5, spike_threshold=3.0,
+                 baseline_weeks=8, min_samples=5):
+        self.days = days
+        self.threshold = threshold
+        self.spike_threshold = spike_threshold
+        self.baseline_weeks = baseline_weeks
+        self.min_samples = min_samples
+        self.end_date = date.today()
+        self.start_date = self.end_date - timedelta(days=days)
+
+    def queryset(self, user=None, user_ids=None):
+        model = Expenses.tier_for(user, self.start_date)
+        rows = model.objects.filter(date__range=[self.start_date, self.end_date])
+        if user is not None:
+            rows = rows.filter(user=user)
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        return rows.order_by().values_list(*self.columns)
+
+    def for_user(self, user):
+        return self.score(self.queryset(user=user))
+
+    def for_users(self, user_ids):
+        return self.score(self.queryset(user_ids=user_ids))
+
+    def store(self, user_ids, insights, batch_size=1000):
+        """Replace the stored insights of ``user_ids``"""
+        with transaction.atomic():
+            ExpenseInsight.objects.filter(user_id__in=user_ids).delete()
+            return ExpenseInsight.objects.bulk_create(
+                [ExpenseInsight(**insight) for insight in insights],
+                batch_size=batch_size
+            )
+
+    def score(self, rows):
+        rows = list(rows)
+        if not rows:
+            return []
+        ids, user_ids, dates, categories, amounts = zip(*rows)
+        codes = {code: index for index, code in enumerate(CATEGORIES)}
+        columns = {
+            'id': np.fromiter(ids, dtype=np.int64, count=len(rows)),
+            'user_id': np.fromiter(user_ids, dtype=np.int64, count=len(rows)),
+            'day': np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(rows)),
+            'category': np.fromiter((codes[c] for c in categories), dtype=np.int64, count=len(rows)),
+            'amount': np.fromiter(amounts, dtype=np.float64, count=len(rows)),
+        }
+        # One group per (user, category) pair
+        keys = columns['user_id'] * len(CATEGORIES) + columns['category']
+        group_keys, groups, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        return (
+            self.amount_outliers(columns, groups, counts, amounts)
+            + self.category_spikes(columns, group_keys, groups)
+        )
+
+    def amount_outliers(self, columns, groups, counts, amounts):
+        values = columns['amount']
+        medians = group_medians(groups, values, counts)[groups]
+        deviations = np.abs(values - medians)
+        mads = group_medians(groups, deviations, counts)[groups]
+        mean_ads = (np.bincount(groups, weights=deviations) / counts)[groups]
+        scale = np.where(mads > 0, MAD_SCALE * mads, MEAN_AD_SCALE * mean_ads)
+        scores = np.divide(
+            values - medians, scale,
+            out=np.zeros_like(values), where=scale > 0
+        )
+
+        flagged = np.flatnonzero((counts[groups] >= self.min_samples) & (scores > self.threshold))
+        flagged = flagged[np.argsort(-scores[flagged])]
+        return [
+            {
+                'kind': 'amount_outlier',
+                'user_id': int(columns['user_id'][index]),
+                'expense_id': int(columns['id'][index]),
+                'category': CATEGORIES[columns['category'][index]],
+                'date': date.fromordinal(int(columns['day'][index])),
+                'amount': amounts[index],
+                'expected': _money(medians[index]),
+                'score': round(float(scores[index]), 2),
+            }
+            for index in flagged
+        ]
+
+    def category_spikes(self, columns, group_keys, groups):
+        # Weeks start on Monday, counted from the week holding start_date
+        first_monday = self.start_date.toordinal() - self.start_date.weekday()
+        weeks = (columns['day'] - first_monday) // 7
+        week_count = int(weeks.max()) + 1
+        window = self.baseline_weeks
+        if week_count <= window:
+            return []
+
+        totals = np.zeros((len(group_keys), week_count))
+        np.add.at(totals, (groups, weeks), columns['amount'])
+
+        # Trailing sums over the previous `window` weeks, from running totals
+        def trailing(matrix):
+            running = np.zeros((matrix.shape[0], week_count + 1))
+            np.cumsum(matrix, axis=1, out=running[:, 1:])
+            return running[:, window:-1] - running[:, :-window - 1]
+
+        means = trailing(totals) / window
+        variances = trailing(totals ** 2) / window - means ** 2
+        active_weeks = trailing((totals > 0).astype(np.float64))
+        # Floor the spread so a steady category is not flagged for small changes
+        spread = np.maximum(np.sqrt(np.clip(variances, 0, None)), 0.1 * means)
+        current = totals[:, window:]
+        scores = np.divide(
+            current - means, spread,
+            out=np.zeros_like(current), where=spread > 0
+        )
+        # Only categories in regular use have a baseline worth comparing to
+        scores[active_weeks < window // 2] = 0
+
+        group_index, week_index = np.nonzero(scores > self.spike_threshold)
+        order = np.argsort(-scores[group_index, week_index])
+        spikes = []
+        for group, week in zip(group_index[order], week_index[order]):
+            user_id, category = divmod(int(group_keys[group]), len(CATEGORIES))
+            spikes.append({
+                'kind': 'category_spike',
+                'user_id': user_id,
+                'expense_id': None,
+                'category': CATEGORIES[category],
+                'date': date.fromordinal(first_monday + 7 * int(week + window)),
+                'amount': _money(current[group, week]),
+                'expected': _money(means[group, week]),
+                'score': round(float(scores[group, week]), 2),
+            })
+        return spikes
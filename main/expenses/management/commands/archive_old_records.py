@@ -0,0 +1,50 @@
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ARCHIVED_MODELS = ['expenses.Expenses', 'income.Income']
+
+
+class Command(BaseCommand):
+    help = "Move expenses and income older than the archive horizon into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=getattr(settings, 'ARCHIVE_HORIZON_MONTHS', 24),
+            help="Archive rows dated more than this many months ago"
+        )
+        parser.add_argument(
+            '--before',
+            help="Archive rows dated before this ISO date instead of using --months"
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError("--before must be an ISO date (YYYY-MM-DD)")
+        else:
+            if options['months'] <= 0:
+                raise CommandError("--months must be a positive number")
+            cutoff = date.today() - relativedelta(months=options['months'])
+
+        for label in ARCHIVED_MODELS:
+            app_label, _ = label.split('.')
+            if not apps.is_installed(app_label):
+                continue
+            model = apps.get_model(label)
+            moved = model.archive_before(
+                cutoff,
+                batch_size=options['batch_size'],
+                using=options['database']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {moved} {model._meta.verbose_name_plural.lower()} dated before {cutoff}"
+            ))
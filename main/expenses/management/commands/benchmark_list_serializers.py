@@ -0,0 +1,94 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from expenses.models import Expenses
+from expenses.serializers import ExpenseSerializer
+from income.models import Income
+from income.serializer import IncomeSerializer
+from main.serializers import FastReadSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/s of the ModelSerializer list path against FastReadSerializer "
+        "for expenses and income. Seeds throwaway rows inside a rolled back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+                self.seed(user, options['rows'])
+                self.compare(
+                    'expenses', Expenses.objects.filter(user=user), ExpenseSerializer, options['repeat']
+                )
+                self.compare(
+                    'income', Income.objects.filter(user=user), IncomeSerializer, options['repeat']
+                )
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, user, rows):
+        today = date.today()
+        random.seed(0)
+        Expenses.bulk_insert([
+            Expenses(
+                user=user,
+                amount=Decimal(random.randint(100, 50000)) / 100,
+                category=random.choice(Expenses.CATEGORY_CHOICES)[0],
+                payment_method=random.choice(Expenses.PAYMENT_METHOD_CHOICES)[0],
+                description=f'Benchmark expense {index}',
+                date=today - timedelta(days=random.randint(0, 730)),
+            )
+            for index in range(rows)
+        ])
+        Income.objects.bulk_create([
+            Income(
+                user=user,
+                amount=Decimal(random.randint(100, 500000)) / 100,
+                income_type=random.choice(Income.INCOME_TYPE_CHOICES)[0],
+                description=f'Benchmark income {index}',
+                date=today - timedelta(days=random.randint(0, 730)),
+                recurring=index % 3 == 0,
+                frequency='MONTHLY' if index % 3 == 0 else None,
+            )
+            for index in range(rows)
+        ], batch_size=1000)
+
+    def compare(self, label, queryset, serializer_class, repeat):
+        renderer = JSONRenderer()
+        reader = FastReadSerializer(serializer_class)
+        rows = queryset.count()
+
+        def model_path():
+            return renderer.render(serializer_class(queryset.all(), many=True).data)
+
+        def fast_path():
+            return renderer.render(reader.serialize(queryset.values(*reader.columns)))
+
+        if model_path() != fast_path():
+            raise CommandError(f"{label}: fast serializer output differs from {serializer_class.__name__}")
+
+        for name, path in (('ModelSerializer', model_path), ('FastReadSerializer', fast_path)):
+            best = min(self.timed(path) for _ in range(repeat))
+            self.stdout.write(f"{label:<9} {name:<19} {rows / best:>12,.0f} rows/s")
+
+    @staticmethod
+    def timed(path):
+        started = time.perf_counter()
+        path()
+        return time.perf_counter() - started
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from expenses import recurring
+from expenses.models import Expenses
+
+
+class Command(BaseCommand):
+    help = "Rescan expense history and rebuild the detected recurring expenses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rescan this username")
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user_ids = [User.objects.get(username=options['user']).pk]
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+        else:
+            user_ids = Expenses.objects.order_by('user_id').values_list(
+                'user_id', flat=True
+            ).distinct()
+
+        users = stored = 0
+        for user_id in user_ids:
+            stored += len(recurring.detect(user_id))
+            users += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} expense series for {users} users"
+        ))
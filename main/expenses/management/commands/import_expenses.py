@@ -0,0 +1,57 @@
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from expenses.importers import StatementImporter, PARSERS
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or OFX bank statement into a user's expenses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=sorted(PARSERS))
+        parser.add_argument(
+            '--debits-positive',
+            action='store_true',
+            help="Treat positive amounts as spending (default: negative amounts are debits)"
+        )
+        parser.add_argument('--date-format', help="strptime format of the date column")
+        parser.add_argument('--batch-size', type=int, default=StatementImporter.batch_size)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f"File '{path}' does not exist")
+        file_format = options['file_format'] or path.suffix.lstrip('.').lower()
+        if file_format not in PARSERS:
+            raise CommandError(f"Unsupported statement format '{file_format}'")
+
+        importer = StatementImporter(
+            user,
+            file_format,
+            debits_negative=not options['debits_positive'],
+            date_format=options['date_format'],
+            progress=self.report
+        )
+        importer.batch_size = options['batch_size']
+        with path.open('rb') as stream:
+            stats = importer.run(stream)
+
+        for error in stats['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} expenses in {stats['elapsed_seconds']}s"
+        ))
+
+    def report(self, stats):
+        self.stdout.write(
+            f"{stats['rows_read']} rows read, {stats['imported']} imported, "
+            f"{stats['skipped']} skipped, {stats['failed']} failed "
+            f"({stats['rows_per_second']} rows/s)"
+        )
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from expenses.models import DailyExpenseRollup
+from main.cache import get_cache
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily expense rollup table from the raw expense rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help="Only rebuild the rollup for this username"
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        created = DailyExpenseRollup.rebuild(user=user)
+        # Cached summaries may have been computed from a drifted rollup
+        get_cache().clear()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} rollup rows"))
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from expenses.insights import InsightEngine
+from expenses.models import Expenses
+
+
+class Command(BaseCommand):
+    help = "Score every user's recent expenses for outliers and category spikes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help="Look back this many days")
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help="Users scored together from one query"
+        )
+        parser.add_argument('--user', help="Only score this username")
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0:
+            raise CommandError("--days must be a positive number")
+        engine = InsightEngine(days=options['days'])
+
+        if options['user']:
+            try:
+                user_ids = [User.objects.get(username=options['user']).pk]
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+        else:
+            user_ids = list(
+                Expenses.objects.filter(date__gte=engine.start_date)
+                .order_by('user_id').values_list('user_id', flat=True).distinct()
+            )
+
+        stored = 0
+        for offset in range(0, len(user_ids), options['chunk_size']):
+            chunk = user_ids[offset:offset + options['chunk_size']]
+            stored += len(engine.store(chunk, engine.for_users(chunk)))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} insights for {len(user_ids)} users"
+        ))
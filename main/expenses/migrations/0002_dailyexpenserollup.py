@@ -0,0 +1,136 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:26
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+
+def backfill_rollup(apps, schema_editor):
+    Expenses = apps.get_model("expenses", "Expenses")
+    DailyExpenseRollup = apps.get_model("expenses", "DailyExpenseRollup")
+    grouped = (
+        Expenses.objects.order_by()
+        .values("user_id", "date", "category", "payment_method")
+        .annotate(
+            total=Sum("amount"),
+            count=Count("id"),
+            squares=Sum(
+                ExpressionWrapper(
+                    F("amount") * F("amount"),
+                    output_field=DecimalField(max_digits=24, decimal_places=4),
+                )
+            ),
+        )
+    )
+    DailyExpenseRollup.objects.bulk_create(
+        (
+            DailyExpenseRollup(
+                user_id=row["user_id"],
+                date=row["date"],
+                category=row["category"],
+                payment_method=row["payment_method"],
+                total_amount=row["total"],
+                expense_count=row["count"],
+                sum_of_squares=row["squares"],
+            )
+            for row in grouped.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyExpenseRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("FOOD", "Food"),
+                            ("TRANSPORTATION", "Transportation"),
+                            ("HOUSING", "Housing"),
+                            ("UTILITIES", "Utilities"),
+                            ("HEALTHCARE", "Healthcare"),
+                            ("ENTERTAINMENT", "Entertainment"),
+                            ("SHOPPING", "Shopping"),
+                            ("PERSONAL_CARE", "Personal Care"),
+                            ("EDUCATION", "Education"),
+                            ("TRAVEL", "Travel"),
+                            ("MISCELLANEOUS", "Miscellaneous"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("CASH", "Cash"),
+                            ("DEBIT_CARD", "Debit Card"),
+                            ("CREDIT_CARD", "Credit Card"),
+                            ("BANK_TRANSFER", "Bank Transfer"),
+                            ("DIGITAL_WALLET", "Digital Wallet"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "total_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0"), max_digits=14
+                    ),
+                ),
+                ("expense_count", models.PositiveIntegerField(default=0)),
+                (
+                    "sum_of_squares",
+                    models.DecimalField(
+                        decimal_places=4, default=Decimal("0"), max_digits=24
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="expense_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "category", "date"],
+                        name="expenses_da_user_id_37ef9e_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "date", "category", "payment_method"),
+                        name="expense_rollup_unique_key",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0002_dailyexpenserollup"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="expenses",
+            index=models.Index(
+                fields=["user", "date", "created_at", "id"],
+                name="expenses_ex_user_id_af3f15_idx",
+            ),
+        ),
+    ]
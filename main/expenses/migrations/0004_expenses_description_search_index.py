@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from main.search import index_operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0003_expenses_expenses_ex_user_id_af3f15_idx"),
+    ]
+
+    operations = [
+        index_operation("expenses", "Expenses", ["description"]),
+    ]
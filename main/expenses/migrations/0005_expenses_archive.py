@@ -0,0 +1,185 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:38
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+from main.archive import history_view_operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0004_expenses_description_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExpensesHistory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=10,
+                        validators=[
+                            django.core.validators.MinValueValidator(Decimal("0.01"))
+                        ],
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("FOOD", "Food"),
+                            ("TRANSPORTATION", "Transportation"),
+                            ("HOUSING", "Housing"),
+                            ("UTILITIES", "Utilities"),
+                            ("HEALTHCARE", "Healthcare"),
+                            ("ENTERTAINMENT", "Entertainment"),
+                            ("SHOPPING", "Shopping"),
+                            ("PERSONAL_CARE", "Personal Care"),
+                            ("EDUCATION", "Education"),
+                            ("TRAVEL", "Travel"),
+                            ("MISCELLANEOUS", "Miscellaneous"),
+                        ],
+                        db_index=True,
+                        max_length=20,
+                    ),
+                ),
+                ("description", models.CharField(blank=True, max_length=255)),
+                ("date", models.DateField(db_index=True)),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("CASH", "Cash"),
+                            ("DEBIT_CARD", "Debit Card"),
+                            ("CREDIT_CARD", "Credit Card"),
+                            ("BANK_TRANSFER", "Bank Transfer"),
+                            ("DIGITAL_WALLET", "Digital Wallet"),
+                        ],
+                        db_index=True,
+                        max_length=20,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Expense history",
+                "db_table": "expenses_expenses_history",
+                "ordering": ["-date", "-created_at"],
+                "abstract": False,
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ExpensesArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=10,
+                        validators=[
+                            django.core.validators.MinValueValidator(Decimal("0.01"))
+                        ],
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("FOOD", "Food"),
+                            ("TRANSPORTATION", "Transportation"),
+                            ("HOUSING", "Housing"),
+                            ("UTILITIES", "Utilities"),
+                            ("HEALTHCARE", "Healthcare"),
+                            ("ENTERTAINMENT", "Entertainment"),
+                            ("SHOPPING", "Shopping"),
+                            ("PERSONAL_CARE", "Personal Care"),
+                            ("EDUCATION", "Education"),
+                            ("TRAVEL", "Travel"),
+                            ("MISCELLANEOUS", "Miscellaneous"),
+                        ],
+                        db_index=True,
+                        max_length=20,
+                    ),
+                ),
+                ("description", models.CharField(blank=True, max_length=255)),
+                ("date", models.DateField(db_index=True)),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("CASH", "Cash"),
+                            ("DEBIT_CARD", "Debit Card"),
+                            ("CREDIT_CARD", "Credit Card"),
+                            ("BANK_TRANSFER", "Bank Transfer"),
+                            ("DIGITAL_WALLET", "Digital Wallet"),
+                        ],
+                        db_index=True,
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_expenses",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Archived expenses",
+                "ordering": ["-date", "-created_at"],
+                "abstract": False,
+                "indexes": [
+                    models.Index(
+                        fields=["user", "date", "created_at", "id"],
+                        name="expenses_ex_user_id_97ef99_idx",
+                    )
+                ],
+            },
+        ),
+        history_view_operation(
+            "expenses_expenses_history",
+            ["expenses_expenses", "expenses_expensesarchive"],
+            [
+                "id",
+                "created_at",
+                "updated_at",
+                "user_id",
+                "amount",
+                "category",
+                "description",
+                "date",
+                "payment_method",
+            ],
+        ),
+    ]
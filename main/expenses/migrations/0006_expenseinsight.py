@@ -0,0 +1,91 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0005_expenses_archive"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExpenseInsight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("amount_outlier", "Unusually large expense"),
+                            ("category_spike", "Category spending spike"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("FOOD", "Food"),
+                            ("TRANSPORTATION", "Transportation"),
+                            ("HOUSING", "Housing"),
+                            ("UTILITIES", "Utilities"),
+                            ("HEALTHCARE", "Healthcare"),
+                            ("ENTERTAINMENT", "Entertainment"),
+                            ("SHOPPING", "Shopping"),
+                            ("PERSONAL_CARE", "Personal Care"),
+                            ("EDUCATION", "Education"),
+                            ("TRAVEL", "Travel"),
+                            ("MISCELLANEOUS", "Miscellaneous"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("expected", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("score", models.FloatField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "expense",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="insights",
+                        to="expenses.expenses",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="expense_insights",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date", "-score"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "date"], name="expenses_ex_user_id_0b52b7_idx"
+                    )
+                ],
+            },
+        ),
+    ]
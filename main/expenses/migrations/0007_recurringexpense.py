@@ -0,0 +1,102 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:45
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0006_expenseinsight"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecurringExpense",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("description_key", models.CharField(max_length=255)),
+                ("amount_band", models.IntegerField()),
+                ("description", models.CharField(blank=True, max_length=255)),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("FOOD", "Food"),
+                            ("TRANSPORTATION", "Transportation"),
+                            ("HOUSING", "Housing"),
+                            ("UTILITIES", "Utilities"),
+                            ("HEALTHCARE", "Healthcare"),
+                            ("ENTERTAINMENT", "Entertainment"),
+                            ("SHOPPING", "Shopping"),
+                            ("PERSONAL_CARE", "Personal Care"),
+                            ("EDUCATION", "Education"),
+                            ("TRAVEL", "Travel"),
+                            ("MISCELLANEOUS", "Miscellaneous"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "cadence",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("WEEKLY", "Weekly"),
+                            ("MONTHLY", "Monthly"),
+                            ("ANNUAL", "Annual"),
+                        ],
+                        max_length=10,
+                        null=True,
+                    ),
+                ),
+                ("occurrences", models.PositiveIntegerField(default=0)),
+                (
+                    "total_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0"), max_digits=14
+                    ),
+                ),
+                ("last_amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("first_date", models.DateField()),
+                ("last_date", models.DateField()),
+                ("gap_mean", models.FloatField(default=0)),
+                ("gap_m2", models.FloatField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recurring_expenses",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-last_date"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "cadence"],
+                        name="expenses_re_user_id_a6c604_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "description_key", "amount_band"),
+                        name="recurring_expense_unique_key",
+                    )
+                ],
+            },
+        ),
+    ]
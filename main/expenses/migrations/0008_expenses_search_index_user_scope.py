@@ -0,0 +1,15 @@
+from django.db import migrations
+
+from main.search import index_operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0007_recurringexpense"),
+    ]
+
+    operations = [
+        index_operation("expenses", "Expenses", ["description"], drop=True),
+        index_operation("expenses", "Expenses", ["description"], scope=["user_id"]),
+    ]
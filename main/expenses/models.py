@@ -1,12 +1,18 @@
-from django.db import models
+import math
+from datetime import timedelta
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
-from django.db.models import Sum, Avg
+from django.db.models import Sum, Count, F, FloatField, DecimalField, ExpressionWrapper, Value
+from django.db.models.functions import Cast, Greatest, Sqrt
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
 from dateutil.relativedelta import relativedelta
+from main.archive import ArchiveTierMixin
+from main.series import bucket_expression, fill_series
 
-class Expenses(models.Model):
+class ExpenseRecord(models.Model):
+    """Columns shared by live, archived and history expense rows"""
     # Payment Method Choices
     CASH = 'CASH'
     DEBIT_CARD = 'DEBIT_CARD'
@@ -54,7 +60,6 @@ class Expenses(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     # Main model fields
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses')
     amount = models.DecimalField(
         max_digits=10, 
         decimal_places=2,
@@ -74,35 +79,65 @@ class Expenses(models.Model):
     )
 
     class Meta:
+        abstract = True
         ordering = ['-date', '-created_at']
+
+    def __str__(self):
+        return f"{self.category} - {self.amount} on {self.date}"
+
+
+class Expenses(ArchiveTierMixin, ExpenseRecord):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses')
+
+    archive_model = 'expenses.ExpensesArchive'
+    history_model = 'expenses.ExpensesHistory'
+    data_version_namespace = 'expenses'
+
+    class Meta(ExpenseRecord.Meta):
         indexes = [
             models.Index(fields=['user', 'date']),
             models.Index(fields=['user', 'category']),
+            models.Index(fields=['user', 'date', 'created_at', 'id']),
         ]
         verbose_name_plural = "Expenses"
 
-    def __str__(self):
-        return f"{self.category} - {self.amount} on {self.date}"
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so edits can be reversed out of derived tables
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @classmethod
+    def bulk_insert(cls, expenses, batch_size=1000):
+        """Insert expenses in chunks inside one transaction and notify receivers once"""
+        from .signals import expenses_bulk_created
+
+        with transaction.atomic():
+            created = cls.objects.bulk_create(expenses, batch_size=batch_size)
+            expenses_bulk_created.send(sender=cls, instances=created)
+        return created
 
     @classmethod
     def get_category_summary(cls, user, start_date, end_date):
-        return cls.objects.filter(
+        return DailyExpenseRollup.objects.filter(
             user=user,
             date__range=[start_date, end_date]
         ).values('category').annotate(
-            total=Sum('amount'),
-            average=Avg('amount'),
-            count=models.Count('id')
+            total=Sum('total_amount'),
+            average=DailyExpenseRollup.average_expression(),
+            stddev=DailyExpenseRollup.stddev_expression(),
+            count=Sum('expense_count')
         ).order_by('-total')
 
     @classmethod
     def get_payment_method_summary(cls, user, start_date, end_date):
-        return cls.objects.filter(
+        return DailyExpenseRollup.objects.filter(
             user=user,
             date__range=[start_date, end_date]
         ).values('payment_method').annotate(
-            total=Sum('amount'),
-            count=models.Count('id')
+            total=Sum('total_amount'),
+            count=Sum('expense_count')
         ).order_by('-total')
 
     @classmethod
@@ -110,11 +145,376 @@ class Expenses(models.Model):
         end_date = timezone.now().date()
         start_date = end_date - relativedelta(months=months)
         
-        return cls.objects.filter(
+        return DailyExpenseRollup.objects.filter(
             user=user,
             date__gte=start_date
         ).values('date__year', 'date__month').annotate(
+            total=Sum('total_amount'),
+            avg_transaction=DailyExpenseRollup.average_expression(),
+            transaction_count=Sum('expense_count')
+        ).order_by('date__year', 'date__month')
+
+    SERIES_BREAKDOWNS = ('category', 'payment_method')
+
+    @classmethod
+    def get_spending_series(cls, user, start_date, end_date, bucket='month', breakdown=None):
+        """Spending per day/week/month/quarter bucket with empty buckets filled with zero"""
+        if breakdown is not None and breakdown not in cls.SERIES_BREAKDOWNS:
+            raise ValueError(f"Unknown breakdown '{breakdown}'")
+        group_by = ['bucket'] + ([breakdown] if breakdown else [])
+        rows = DailyExpenseRollup.objects.filter(
+            user=user,
+            date__range=[start_date, end_date]
+        ).annotate(
+            bucket=bucket_expression('date', bucket)
+        ).values(*group_by).annotate(
+            total=Sum('total_amount'),
+            count=Sum('expense_count')
+        ).order_by('bucket')
+
+        groups = ()
+        if breakdown:
+            groups = [code for code, _ in cls._meta.get_field(breakdown).choices]
+        return fill_series(rows, start_date, end_date, bucket, breakdown, groups)
+
+
+class ExpensesArchive(ExpenseRecord):
+    """Expenses older than the archive horizon, moved out of the hot table"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_expenses')
+
+    class Meta(ExpenseRecord.Meta):
+        indexes = [
+            models.Index(fields=['user', 'date', 'created_at', 'id']),
+        ]
+        verbose_name_plural = "Archived expenses"
+
+
+class ExpensesHistory(ExpenseRecord):
+    """Read-only view over the hot and archived expense rows
+
+    The view lists its columns explicitly (see migration 0005), so a new
+    Expenses column has to be added to ExpensesArchive and the view too.
+    """
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='+')
+
+    class Meta(ExpenseRecord.Meta):
+        managed = False
+        db_table = 'expenses_expenses_history'
+        verbose_name_plural = "Expense history"
+
+
+class DailyExpenseRollup(models.Model):
+    """Per-day expense totals keyed by user, category and payment method"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_rollups')
+    date = models.DateField()
+    category = models.CharField(
+        choices=Expenses.CATEGORY_CHOICES,
+        max_length=20
+    )
+    payment_method = models.CharField(
+        choices=Expenses.PAYMENT_METHOD_CHOICES,
+        max_length=20
+    )
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    expense_count = models.PositiveIntegerField(default=0)
+    sum_of_squares = models.DecimalField(max_digits=24, decimal_places=4, default=Decimal('0'))
+
+    BATCH_SIZE = 1000
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'category', 'payment_method'],
+                name='expense_rollup_unique_key'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'category', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.category} / {self.payment_method} on {self.date}: {self.total_amount}"
+
+    @staticmethod
+    def average_expression():
+        # Cast before dividing so SQLite does not fall back to integer division
+        return ExpressionWrapper(
+            Cast(Sum('total_amount'), FloatField()) / Sum('expense_count'),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        )
+
+    @staticmethod
+    def stddev_expression():
+        # Population standard deviation from the running sums; rounding can
+        # leave a tiny negative variance when every amount is the same
+        count = Cast(Sum('expense_count'), FloatField())
+        mean = Cast(Sum('total_amount'), FloatField()) / count
+        variance = Cast(Sum('sum_of_squares'), FloatField()) / count - mean * mean
+        return ExpressionWrapper(
+            Sqrt(Greatest(variance, Value(0.0))),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        )
+
+    @staticmethod
+    def row_key(values):
+        return (values['user_id'], values['date'], values['category'], values['payment_method'])
+
+    @classmethod
+    def collect_deltas(cls, rows, sign=1, deltas=None):
+        """Fold expense rows (dicts or instances) into {key: [amount, count, squares]}"""
+        deltas = {} if deltas is None else deltas
+        for row in rows:
+            if not isinstance(row, dict):
+                row = {
+                    'user_id': row.user_id,
+                    'date': row.date,
+                    'category': row.category,
+                    'payment_method': row.payment_method,
+                    'amount': row.amount,
+                }
+            amount = Decimal(row['amount'])
+            delta = deltas.setdefault(cls.row_key(row), [Decimal('0'), 0, Decimal('0')])
+            delta[0] += sign * amount
+            delta[1] += sign
+            delta[2] += sign * amount * amount
+        return deltas
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """Add the collected deltas to the stored rollup rows
+
+        Two writes can both find a key missing and insert it; the losing
+        insert is rolled back and the rows are selected again, now holding
+        the other write's row, so a second collision is a real error.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        try:
+            cls._write_deltas(deltas)
+        except IntegrityError:
+            cls._write_deltas(deltas)
+
+    @classmethod
+    def _write_deltas(cls, deltas):
+        user_ids = {key[0] for key in deltas}
+        dates = [key[1] for key in deltas]
+
+        with transaction.atomic():
+            existing = {
+                cls.row_key(row.__dict__): row
+                for row in cls.objects.select_for_update().filter(
+                    user_id__in=user_ids,
+                    date__range=[min(dates), max(dates)]
+                )
+            }
+            to_create, to_update, to_delete = [], [], []
+            for key, (amount, count, squares) in deltas.items():
+                row = existing.get(key)
+                if row is None:
+                    user_id, date, category, payment_method = key
+                    row = cls(
+                        user_id=user_id,
+                        date=date,
+                        category=category,
+                        payment_method=payment_method
+                    )
+                    to_create.append(row)
+                else:
+                    to_update.append(row)
+                row.total_amount += amount
+                row.expense_count += count
+                row.sum_of_squares += squares
+                if row.pk and row.expense_count <= 0:
+                    to_delete.append(row.pk)
+
+            cls.objects.bulk_create(
+                [row for row in to_create if row.expense_count > 0],
+                batch_size=cls.BATCH_SIZE
+            )
+            cls.objects.bulk_update(
+                [row for row in to_update if row.pk not in to_delete],
+                ['total_amount', 'expense_count', 'sum_of_squares'],
+                batch_size=cls.BATCH_SIZE
+            )
+            if to_delete:
+                cls.objects.filter(pk__in=to_delete).delete()
+
+    @classmethod
+    def rebuild(cls, user=None):
+        """Recompute the rollup from the raw expense rows, archived ones included"""
+        expenses = ExpensesHistory.objects.all()
+        rollups = cls.objects.all()
+        if user is not None:
+            expenses = expenses.filter(user=user)
+            rollups = rollups.filter(user=user)
+
+        grouped = expenses.order_by().values(
+            'user_id', 'date', 'category', 'payment_method'
+        ).annotate(
             total=Sum('amount'),
-            avg_transaction=Avg('amount'),
-            transaction_count=models.Count('id')
-        ).order_by('date__year', 'date__month')
\ No newline at end of file
+            count=Count('id'),
+            squares=Sum(
+                ExpressionWrapper(
+                    F('amount') * F('amount'),
+                    output_field=DecimalField(max_digits=24, decimal_places=4)
+                )
+            )
+        )
+
+        created = 0
+        with transaction.atomic():
+            rollups.delete()
+            batch = []
+            for row in grouped.iterator(chunk_size=cls.BATCH_SIZE):
+                batch.append(cls(
+                    user_id=row['user_id'],
+                    date=row['date'],
+                    category=row['category'],
+                    payment_method=row['payment_method'],
+                    total_amount=row['total'],
+                    expense_count=row['count'],
+                    sum_of_squares=row['squares']
+                ))
+                if len(batch) >= cls.BATCH_SIZE:
+                    cls.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            cls.objects.bulk_create(batch)
+            created += len(batch)
+        return created
+
+class ExpenseInsight(models.Model):
+    """Unusual expense or category spike found by the nightly insight scoring"""
+    AMOUNT_OUTLIER = 'amount_outlier'
+    CATEGORY_SPIKE = 'category_spike'
+
+    KIND_CHOICES = [
+        (AMOUNT_OUTLIER, 'Unusually large expense'),
+        (CATEGORY_SPIKE, 'Category spending spike'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_insights')
+    kind = models.CharField(choices=KIND_CHOICES, max_length=20)
+    # No database constraint: archiving moves expenses out with plain SQL,
+    # and the next scoring run replaces insights pointing at them
+    expense = models.ForeignKey(
+        Expenses,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='insights'
+    )
+    category = models.CharField(choices=Expenses.CATEGORY_CHOICES, max_length=20)
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    expected = models.DecimalField(max_digits=14, decimal_places=2)
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', '-score']
+        indexes = [
+            models.Index(fields=['user', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.category} {self.amount} on {self.date}"
+
+
+class RecurringExpense(models.Model):
+    """Expenses sharing a normalized description and amount band, with their gap statistics
+
+    Gaps between occurrences are kept as a running mean and sum of squared
+    deviations (Welford), so a new occurrence updates the series in place.
+    Series with fewer occurrences than a cadence needs stay stored with no
+    cadence until they qualify.
+    """
+    WEEKLY = 'WEEKLY'
+    MONTHLY = 'MONTHLY'
+    ANNUAL = 'ANNUAL'
+
+    CADENCE_CHOICES = [
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (ANNUAL, 'Annual'),
+    ]
+
+    # Cadence, typical gap in days and the number of gaps needed to call it
+    CADENCES = [
+        (WEEKLY, 7, 3),
+        (MONTHLY, 30.44, 2),
+        (ANNUAL, 365.25, 1),
+    ]
+    # Allowed relative difference of the mean gap and of its deviation
+    TOLERANCE = 0.15
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_expenses')
+    description_key = models.CharField(max_length=255)
+    amount_band = models.IntegerField()
+    description = models.CharField(max_length=255, blank=True)
+    category = models.CharField(choices=Expenses.CATEGORY_CHOICES, max_length=20)
+    cadence = models.CharField(choices=CADENCE_CHOICES, max_length=10, null=True, blank=True)
+    occurrences = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    last_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    first_date = models.DateField()
+    last_date = models.DateField()
+    gap_mean = models.FloatField(default=0)
+    gap_m2 = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-last_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'description_key', 'amount_band'],
+                name='recurring_expense_unique_key'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'cadence']),
+        ]
+
+    def __str__(self):
+        return f"{self.description or self.description_key} ({self.cadence or 'irregular'})"
+
+    @classmethod
+    def classify(cls, gap_count, gap_mean, gap_m2):
+        """Cadence whose typical gap matches the observed gaps, or None"""
+        if gap_count < 1:
+            return None
+        deviation = math.sqrt(gap_m2 / gap_count)
+        for cadence, days, min_gaps in cls.CADENCES:
+            if gap_count >= min_gaps \
+                    and abs(gap_mean - days) <= cls.TOLERANCE * days \
+                    and deviation <= cls.TOLERANCE * days:
+                return cadence
+        return None
+
+    def add_occurrence(self, date, amount, description, category):
+        """Extend the series with a later occurrence, updating the gap statistics"""
+        gap = (date - self.last_date).days
+        gap_count = self.occurrences
+        delta = gap - self.gap_mean
+        self.gap_mean += delta / gap_count
+        self.gap_m2 += delta * (gap - self.gap_mean)
+        self.occurrences += 1
+        self.total_amount += amount
+        self.last_amount = amount
+        self.last_date = date
+        self.description = description
+        self.category = category
+        self.cadence = self.classify(gap_count, self.gap_mean, self.gap_m2)
+
+    @property
+    def average_amount(self):
+        return (self.total_amount / self.occurrences).quantize(Decimal('0.01'))
+
+    @property
+    def next_expected_date(self):
+        if self.cadence is None:
+            return None
+        return self.last_date + timedelta(days=round(self.gap_mean))
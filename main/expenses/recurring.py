@@ -0,0 +1,206 @@
+import math
+import operator
+import re
+from functools import reduce
+from datetime import date
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Expenses, RecurringExpense
+
+NON_LETTERS_RE = re.compile(r'[^a-z]+')
+BAND_STEP = math.log(1.1)
+CENTS = Decimal('0.01')
+# Series recomputed together from one query
+MAX_BULK_REFRESHES = 20
+SERIES_FIELDS = [
+    'description', 'category', 'cadence', 'occurrences', 'total_amount', 'last_amount',
+    'first_date', 'last_date', 'gap_mean', 'gap_m2', 'updated_at'
+]
+
+COLUMNS = ('date', 'description', 'amount', 'category')
+
+
+def normalize_description(description):
+    """Lowercase letters only, so 'NETFLIX.COM *8841' and 'Netflix.com 1203' match"""
+    return ' '.join(NON_LETTERS_RE.sub(' ', description.lower()).split())[:255]
+
+
+def amount_band(amount):
+    """Amounts within about 10% of each other share a band"""
+    return math.floor(math.log(float(amount)) / BAND_STEP)
+
+
+def series_key(description, amount):
+    return normalize_description(description), amount_band(amount)
+
+
+def summarize(user_id, rows):
+    """Unsaved RecurringExpense objects for every group of two or more rows
+
+    ``rows`` are (date, description, amount, category) tuples in any order.
+    """
+    keys = {}
+    codes, picked = [], []
+    for index, (_, description, amount, _) in enumerate(rows):
+        key = series_key(description, amount)
+        if key[0]:
+            codes.append(keys.setdefault(key, len(keys)))
+            picked.append(index)
+    if not picked:
+        return []
+
+    codes = np.array(codes, dtype=np.int64)
+    picked = np.array(picked, dtype=np.int64)
+    days = np.fromiter((rows[i][0].toordinal() for i in picked), dtype=np.int64, count=len(picked))
+    cents = np.fromiter((int(rows[i][2] * 100) for i in picked), dtype=np.int64, count=len(picked))
+
+    order = np.lexsort((days, codes))
+    codes, days, cents, picked = codes[order], days[order], cents[order], picked[order]
+    group_count = len(keys)
+    counts = np.bincount(codes, minlength=group_count)
+    ends = np.cumsum(counts)
+
+    # Gaps between consecutive occurrences within the same group
+    same = codes[1:] == codes[:-1]
+    gaps = np.diff(days)[same].astype(np.float64)
+    gap_groups = codes[1:][same]
+    gap_counts = counts - 1
+    gap_means = np.divide(
+        np.bincount(gap_groups, weights=gaps, minlength=group_count), gap_counts,
+        out=np.zeros(group_count), where=gap_counts > 0
+    )
+    gap_m2 = np.bincount(
+        gap_groups, weights=(gaps - gap_means[gap_groups]) ** 2, minlength=group_count
+    )
+    totals = np.bincount(codes, weights=cents, minlength=group_count)
+
+    series = []
+    for (key, band), group in keys.items():
+        if counts[group] < 2:
+            continue
+        last_date, description, amount, category = rows[picked[ends[group] - 1]]
+        series.append(RecurringExpense(
+            user_id=user_id,
+            description_key=key,
+            amount_band=band,
+            description=description,
+            category=category,
+            cadence=RecurringExpense.classify(
+                int(gap_counts[group]), float(gap_means[group]), float(gap_m2[group])
+            ),
+            occurrences=int(counts[group]),
+            total_amount=Decimal(int(totals[group])) / 100,
+            last_amount=amount,
+            first_date=date.fromordinal(int(days[ends[group] - counts[group]])),
+            last_date=last_date,
+            gap_mean=float(gap_means[group]),
+            gap_m2=float(gap_m2[group])
+        ))
+    return series
+
+
+def history(user_id):
+    # The history view holds hot and archived rows; its filters reach both indexes
+    return Expenses.get_history_model().objects.filter(user_id=user_id)
+
+
+def save(series):
+    """Insert ``series``, overwriting any a concurrent write inserted since they were read"""
+    return RecurringExpense.objects.bulk_create(
+        series,
+        update_conflicts=True,
+        unique_fields=['user', 'description_key', 'amount_band'],
+        update_fields=SERIES_FIELDS
+    )
+
+
+def detect(user_id):
+    """Rescan a user's whole history in one query and replace their stored series"""
+    rows = list(history(user_id).order_by().values_list(*COLUMNS))
+    series = summarize(user_id, rows)
+    with transaction.atomic():
+        RecurringExpense.objects.filter(user_id=user_id).delete()
+        return save(series)
+
+
+def band_bounds(band):
+    low = Decimal(math.exp(band * BAND_STEP)).quantize(CENTS, ROUND_DOWN)
+    high = Decimal(math.exp((band + 1) * BAND_STEP)).quantize(CENTS, ROUND_UP)
+    return low, high
+
+
+def refresh(user_id, keys, stored=True):
+    """Recompute the series for (description_key, amount_band) ``keys`` in one query
+
+    Only expenses in the keys' amount bands are read, streamed so that only
+    the keys' own rows are held. Pass ``stored=False`` when none of the
+    series exist yet; one inserted meanwhile by a concurrent write is
+    overwritten rather than violating the unique key.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    in_bands = reduce(operator.or_, (
+        Q(amount__range=band_bounds(band)) for band in {band for _, band in keys}
+    ))
+    rows = [
+        row for row in history(user_id).filter(in_bands).order_by().values_list(*COLUMNS).iterator()
+        if series_key(row[1], row[2]) in keys
+    ]
+    series = summarize(user_id, rows)
+    with transaction.atomic():
+        if stored:
+            RecurringExpense.objects.filter(user_id=user_id).filter(reduce(operator.or_, (
+                Q(description_key=key, amount_band=band) for key, band in keys
+            ))).delete()
+        save(series)
+
+
+def record(user_id, expenses):
+    """Fold new expenses into the stored series
+
+    An expense dated on or after its series' last occurrence extends the
+    series in place; anything else (a first sighting or a backdated entry)
+    recomputes just that series.
+    """
+    grouped = {}
+    for expense in sorted(expenses, key=lambda expense: expense.date):
+        key = series_key(expense.description, expense.amount)
+        if key[0]:
+            grouped.setdefault(key, []).append(expense)
+    if not grouped:
+        return
+
+    with transaction.atomic():
+        stored = {
+            (series.description_key, series.amount_band): series
+            for series in RecurringExpense.objects.select_for_update().filter(
+                user_id=user_id,
+                description_key__in={key for key, _ in grouped}
+            )
+        }
+        now = timezone.now()
+        extended, stale = [], []
+        for key, new in grouped.items():
+            series = stored.get(key)
+            if series is None or new[0].date < series.last_date:
+                stale.append(key)
+                continue
+            for expense in new:
+                series.add_occurrence(
+                    expense.date, expense.amount, expense.description, expense.category
+                )
+            series.updated_at = now
+            extended.append(series)
+        RecurringExpense.objects.bulk_update(extended, [
+            'description', 'category', 'cadence', 'occurrences', 'total_amount',
+            'last_amount', 'last_date', 'gap_mean', 'gap_m2', 'updated_at'
+        ])
+
+    # Only the touched series are recomputed, however many an import touches
+    for offset in range(0, len(stale), MAX_BULK_REFRESHES):
+        chunk = stale[offset:offset + MAX_BULK_REFRESHES]
+        refresh(user_id, chunk, stored=any(key in stored for key in chunk))
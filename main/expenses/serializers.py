@@ -3,7 +3,7 @@ from django.utils import timezone
 from datetime import date
 from decimal import Decimal
 from django.utils.timezone import now
-from .models import Expenses
+from .models import Expenses, RecurringExpense
 
 class ExpenseSerializer(serializers.ModelSerializer):
     category_display = serializers.CharField(source='get_category_display', read_only=True)
@@ -49,4 +49,31 @@ class ExpenseSerializer(serializers.ModelSerializer):
     def validate_date(self, value):
         if value > timezone.now().date():
             raise serializers.ValidationError("Expense date cannot be in the future")
-        return value
\ No newline at end of file
+        return value
+
+
+class RecurringExpenseSerializer(serializers.ModelSerializer):
+    category_display = serializers.CharField(source='get_category_display', read_only=True)
+    cadence_display = serializers.CharField(source='get_cadence_display', read_only=True)
+    average_amount = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    average_gap_days = serializers.FloatField(source='gap_mean', read_only=True)
+    next_expected_date = serializers.DateField(read_only=True)
+
+    class Meta:
+        model = RecurringExpense
+        fields = [
+            'id',
+            'description',
+            'category',
+            'category_display',
+            'cadence',
+            'cadence_display',
+            'occurrences',
+            'average_amount',
+            'last_amount',
+            'first_date',
+            'last_date',
+            'average_gap_days',
+            'next_expected_date'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,123 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
+from main.cache import bump_data_version_on_commit
+from . import recurring
+from .models import Expenses, DailyExpenseRollup
+
+# Sent after Expenses.bulk_insert with the created instances, since
+# bulk_create() bypasses post_save
+expenses_bulk_created = Signal()
+
+TRACKED_FIELDS = ('user_id', 'date', 'category', 'payment_method', 'amount', 'description')
+
+
+def _current_values(instance):
+    return {field: getattr(instance, field) for field in TRACKED_FIELDS}
+
+
+def _loaded_row(instance):
+    loaded = getattr(instance, '_loaded_values', None)
+    if not loaded:
+        return None
+    return {field: loaded.get(field, getattr(instance, field)) for field in TRACKED_FIELDS}
+
+
+def previous_values(instance):
+    """Tracked values as they were in the database before the current save"""
+    return getattr(instance, '_previous_values', None)
+
+
+@receiver(pre_save, sender=Expenses)
+def remember_previous_values(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None
+    if not instance._state.adding:
+        previous = _loaded_row(instance)
+        if previous is None:
+            previous = sender.objects.filter(pk=instance.pk).values(*TRACKED_FIELDS).first()
+    instance._previous_values = previous
+    instance._loaded_values = _current_values(instance)
+
+
+@receiver(post_save, sender=Expenses)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = DailyExpenseRollup.collect_deltas([instance])
+    previous = previous_values(instance)
+    if previous is not None:
+        DailyExpenseRollup.collect_deltas([previous], sign=-1, deltas=deltas)
+    DailyExpenseRollup.apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=Expenses)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    row = _loaded_row(instance) or instance
+    DailyExpenseRollup.apply_deltas(
+        DailyExpenseRollup.collect_deltas([row], sign=-1)
+    )
+
+
+@receiver(expenses_bulk_created, sender=Expenses)
+def update_rollup_on_bulk_create(sender, instances, **kwargs):
+    DailyExpenseRollup.apply_deltas(
+        DailyExpenseRollup.collect_deltas(instances)
+    )
+
+
+@receiver(post_save, sender=Expenses)
+def bump_version_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = previous_values(instance)
+    user_ids = [instance.user_id]
+    if previous is not None:
+        user_ids.append(previous['user_id'])
+    bump_data_version_on_commit('expenses', user_ids)
+
+
+@receiver(post_delete, sender=Expenses)
+def bump_version_on_delete(sender, instance, **kwargs):
+    bump_data_version_on_commit('expenses', [instance.user_id])
+
+
+@receiver(expenses_bulk_created, sender=Expenses)
+def bump_version_on_bulk_create(sender, instances, **kwargs):
+    bump_data_version_on_commit('expenses', [expense.user_id for expense in instances])
+
+
+@receiver(post_save, sender=Expenses)
+def update_recurring_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = previous_values(instance)
+    if previous is None:
+        recurring.record(instance.user_id, [instance])
+        return
+    if previous == _current_values(instance):
+        return
+    stale = {}
+    for row in (previous, _current_values(instance)):
+        key = recurring.series_key(row['description'], row['amount'])
+        if key[0]:
+            stale.setdefault(row['user_id'], set()).add(key)
+    for user_id, keys in stale.items():
+        recurring.refresh(user_id, keys)
+
+
+@receiver(post_delete, sender=Expenses)
+def update_recurring_on_delete(sender, instance, **kwargs):
+    row = _loaded_row(instance) or _current_values(instance)
+    key = recurring.series_key(row['description'], row['amount'])
+    if key[0]:
+        recurring.refresh(row['user_id'], [key])
+
+
+@receiver(expenses_bulk_created, sender=Expenses)
+def update_recurring_on_bulk_create(sender, instances, **kwargs):
+    by_user = {}
+    for expense in instances:
+        by_user.setdefault(expense.user_id, []).append(expense)
+    for user_id, expenses in by_user.items():
+        recurring.record(user_id, expenses)
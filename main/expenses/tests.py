@@ -1,3 +1,672 @@
-from django.test import TestCase
+import random
+import statistics
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from income.models import Income
+from income.tests import seed_income
+from main.cache import bump_data_version, get_cache, get_data_version
+from main.search import ContainsSearchBackend, SQLiteFTS5Backend, get_backend
+from main.series import bucket_range, bucket_start
+from main.testing import QueryBudgetTestCase
+from . import recurring
+from .importers import AMBIGUOUS_DATE_ERROR, StatementImporter
+from .insights import InsightEngine
+from .models import Expenses, DailyExpenseRollup, ExpenseInsight, ExpensesArchive, RecurringExpense
 
-# Create your tests here.
+CATEGORIES = [code for code, _ in Expenses.CATEGORY_CHOICES]
+PAYMENT_METHODS = [code for code, _ in Expenses.PAYMENT_METHOD_CHOICES]
+
+
+def seed_expenses(user, count=600, days=540, seed=1):
+    """Spread ``count`` expenses over the last ``days`` days"""
+    rng = random.Random(seed)
+    today = date.today()
+    return Expenses.bulk_insert([
+        Expenses(
+            user=user,
+            amount=Decimal(rng.randint(100, 20000)) / 100,
+            category=rng.choice(CATEGORIES),
+            payment_method=rng.choice(PAYMENT_METHODS),
+            description=rng.choice(['Coffee shop', 'Groceries', 'Monthly rent', 'Train ticket', '']),
+            date=today - timedelta(days=rng.randrange(days))
+        )
+        for _ in range(count)
+    ])
+
+
+@override_settings(ROOT_URLCONF='expenses.urls')
+class ExpensesViewSetQueryTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('spender', password='x')
+        cls.other = User.objects.create_user('other', password='x')
+        seed_expenses(cls.user)
+        seed_expenses(cls.other, count=200, seed=2)
+        cls.expense = Expenses.objects.filter(user=cls.user).first()
+
+    def payload(self, **overrides):
+        return {
+            'amount': '12.50',
+            'category': Expenses.FOOD,
+            'payment_method': Expenses.CASH,
+            'description': 'Lunch',
+            'date': date.today().isoformat(),
+            **overrides
+        }
+
+    def test_list(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/expenses/', {'date__gte': date.today() - timedelta(days=30)})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Expenses, ['user', 'date'])
+
+    def test_list_by_category(self):
+        with self.assertMaxQueries(1) as captured:
+            response = self.client.get('/expenses/', {'category': Expenses.FOOD})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(row['category'] == Expenses.FOOD for row in response.data['results']))
+        self.assertUsesIndex(captured, Expenses, ['user'])
+
+    def test_list_reaching_archive(self):
+        cutoff = date.today() - timedelta(days=365)
+        hot = Expenses.objects.filter(user=self.user, date__gte=cutoff).count()
+        archived = Expenses.archive_before(cutoff)
+        self.assertGreater(archived, 0)
+
+        response = self.client.get('/expenses/', {'date__gte': cutoff, 'page_size': 500})
+        self.assertEqual(len(response.data['results']), hot)
+        with self.assertMaxQueries(2):
+            response = self.client.get('/expenses/', {'date__lte': cutoff, 'page_size': 500})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.data['results']),
+            Expenses.get_history_model().objects.filter(user=self.user, date__lte=cutoff).count()
+        )
+
+    def test_list_next_page(self):
+        response = self.client.get('/expenses/', {'page_size': 20})
+        with self.assertMaxQueries(1):
+            response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_search(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get('/expenses/', {'search': 'coff'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all('Coffee' in row['description'] for row in response.data['results']))
+
+    def test_retrieve(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(f'/expenses/{self.expense.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    # Writes run every receiver inside the request's transaction, so each
+    # count is pinned with its parts: the write itself, the daily rollup,
+    # recurring series, budget spent counters and alert evaluation. Cache
+    # version bumps run after commit.
+
+    def test_create(self):
+        # Insert; rollup read and insert; series lock and band refresh;
+        # counter update; changed-level read
+        with self.assertExactQueries(1 + 2 + 2 + 1 + 1):
+            response = self.client.post('/expenses/', self.payload(), format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_update(self):
+        # Moves the spend between two budget categories. Read and update;
+        # rollup read, insert of the new day-category and delete of the old;
+        # band refresh and delete of the emptied series; one counter update
+        # per category; changed-level read
+        with self.assertExactQueries(2 + 3 + 2 + 2 + 1):
+            response = self.client.put(
+                f'/expenses/{self.expense.pk}/',
+                self.payload(category=Expenses.TRAVEL),
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_partial_update(self):
+        # Read and update; rollup read and update; band refresh, delete and
+        # reinsert of the series; counter update; changed-level read
+        with self.assertExactQueries(2 + 2 + 3 + 1 + 1):
+            response = self.client.patch(
+                f'/expenses/{self.expense.pk}/', {'amount': '99.00'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_destroy(self):
+        # Read, cascade to its outlier insight and delete; rollup read and
+        # delete; band refresh and series delete; counter update; changed-level read
+        with self.assertExactQueries(3 + 2 + 2 + 1 + 1):
+            response = self.client.delete(f'/expenses/{self.expense.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_bulk(self):
+        rows = [self.payload(amount=f'{n + 1}.00') for n in range(250)]
+        # Three insert batches; rollup read and insert; series lock, then the
+        # 43 amount bands refreshed 20 per query, each with its insert; counter
+        # update; changed-level read
+        with self.assertExactQueries(3 + 2 + 1 + 3 * 2 + 1 + 1):
+            response = self.client.post('/expenses/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 250)
+
+    def test_import(self):
+        lines = ['date,amount,description'] + [
+            f'{date.today() - timedelta(days=n)},-{n + 1}.25,Card payment {n}' for n in range(100)
+        ]
+        upload = SimpleUploadedFile('statement.csv', '\n'.join(lines).encode('utf-8'))
+        # One insert batch; rollup read, insert and update; series lock and two
+        # band refreshes with their inserts; budget windows read (this user has
+        # none, so no counter update follows); changed-level read
+        with self.assertExactQueries(1 + 3 + 1 + 2 * 2 + 1 + 1):
+            response = self.client.post('/expenses/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+    def test_export(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/expenses/export/', {'date__gte': date.today() - timedelta(days=90)})
+            body = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body.startswith(b'id,amount'))
+        self.assertUsesIndex(captured, Expenses, ['user', 'date'])
+
+    def test_category_summary(self):
+        with self.assertMaxQueries(1) as captured:
+            response = self.client.get('/expenses/category_summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, DailyExpenseRollup, ['user', 'date'])
+
+    def test_payment_method_summary(self):
+        with self.assertMaxQueries(1) as captured:
+            response = self.client.get('/expenses/payment_method_summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, DailyExpenseRollup, ['user', 'date'])
+
+    def test_monthly_comparison(self):
+        with self.assertMaxQueries(1) as captured:
+            response = self.client.get('/expenses/monthly_comparison/', {'months': 6})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, DailyExpenseRollup, ['user', 'date'])
+
+    def test_series(self):
+        with self.assertMaxQueries(1) as captured:
+            response = self.client.get('/expenses/series/', {'bucket': 'week', 'breakdown': 'category'})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, DailyExpenseRollup, ['user', 'date'])
+
+    def test_trends(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/expenses/trends/', {'months': 12})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Expenses, ['user', 'date'])
+
+    def test_trends_unknown_metric(self):
+        response = self.client.get('/expenses/trends/', {'metrics': 'total_spent,median'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("'median'", response.data['detail'])
+
+    def test_cached_analytics(self):
+        self.client.get('/expenses/category_summary/')
+        with self.assertMaxQueries(0):
+            response = self.client.get('/expenses/category_summary/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_invalidate_once_committed(self):
+        cached = self.client.get('/expenses/category_summary/').data
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post('/expenses/', {
+                'amount': '12.50', 'category': Expenses.FOOD,
+                'payment_method': Expenses.CASH, 'date': date.today().isoformat()
+            })
+            # Until the write commits, readers keep the cached data
+            self.assertEqual(self.client.get('/expenses/category_summary/').data, cached)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.client.get('/expenses/category_summary/').data, cached)
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'responses'},
+            'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'versions'},
+        },
+        DATA_VERSION_CACHE_ALIAS='versions'
+    )
+    def test_data_versions_live_apart_from_responses(self):
+        version = get_data_version('expenses', self.user.pk)
+        # Another process's response cache starts empty but reads the same versions
+        get_cache().clear()
+        self.assertEqual(get_data_version('expenses', self.user.pk), version)
+        bump_data_version('expenses', self.user.pk)
+        self.assertIsNone(get_cache().get(f'data-version:expenses:{self.user.pk}'))
+        self.assertNotEqual(get_data_version('expenses', self.user.pk), version)
+
+    def test_insights(self):
+        outlier = Expenses.objects.create(
+            user=self.user,
+            amount=Decimal('9000.00'),
+            category=Expenses.HEALTHCARE,
+            payment_method=Expenses.CREDIT_CARD,
+            date=date.today() - timedelta(days=3)
+        )
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/expenses/insights/', {'days': 180})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(outlier.pk, [row['expense_id'] for row in response.data['insights']])
+        self.assertUsesIndex(captured, Expenses, ['user', 'date'])
+
+
+class InsightEngineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{n}', password='x') for n in range(3)]
+        for n, user in enumerate(cls.users):
+            seed_expenses(user, count=300, days=360, seed=n)
+
+    def test_batch_matches_per_user_scoring(self):
+        engine = InsightEngine(days=365)
+        batch = engine.for_users([user.pk for user in self.users])
+        for user in self.users:
+            self.assertEqual(
+                engine.for_user(user),
+                [insight for insight in batch if insight['user_id'] == user.pk]
+            )
+
+    def test_flags_weekly_spike(self):
+        user = self.users[0]
+        # A steady weekly course fee, then a large one-off payment today
+        Expenses.bulk_insert([
+            Expenses(
+                user=user,
+                amount=Decimal('800.00') if week == 0 else Decimal('40.00'),
+                category=Expenses.EDUCATION,
+                payment_method=Expenses.DEBIT_CARD,
+                date=date.today() - timedelta(weeks=week)
+            )
+            for week in range(12)
+        ])
+        spikes = [
+            insight for insight in InsightEngine().for_user(user)
+            if insight['kind'] == ExpenseInsight.CATEGORY_SPIKE
+        ]
+        self.assertIn(Expenses.EDUCATION, [spike['category'] for spike in spikes])
+
+    def test_score_command_replaces_stored_insights(self):
+        call_command('score_expense_insights', chunk_size=2, stdout=StringIO())
+        stored = ExpenseInsight.objects.count()
+        self.assertGreater(stored, 0)
+        call_command('score_expense_insights', chunk_size=2, stdout=StringIO())
+        self.assertEqual(ExpenseInsight.objects.count(), stored)
+
+
+class SearchBackendTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('searcher', password='x')
+        cls.expenses = Expenses.bulk_insert([
+            Expenses(
+                user=cls.user, amount=Decimal('5.00'), category=Expenses.FOOD,
+                payment_method=Expenses.CASH, description=description, date=date.today()
+            )
+            for description in ['Coffee beans', 'Café latte', 'Corner coffee shop', 'Bus ticket', 'Toffee']
+        ])
+
+    def search(self, *terms, backend=None):
+        backend = backend or get_backend()
+        queryset = Expenses.objects.filter(user=self.user)
+        return sorted(backend.search(queryset, ['description'], terms).values_list('description', flat=True))
+
+    def test_sqlite_uses_the_fts_index(self):
+        backend = get_backend()
+        self.assertIsInstance(backend, SQLiteFTS5Backend)
+        self.assertTrue(backend.is_installed(Expenses.objects.all()))
+
+    def test_prefix_words_must_all_match(self):
+        # Words match from their start, so 'toffee' is not a 'coff' match
+        self.assertEqual(self.search('coff'), ['Coffee beans', 'Corner coffee shop'])
+        self.assertEqual(self.search('coffee sh'), ['Corner coffee shop'])
+        self.assertEqual(self.search('coffee', 'bus'), [])
+        # Accents are folded, as the tokenizer is built with remove_diacritics
+        self.assertEqual(self.search('cafe'), ['Café latte'])
+        # Terms without words leave the queryset alone
+        self.assertEqual(len(self.search('%')), len(self.expenses))
+
+    def test_index_follows_writes(self):
+        bus = Expenses.objects.get(user=self.user, description='Bus ticket')
+        bus.description = 'Train ticket'
+        bus.save()
+        self.assertEqual(self.search('bus'), [])
+        self.assertEqual(self.search('train'), ['Train ticket'])
+        Expenses.objects.filter(user=self.user, description='Toffee').update(description='Tea')
+        self.assertEqual(self.search('tea'), ['Tea'])
+        Expenses.objects.filter(user=self.user, description__startswith='Coffee').delete()
+        self.assertEqual(self.search('coffee'), ['Corner coffee shop'])
+
+    def test_scope_is_matched_inside_the_index(self):
+        neighbour = User.objects.create_user('neighbour', password='x')
+        Expenses.objects.create(
+            user=neighbour, amount=Decimal('5.00'), category=Expenses.FOOD,
+            payment_method=Expenses.CASH, description='Coffee beans', date=date.today()
+        )
+        backend = get_backend()
+        everyone = backend.search(Expenses.objects.all(), ['description'], ['coffee'])
+        self.assertEqual(everyone.count(), 3)
+        scoped = backend.search(
+            Expenses.objects.all(), ['description'], ['coffee'], scope={'user_id': neighbour.pk}
+        )
+        self.assertEqual(list(scoped.values_list('user_id', flat=True)), [neighbour.pk])
+        self.assertIn('AND user_id = ', str(scoped.query))
+
+    def test_fallback_without_index(self):
+        backend = SQLiteFTS5Backend()
+        backend._installed[('default', Expenses._meta.db_table)] = False
+        # The fallback matches substrings, as DRF's SearchFilter does
+        self.assertEqual(
+            self.search('offee', backend=backend),
+            self.search('offee', backend=ContainsSearchBackend())
+        )
+        self.assertEqual(self.search('offee', backend=backend), ['Coffee beans', 'Corner coffee shop', 'Toffee'])
+
+
+class SpendingSeriesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('charted', password='x')
+        seed_expenses(cls.user, count=300, days=120)
+        cls.end_date = date.today()
+        cls.start_date = cls.end_date - timedelta(days=90)
+
+    def expected(self, bucket):
+        totals = {}
+        for expense in Expenses.objects.filter(user=self.user, date__range=[self.start_date, self.end_date]):
+            total, count = totals.get(bucket_start(expense.date, bucket), (Decimal('0'), 0))
+            totals[bucket_start(expense.date, bucket)] = (total + expense.amount, count + 1)
+        return totals
+
+    def test_bucket_values(self):
+        for bucket in ('day', 'week', 'month'):
+            with self.subTest(bucket=bucket):
+                series = Expenses.get_spending_series(
+                    self.user, self.start_date, self.end_date, bucket=bucket, breakdown='category'
+                )
+                # Database truncation agrees with bucket_start: weeks from Monday, months from the 1st
+                self.assertEqual(
+                    [point['period'] for point in series],
+                    list(bucket_range(self.start_date, self.end_date, bucket))
+                )
+                self.assertEqual(
+                    {point['period']: (point['total'], point['count']) for point in series if point['count']},
+                    self.expected(bucket)
+                )
+                for point in series:
+                    self.assertEqual(sum(point['by_category'].values()), point['total'])
+
+
+class DailyExpenseRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rolled', password='x')
+        seed_expenses(cls.user, count=300, days=60)
+
+    def test_category_summary_matches_expenses(self):
+        start_date, end_date = date.today() - timedelta(days=30), date.today()
+        amounts = {}
+        for expense in Expenses.objects.filter(user=self.user, date__range=[start_date, end_date]):
+            amounts.setdefault(expense.category, []).append(expense.amount)
+        summary = Expenses.get_category_summary(self.user, start_date, end_date)
+        self.assertEqual({row['category'] for row in summary}, set(amounts))
+        for row in summary:
+            values = amounts[row['category']]
+            self.assertEqual((row['total'], row['count']), (sum(values), len(values)))
+            self.assertAlmostEqual(float(row['stddev']), float(statistics.pstdev(values)), places=1)
+
+    def test_concurrent_first_write_is_retried(self):
+        key = (self.user.pk, date.today() + timedelta(days=1), Expenses.FOOD, Expenses.CASH)
+        # Another write inserts the key after this one selected the rows
+        DailyExpenseRollup.apply_deltas({key: [Decimal('5.00'), 1, Decimal('25')]})
+        selections = [DailyExpenseRollup.objects.none()]
+        select_for_update = DailyExpenseRollup.objects.select_for_update
+        with patch.object(
+            DailyExpenseRollup.objects, 'select_for_update',
+            side_effect=lambda: selections.pop() if selections else select_for_update()
+        ):
+            DailyExpenseRollup.apply_deltas({key: [Decimal('7.00'), 1, Decimal('49')]})
+        row = DailyExpenseRollup.objects.get(user=self.user, date=key[1])
+        self.assertEqual((row.total_amount, row.expense_count, row.sum_of_squares), (12, 2, 74))
+
+
+class ArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{n}', password='x') for n in range(2)]
+        for n, user in enumerate(cls.users):
+            seed_expenses(user, count=200, days=720, seed=n)
+            seed_income(user, count=100, days=720, seed=n)
+        cls.cutoff = date.today() - timedelta(days=365)
+
+    def rows(self, model):
+        return sorted(model.objects.values_list(
+            'id', 'user_id', 'amount', 'category', 'description', 'date', 'payment_method', 'created_at'
+        ))
+
+    def test_round_trip_through_history(self):
+        before = self.rows(Expenses)
+        versions = [get_data_version('expenses', user.pk) for user in self.users]
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = Expenses.archive_before(self.cutoff, batch_size=50)
+        self.assertEqual(moved, sum(row[5] < self.cutoff for row in before))
+        self.assertFalse(Expenses.objects.filter(date__lt=self.cutoff).exists())
+        self.assertFalse(ExpensesArchive.objects.filter(date__gte=self.cutoff).exists())
+        # Every row comes back unchanged through the history view
+        self.assertEqual(self.rows(Expenses.get_history_model()), before)
+        self.assertIs(Expenses.tier_for(self.users[0], self.cutoff), Expenses)
+        self.assertIs(
+            Expenses.tier_for(self.users[0], self.cutoff - timedelta(days=1)), Expenses.get_history_model()
+        )
+        # Cached reads of the hot table are invalidated for every affected user
+        for user, version in zip(self.users, versions):
+            self.assertNotEqual(get_data_version('expenses', user.pk), version)
+        self.assertEqual(Expenses.archive_before(self.cutoff), 0)
+
+    def test_command_archives_income_too(self):
+        total = Income.objects.count()
+        call_command('archive_old_records', before=self.cutoff.isoformat(), batch_size=64, stdout=StringIO())
+        self.assertFalse(Income.objects.filter(date__lt=self.cutoff).exists())
+        self.assertEqual(Income.get_history_model().objects.count(), total)
+        self.assertEqual(Income.get_archive_model().objects.count() + Income.objects.count(), total)
+
+
+@override_settings(ROOT_URLCONF='expenses.urls')
+class RecurringExpenseTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('subscriber', password='x')
+        seed_expenses(cls.user, count=200, days=360)
+
+    def subscribe(self, months, description='NETFLIX.COM *{n}', amount='15.49', start=None):
+        start = start or date.today() - relativedelta(months=months)
+        return [
+            Expenses.objects.create(
+                user=self.user,
+                amount=Decimal(amount),
+                category=Expenses.ENTERTAINMENT,
+                payment_method=Expenses.CREDIT_CARD,
+                description=description.format(n=8000 + n),
+                date=start + relativedelta(months=n)
+            )
+            for n in range(months)
+        ]
+
+    def stored(self):
+        return {
+            (series.description_key, series.amount_band): (
+                series.cadence, series.occurrences, series.total_amount,
+                series.first_date, series.last_date, round(series.gap_mean, 6), round(series.gap_m2, 6)
+            )
+            for series in RecurringExpense.objects.filter(user=self.user)
+        }
+
+    def test_detects_monthly_subscription(self):
+        self.subscribe(6)
+        series = RecurringExpense.objects.get(user=self.user, description_key='netflix com')
+        self.assertEqual(series.cadence, RecurringExpense.MONTHLY)
+        self.assertEqual(series.occurrences, 6)
+        self.assertEqual(series.total_amount, Decimal('92.94'))
+
+    def test_incremental_updates_match_full_rescan(self):
+        expenses = self.subscribe(8)
+        expenses[3].delete()
+        expenses[5].amount = Decimal('15.99')
+        expenses[5].save()
+        self.subscribe(3, description='Gym membership', amount='30.00')
+        incremental = self.stored()
+        recurring.detect(self.user.pk)
+        self.assertEqual(incremental, self.stored())
+
+    def test_bulk_insert_refreshes_only_touched_series(self):
+        names = [f'Service {a}{b}' for a in 'abcde' for b in 'abcdef']
+        self.assertGreater(len(names), recurring.MAX_BULK_REFRESHES)
+        Expenses.bulk_insert([
+            Expenses(
+                user=self.user, amount=Decimal('9.99'), category=Expenses.UTILITIES,
+                payment_method=Expenses.CREDIT_CARD, description=name,
+                date=date.today() - relativedelta(months=n)
+            )
+            for name in names for n in range(3)
+        ])
+        incremental = self.stored()
+        self.assertTrue(all((name.lower(), recurring.amount_band(Decimal('9.99'))) in incremental for name in names))
+        recurring.detect(self.user.pk)
+        self.assertEqual(incremental, self.stored())
+
+    def test_refresh_overwrites_series_inserted_concurrently(self):
+        expenses = self.subscribe(3)
+        key = recurring.series_key(expenses[0].description, expenses[0].amount)
+        # As if another write stored the series after this one found it missing
+        recurring.refresh(self.user.pk, [key], stored=False)
+        series = RecurringExpense.objects.get(user=self.user, description_key=key[0], amount_band=key[1])
+        self.assertEqual(series.occurrences, 3)
+
+    def test_recurring_action(self):
+        self.subscribe(4)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertNumQueries(1):
+            response = client.get('/expenses/recurring/', {'cadence': 'monthly'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['description'], 'NETFLIX.COM *8003')
+        # The last charge was a month ago, so the next one is due about now
+        next_date = date.fromisoformat(response.data[0]['next_expected_date'])
+        self.assertLessEqual(abs((next_date - date.today()).days), 3)
+
+
+class StatementImporterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('importer', password='x')
+
+    def run_import(self, lines, **options):
+        importer = StatementImporter(self.user, 'csv', **options)
+        return importer.run(BytesIO('\n'.join(lines).encode('utf-8')))
+
+    def counts(self, stats):
+        return stats['rows_read'], stats['imported'], stats['skipped'], stats['failed']
+
+    def test_debit_credit_columns(self):
+        stats = self.run_import([
+            'Date,Description,Debit,Credit',
+            '2026-01-05,Coffee shop,4.50,',
+            '2026-01-06,Salary,,2500.00',
+            '2026-01-07,Refund,,(12.00)',
+            'yesterday,Grocer,20.00,',
+        ])
+        # Credits are skipped, not failed; only the undated debit fails
+        self.assertEqual(self.counts(stats), (4, 1, 2, 1))
+        self.assertEqual([error['line'] for error in stats['errors']], [5])
+        expense = Expenses.objects.get(user=self.user)
+        self.assertEqual((expense.amount, expense.category), (Decimal('4.50'), Expenses.FOOD))
+
+    def test_signed_amounts(self):
+        lines = [
+            'date,amount,description',
+            '2026-01-05,-30.00,Uber trip',
+            '2026-01-06,45.00,Deposit',
+            '2026-01-07,,Blank amount',
+        ]
+        self.assertEqual(self.counts(self.run_import(lines)), (3, 1, 1, 1))
+        self.assertEqual(Expenses.objects.get(user=self.user).amount, Decimal('30.00'))
+        # Statements that list debits as positive amounts skip the negative rows instead
+        self.assertEqual(self.counts(self.run_import(lines, debits_negative=False)), (3, 1, 1, 1))
+        self.assertEqual(
+            sorted(Expenses.objects.filter(user=self.user).values_list('amount', flat=True)),
+            [Decimal('30.00'), Decimal('45.00')]
+        )
+
+    def test_categories_match_whole_words(self):
+        importer = StatementImporter(self.user, 'csv')
+        for description, category in [
+            ('Monthly rent', Expenses.HOUSING),
+            ('Current account fee', Expenses.MISCELLANEOUS),
+            ('SPAR express', Expenses.MISCELLANEOUS),
+            ('Day spa voucher', Expenses.PERSONAL_CARE),
+            ('Corner groceries', Expenses.FOOD),
+            ('BOOKING.COM hotel', Expenses.TRAVEL),
+        ]:
+            with self.subTest(description=description):
+                self.assertEqual(importer.map_category({'description': description}), category)
+
+    def test_date_order_is_read_from_the_file(self):
+        header = 'date,amount,description'
+        self.run_import([header, '03/04/2026,-1.00,First', '25/04/2026,-2.00,Second'])
+        self.run_import([header, '03/05/2026,-3.00,Third', '04/25/2026,-4.00,Fourth'])
+        self.assertEqual(
+            dict(Expenses.objects.filter(user=self.user).values_list('description', 'date')),
+            {
+                'First': date(2026, 4, 3), 'Second': date(2026, 4, 25),
+                'Third': date(2026, 3, 5), 'Fourth': date(2026, 4, 25),
+            }
+        )
+
+    def test_ambiguous_dates_need_a_date_format(self):
+        lines = ['date,amount,description', '03/04/2026,-1.00,Coffee', '05/06/2026,-2.00,Tea']
+        stats = self.run_import(lines)
+        self.assertEqual(self.counts(stats), (2, 0, 0, 2))
+        self.assertEqual(stats['errors'][0]['errors'], {'date': [AMBIGUOUS_DATE_ERROR]})
+        self.assertEqual(self.counts(self.run_import(lines, date_format='%m/%d/%Y')), (2, 2, 0, 0))
+        self.assertEqual(Expenses.objects.get(user=self.user, description='Tea').date, date(2026, 5, 6))
+
+    def test_failed_batch_rolls_back_the_import(self):
+        lines = ['date,amount,description'] + [f'2026-01-0{n},-1.00,Row {n}' for n in range(1, 5)]
+        importer = StatementImporter(self.user, 'csv')
+        importer.batch_size = 2
+        bulk_insert = Expenses.bulk_insert
+        batches = []
+
+        def fail_second(expenses, **kwargs):
+            batches.append(expenses)
+            if len(batches) == 2:
+                raise DatabaseError('connection lost')
+            return bulk_insert(expenses, **kwargs)
+
+        with patch.object(Expenses, 'bulk_insert', side_effect=fail_second):
+            with self.assertRaises(DatabaseError):
+                importer.run(BytesIO('\n'.join(lines).encode('utf-8')))
+        self.assertFalse(Expenses.objects.filter(user=self.user).exists())
@@ -0,0 +1,195 @@
+from abc import ABC, abstractmethod
+from decimal import Decimal
+
+
+class Metric(ABC):
+    """Accumulates one trend value while the engine streams expense rows"""
+
+    @abstractmethod
+    def add(self, row):
+        """Fold one row into the running value"""
+
+    @abstractmethod
+    def result(self):
+        """The metric's value once every row has been added"""
+
+
+class TotalSpent(Metric):
+    def __init__(self):
+        self.total = Decimal('0')
+
+    def add(self, row):
+        self.total += row.amount
+
+    def result(self):
+        return self.total
+
+
+class AverageMonthly(Metric):
+    def __init__(self):
+        self.months = {}
+
+    def add(self, row):
+        key = (row.date.year, row.date.month)
+        self.months[key] = self.months.get(key, Decimal('0')) + row.amount
+
+    def result(self):
+        if not self.months:
+            return 0
+        return sum(self.months.values()) / len(self.months)
+
+
+class HighestCategory(Metric):
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, row):
+        self.totals[row.category] = self.totals.get(row.category, Decimal('0')) + row.amount
+
+    def result(self):
+        if not self.totals:
+            return None
+        category = max(self.totals, key=self.totals.get)
+        return {'category': category, 'total': self.totals[category]}
+
+
+class MostUsedPayment(Metric):
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, row):
+        self.counts[row.payment_method] = self.counts.get(row.payment_method, 0) + 1
+
+    def result(self):
+        if not self.counts:
+            return None
+        method = max(self.counts, key=self.counts.get)
+        return {'payment_method': method, 'count': self.counts[method]}
+
+
+class LargestExpense(Metric):
+    def __init__(self):
+        self.largest = None
+
+    def add(self, row):
+        if self.largest is None or row.amount > self.largest.amount:
+            self.largest = row
+
+    def result(self):
+        if self.largest is None:
+            return None
+        return {
+            'amount': self.largest.amount,
+            'category': self.largest.category,
+            'date': self.largest.date,
+            'description': self.largest.description,
+        }
+
+
+class TransactionCount(Metric):
+    def __init__(self):
+        self.count = 0
+
+    def add(self, row):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+
+class AverageTransaction(Metric):
+    def __init__(self):
+        self.total = Decimal('0')
+        self.count = 0
+
+    def add(self, row):
+        self.total += row.amount
+        self.count += 1
+
+    def result(self):
+        return self.total / self.count if self.count else 0
+
+
+class CategoryTotals(Metric):
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, row):
+        self.totals[row.category] = self.totals.get(row.category, Decimal('0')) + row.amount
+
+    def result(self):
+        return dict(sorted(self.totals.items(), key=lambda item: item[1], reverse=True))
+
+
+class PaymentMethodTotals(Metric):
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, row):
+        self.totals[row.payment_method] = (
+            self.totals.get(row.payment_method, Decimal('0')) + row.amount
+        )
+
+    def result(self):
+        return dict(sorted(self.totals.items(), key=lambda item: item[1], reverse=True))
+
+
+class BusiestWeekday(Metric):
+    def __init__(self):
+        self.totals = [Decimal('0')] * 7
+
+    def add(self, row):
+        self.totals[row.date.weekday()] += row.amount
+
+    def result(self):
+        if not any(self.totals):
+            return None
+        weekday = max(range(7), key=self.totals.__getitem__)
+        return {'weekday': weekday, 'total': self.totals[weekday]}
+
+
+METRICS = {
+    'total_spent': TotalSpent,
+    'average_monthly': AverageMonthly,
+    'highest_category': HighestCategory,
+    'most_used_payment': MostUsedPayment,
+    'largest_expense': LargestExpense,
+    'transaction_count': TransactionCount,
+    'average_transaction': AverageTransaction,
+    'category_totals': CategoryTotals,
+    'payment_method_totals': PaymentMethodTotals,
+    'busiest_weekday': BusiestWeekday,
+}
+
+DEFAULT_METRICS = [
+    'total_spent',
+    'average_monthly',
+    'highest_category',
+    'most_used_payment',
+    'largest_expense',
+]
+
+
+class TrendEngine:
+    """Computes every requested metric in one streamed pass over a queryset"""
+    columns = ('amount', 'category', 'payment_method', 'date', 'description')
+    chunk_size = 2000
+
+    def __init__(self, metrics=None):
+        names = list(DEFAULT_METRICS)
+        for name in metrics or []:
+            if name not in METRICS:
+                raise KeyError(name)
+            if name not in names:
+                names.append(name)
+        self.metrics = {name: METRICS[name]() for name in names}
+        self.row_count = 0
+
+    def run(self, queryset):
+        rows = queryset.order_by().values_list(*self.columns, named=True)
+        accumulators = list(self.metrics.values())
+        for row in rows.iterator(chunk_size=self.chunk_size):
+            self.row_count += 1
+            for metric in accumulators:
+                metric.add(row)
+        return {name: metric.result() for name, metric in self.metrics.items()}
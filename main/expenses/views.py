@@ -2,35 +2,135 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Sum, Avg
 from dateutil.relativedelta import relativedelta
 import calendar
-from .serializers import ExpenseSerializer
-from .models import Expenses
-from django.db import models
+from .serializers import ExpenseSerializer, RecurringExpenseSerializer
+from .models import Expenses, RecurringExpense
+from .trends import TrendEngine, METRICS
+from .insights import InsightEngine
+from .importers import StatementImporter, PARSERS
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from main.archive import requested_start_date
+from main.cache import cache_per_user
+from main.exports import StreamingExportMixin
+from main.pagination import KeysetPagination
+from main.serializers import FastListMixin
+from main.series import parse_series_params
+from main.search import FullTextSearchFilter
 
-class ExpensesViewSet(viewsets.ModelViewSet):
+class ExpensesViewSet(FastListMixin, StreamingExportMixin, viewsets.ModelViewSet):
     
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    filterset_fields = ['category', 'payment_method', 'date']
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
+    filterset_fields = {
+        'category': ['exact'],
+        'payment_method': ['exact'],
+        'date': ['exact', 'gte', 'lte'],
+    }
     search_fields = ['description']
     ordering_fields = ['date', 'amount', 'category']
     ordering = ['-date']
+    bulk_max_rows = 10000
+    export_filename = 'expenses'
 
     def get_queryset(self):
-        return Expenses.objects.filter(user=self.request.user)
+        model = Expenses
+        # Reads only include archived rows when the date filter reaches them
+        if self.action in ('list', 'export'):
+            model = Expenses.tier_for(
+                self.request.user,
+                requested_start_date(self.request.query_params)
+            )
+        return model.objects.filter(user=self.request.user)
 
+    @transaction.atomic
     def perform_create(self, serializer):
         expense = serializer.save(user=self.request.user)
         return Response(ExpenseSerializer(expense).data)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        if not isinstance(request.data, list):
+            return Response(
+                {"detail": "Expected a list of expenses."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > self.bulk_max_rows:
+            return Response(
+                {"detail": f"At most {self.bulk_max_rows} expenses can be created per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Validate every row up front so nothing is written unless all rows pass
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            errors = [
+                {'index': index, 'errors': row_errors}
+                for index, row_errors in enumerate(serializer.errors)
+                if row_errors
+            ]
+            return Response(
+                {'created': 0, 'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        created = Expenses.bulk_insert([
+            Expenses(user=request.user, **attrs)
+            for attrs in serializer.validated_data
+        ])
+        return Response(
+            {'created': len(created), 'ids': [expense.pk for expense in created], 'errors': []},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        parser_classes=[MultiPartParser, FormParser]
+    )
+    def import_statement(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {"detail": "Upload the statement as the 'file' field."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file_format = request.data.get(
+            'file_format', upload.name.rsplit('.', 1)[-1]
+        ).lower()
+        if file_format not in PARSERS:
+            return Response(
+                {"detail": f"Unsupported statement format. Use one of: {', '.join(PARSERS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        importer = StatementImporter(
+            request.user,
+            file_format,
+            debits_negative=request.data.get('debits_negative', 'true').lower() != 'false',
+            date_format=request.data.get('date_format') or None
+        )
+        stats = importer.run(upload)
+        return Response(stats, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['get'])
+    @cache_per_user('expenses')
     def category_summary(self, request):
 
         start_date = request.query_params.get('start_date', 
@@ -57,6 +157,7 @@ class ExpensesViewSet(viewsets.ModelViewSet):
         return Response(summary)
 
     @action(detail=False, methods=['get'])
+    @cache_per_user('expenses')
     def payment_method_summary(self, request):
 
         start_date = request.query_params.get('start_date', 
@@ -83,6 +184,7 @@ class ExpensesViewSet(viewsets.ModelViewSet):
         return Response(summary)
 
     @action(detail=False, methods=['get'])
+    @cache_per_user('expenses')
     def monthly_comparison(self, request):
         months = int(request.query_params.get('months', 3))
         comparison = Expenses.get_monthly_comparison(
@@ -92,6 +194,18 @@ class ExpensesViewSet(viewsets.ModelViewSet):
         return Response(comparison)
 
     @action(detail=False, methods=['get'])
+    @cache_per_user('expenses')
+    def series(self, request):
+        try:
+            params = parse_series_params(request.query_params, Expenses.SERIES_BREAKDOWNS)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        series = Expenses.get_spending_series(request.user, **params)
+        return Response({**params, 'series': series})
+
+    @action(detail=False, methods=['get'])
+    @cache_per_user('expenses')
     def trends(self, request):
         # Validate 'months' query parameter
         months_param = request.query_params.get('months', 6)  # Default to 6 months
@@ -106,31 +220,67 @@ class ExpensesViewSet(viewsets.ModelViewSet):
         end_date = timezone.now().date()
         start_date = end_date - relativedelta(months=months)
 
-        # Filter expenses
-        expenses = self.get_queryset().filter(
+        requested = [
+            name.strip()
+            for name in request.query_params.get('metrics', '').split(',')
+            if name.strip()
+        ]
+        try:
+            engine = TrendEngine(metrics=requested)
+        except KeyError as exc:
+            return Response(
+                {"detail": f"Unknown metric {exc}. Available metrics: {', '.join(METRICS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Generate trends in a single pass over the window
+        model = Expenses.tier_for(request.user, start_date)
+        trends = engine.run(model.objects.filter(
+            user=request.user,
             date__gte=start_date,
             date__lte=end_date
-        )
+        ))
 
         # Validate if any expenses exist
-        if not expenses.exists():
+        if not engine.row_count:
             raise ValidationError(f"No expenses found for the selected period: {start_date} to {end_date}.")
 
-        # Generate trends
-        trends = {
-            'total_spent': expenses.aggregate(total=Sum('amount'))['total'] or 0,
-            'average_monthly': expenses.values('date__year', 'date__month')
-                .annotate(total=Sum('amount'))
-                .aggregate(avg=Avg('total'))['avg'] or 0,
-            'highest_category': expenses.values('category')
-                .annotate(total=Sum('amount'))
-                .order_by('-total').first(),
-            'most_used_payment': expenses.values('payment_method')
-                .annotate(count=models.Count('id'))
-                .order_by('-count').first(),
-            'largest_expense': expenses.order_by('-amount').values(
-                'amount', 'category', 'date', 'description'
-            ).first(),
-        }
-
         return Response(trends)
+
+    @action(detail=False, methods=['get'])
+    @cache_per_user('expenses')
+    def insights(self, request):
+        try:
+            days = int(request.query_params.get('days', 365))
+            threshold = float(request.query_params.get('threshold', 3.5))
+        except ValueError:
+            return Response(
+                {"detail": "'days' must be an integer and 'threshold' a number."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 28 <= days <= 730:
+            return Response(
+                {"detail": "'days' must be between 28 and 730."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        engine = InsightEngine(days=days, threshold=threshold)
+        insights = engine.for_user(request.user)
+        for insight in insights:
+            del insight['user_id']
+        return Response({
+            'start_date': engine.start_date,
+            'end_date': engine.end_date,
+            'insights': insights,
+        })
+
+    @action(detail=False, methods=['get'])
+    def recurring(self, request):
+        series = RecurringExpense.objects.filter(
+            user=request.user,
+            cadence__isnull=False
+        )
+        cadence = request.query_params.get('cadence')
+        if cadence:
+            series = series.filter(cadence=cadence.upper())
+        return Response(RecurringExpenseSerializer(series, many=True).data)
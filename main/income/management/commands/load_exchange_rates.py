@@ -0,0 +1,26 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from income.rates import load
+
+
+class Command(BaseCommand):
+    help = "Load dated exchange rates from a date,currency,rate CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            help="Rates file (default: the EXCHANGE_RATES_FILE setting)"
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'] or getattr(settings, 'EXCHANGE_RATES_FILE', ''))
+        if not path.is_file():
+            raise CommandError(f"File '{path}' does not exist")
+        with path.open(newline='', encoding='utf-8') as stream:
+            try:
+                loaded = load(stream)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} exchange rates"))
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("income", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="income",
+            index=models.Index(
+                fields=["user", "date", "created_at", "id"],
+                name="income_inco_user_id_956c0e_idx",
+            ),
+        ),
+    ]
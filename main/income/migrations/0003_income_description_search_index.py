@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from main.search import index_operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("income", "0002_income_income_inco_user_id_956c0e_idx"),
+    ]
+
+    operations = [
+        index_operation("income", "Income", ["description"]),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:28
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("income", "0004_income_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "currency",
+                    models.CharField(
+                        choices=[
+                            ("USD", "US Dollar"),
+                            ("EUR", "Euro"),
+                            ("GBP", "British Pound"),
+                            ("JPY", "Japanese Yen"),
+                            ("AUD", "Australian Dollar"),
+                            ("CAD", "Canadian Dollar"),
+                            ("INR", "Indian Rupee"),
+                            ("CNY", "Chinese Yuan"),
+                            ("CHF", "Swiss Franc"),
+                            ("SGD", "Singapore Dollar"),
+                            ("NZD", "New Zealand Dollar"),
+                            ("HKD", "Hong Kong Dollar"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "rate",
+                    models.DecimalField(
+                        decimal_places=10,
+                        max_digits=20,
+                        validators=[
+                            django.core.validators.MinValueValidator(Decimal("1E-10"))
+                        ],
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                "ordering": ["currency", "date"],
+                "unique_together": {("currency", "date")},
+            },
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+from main.search import index_operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("income", "0005_exchangerate"),
+    ]
+
+    operations = [
+        index_operation("income", "Income", ["description"], drop=True),
+        index_operation("income", "Income", ["description"], scope=["user_id"]),
+    ]
@@ -1,13 +1,18 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models import Sum, Avg
+from django.db.models import Avg, Case, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
 from dateutil.relativedelta import relativedelta
+from main.archive import ArchiveTierMixin
+from main.series import bucket_expression, fill_series
 
 
-class Income(models.Model):
+class IncomeRecord(models.Model):
+    """Columns shared by live, archived and history income rows"""
     # Income Type Choices
     SALARY = 'SALARY'
     FREELANCE = 'FREELANCE'
@@ -42,6 +47,16 @@ class Income(models.Model):
         ('BIANNUALLY', 'Bi-annually'),
         ('ANNUALLY', 'Annually'),
     ]
+    # Gap between occurrences; ONE_TIME income does not recur
+    FREQUENCY_STEPS = {
+        'DAILY': relativedelta(days=1),
+        'WEEKLY': relativedelta(weeks=1),
+        'BIWEEKLY': relativedelta(weeks=2),
+        'MONTHLY': relativedelta(months=1),
+        'QUARTERLY': relativedelta(months=3),
+        'BIANNUALLY': relativedelta(months=6),
+        'ANNUALLY': relativedelta(years=1),
+    }
     CURRENCY_CHOICES = [
         ('USD', 'US Dollar'),
         ('EUR', 'Euro'),
@@ -57,7 +72,6 @@ class Income(models.Model):
         ('HKD', 'Hong Kong Dollar'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='incomes')
     amount = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -94,12 +108,34 @@ class Income(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        abstract = True
         ordering = ['-date', '-created_at']
+
+    def __str__(self):
+        return f"{self.income_type} - {self.amount} on {self.date}"
+
+    @property
+    def next_expected_date(self):
+        """Calculate next expected date for recurring income"""
+        if not self.recurring or self.frequency not in self.FREQUENCY_STEPS:
+            return None
+        return self.date + self.FREQUENCY_STEPS[self.frequency]
+
+
+class Income(ArchiveTierMixin, IncomeRecord):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='incomes')
+
+    archive_model = 'income.IncomeArchive'
+    history_model = 'income.IncomeHistory'
+    data_version_namespace = 'income'
+
+    class Meta(IncomeRecord.Meta):
         indexes = [
             models.Index(fields=['user', 'date']),
             models.Index(fields=['user', 'income_type']),
             models.Index(fields=['user', 'recurring']),
             models.Index(fields=['user', 'currency']),
+            models.Index(fields=['user', 'date', 'created_at', 'id']),
         ]
         verbose_name_plural = "Incomes"
         constraints = [
@@ -109,9 +145,6 @@ class Income(models.Model):
             )
         ]
 
-    def __str__(self):
-        return f"{self.income_type} - {self.amount} on {self.date}"
-
     def clean(self):
         from django.core.exceptions import ValidationError
         
@@ -125,47 +158,152 @@ class Income(models.Model):
         super().save(*args, **kwargs)
     
     @classmethod
-    def get_income_summary(cls, user, start_date, end_date):
-        """Get summary of income by type for a date range"""
-        return cls.objects.filter(
+    def get_income_summary(cls, user, start_date, end_date, currency=None):
+        """Get summary of income by type for a date range, in ``currency`` (BASE_CURRENCY by default)
+
+        ``count`` covers the rows that could be converted, as ``total`` and
+        ``average`` do; rows in a currency without rates are counted in
+        ``unconverted`` instead.
+        """
+        amount = ExchangeRate.converted(ExchangeRate.base_currency(currency))
+        return cls.tier_for(user, start_date).objects.filter(
             user=user,
             date__range=[start_date, end_date]
         ).values('income_type').annotate(
-            total=Sum('amount'),
-            average=Avg('amount'),
-            count=models.Count('id')
+            total=Round(Sum(amount), 2),
+            average=Round(Avg(amount), 2),
+            count=models.Count(amount),
+            unconverted=models.Count('id') - models.Count(amount)
         ).order_by('-total')
 
     @classmethod
-    def get_monthly_income(cls, user, months=12):
-        """Get monthly income totals for the last specified months"""
+    def get_monthly_income(cls, user, months=12, currency=None):
+        """Get monthly income totals for the last specified months, in ``currency`` (BASE_CURRENCY by default)"""
         end_date = timezone.now().date()
         start_date = end_date - relativedelta(months=months)
-        
-        return cls.objects.filter(
+        amount = ExchangeRate.converted(ExchangeRate.base_currency(currency))
+
+        return cls.tier_for(user, start_date).objects.filter(
             user=user,
             date__gte=start_date
         ).values('date__year', 'date__month').annotate(
-            total=Sum('amount'),
+            total=Round(Sum(amount), 2),
             unique_sources=models.Count('income_type', distinct=True),
-            regular_income=Sum('amount', filter=models.Q(recurring=True)),
-            one_time_income=Sum('amount', filter=models.Q(recurring=False))
+            regular_income=Round(Sum(amount, filter=models.Q(recurring=True)), 2),
+            one_time_income=Round(Sum(amount, filter=models.Q(recurring=False)), 2)
         ).order_by('date__year', 'date__month')
 
-    @property
-    def next_expected_date(self):
-        """Calculate next expected date for recurring income"""
-        if not self.recurring or not self.frequency:
-            return None
-            
-        if self.frequency == 'MONTHLY':
-            return self.date + relativedelta(months=1)
-        elif self.frequency == 'WEEKLY':
-            return self.date + relativedelta(weeks=1)
-        elif self.frequency == 'BIWEEKLY':
-            return self.date + relativedelta(weeks=2)
-        elif self.frequency == 'QUARTERLY':
-            return self.date + relativedelta(months=3)
-        elif self.frequency == 'ANNUALLY':
-            return self.date + relativedelta(years=1)
-        return None
\ No newline at end of file
+    SERIES_BREAKDOWNS = ('income_type', 'currency')
+
+    @classmethod
+    def get_income_series(cls, user, start_date, end_date, bucket='month', breakdown=None, currency=None):
+        """Income per day/week/month/quarter bucket with empty buckets filled with zero
+
+        Amounts are converted to ``currency`` (BASE_CURRENCY by default), so
+        buckets never add up different currencies; as in the summary, rows
+        without rates are left out of both totals and counts.
+        """
+        if breakdown is not None and breakdown not in cls.SERIES_BREAKDOWNS:
+            raise ValueError(f"Unknown breakdown '{breakdown}'")
+        amount = ExchangeRate.converted(ExchangeRate.base_currency(currency))
+        group_by = ['bucket'] + ([breakdown] if breakdown else [])
+        rows = cls.tier_for(user, start_date).objects.filter(
+            user=user,
+            date__range=[start_date, end_date]
+        ).annotate(
+            bucket=bucket_expression('date', bucket)
+        ).values(*group_by).annotate(
+            total=Round(Sum(amount), 2),
+            count=models.Count(amount)
+        ).order_by('bucket')
+
+        groups = ()
+        if breakdown:
+            groups = [code for code, _ in cls._meta.get_field(breakdown).choices]
+        return fill_series(rows, start_date, end_date, bucket, breakdown, groups)
+
+
+class IncomeArchive(IncomeRecord):
+    """Income older than the archive horizon, moved out of the hot table"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_incomes')
+
+    class Meta(IncomeRecord.Meta):
+        indexes = [
+            models.Index(fields=['user', 'date', 'created_at', 'id']),
+        ]
+        verbose_name_plural = "Archived incomes"
+
+
+class IncomeHistory(IncomeRecord):
+    """Read-only view over the hot and archived income rows
+
+    The view lists its columns explicitly (see migration 0004), so a new
+    Income column has to be added to IncomeArchive and the view too.
+    """
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='+')
+
+    class Meta(IncomeRecord.Meta):
+        managed = False
+        db_table = 'income_income_history'
+        verbose_name_plural = "Income history"
+
+
+class ExchangeRate(models.Model):
+    """USD value of one unit of ``currency`` from ``date`` until its next rate"""
+    PIVOT_CURRENCY = 'USD'
+
+    currency = models.CharField(max_length=3, choices=IncomeRecord.CURRENCY_CHOICES)
+    date = models.DateField()
+    rate = models.DecimalField(
+        max_digits=20,
+        decimal_places=10,
+        validators=[MinValueValidator(Decimal('0.0000000001'))]
+    )
+    # Stamps the table's version for every process holding it in memory
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # The index behind every rate lookup: latest date <= day for a currency
+        unique_together = ['currency', 'date']
+        ordering = ['currency', 'date']
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} on {self.date}"
+
+    @classmethod
+    def base_currency(cls, currency=None):
+        """``currency``, or the BASE_CURRENCY setting, checked against CURRENCY_CHOICES"""
+        code = (currency or getattr(settings, 'BASE_CURRENCY', cls.PIVOT_CURRENCY)).upper()
+        if code not in dict(IncomeRecord.CURRENCY_CHOICES):
+            raise ValueError(f"Unknown currency '{currency}'")
+        return code
+
+    @classmethod
+    def rate_on(cls, currency, day):
+        """Database expression for the rate of ``currency`` in force on ``day``
+
+        That is the latest rate dated on or before the day, or the earliest
+        one when the table starts later. Both arguments may reach the outer
+        query with OuterRef; each lookup is a seek on (currency, date).
+        """
+        rates = cls.objects.filter(currency=currency).values('rate')
+        return Coalesce(
+            Subquery(rates.filter(date__lte=day).order_by('-date')[:1]),
+            Subquery(rates.filter(date__gt=day).order_by('date')[:1]),
+            output_field=cls._meta.get_field('rate')
+        )
+
+    @classmethod
+    def converted(cls, base, amount='amount', currency='currency', day='date'):
+        """Database expression for each row's ``amount`` in ``base`` at the rates of its ``day``
+
+        Rows in a currency without any stored rate come out NULL, so sums skip them.
+        """
+        value = F(amount) * Case(
+            When(**{currency: cls.PIVOT_CURRENCY}, then=Value(Decimal('1'))),
+            default=cls.rate_on(OuterRef(currency), OuterRef(day)),
+            output_field=cls._meta.get_field('rate')
+        )
+        if base != cls.PIVOT_CURRENCY:
+            value = value / cls.rate_on(base, OuterRef(day))
+        return ExpressionWrapper(value, output_field=DecimalField(max_digits=14, decimal_places=2))
@@ -0,0 +1,91 @@
+import bisect
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import Count, Max
+from .models import ExchangeRate, IncomeRecord
+
+CENTS = Decimal('0.01')
+CURRENCIES = {code for code, _ in IncomeRecord.CURRENCY_CHOICES}
+
+_cached = {'version': None, 'rates': {}}
+
+
+def version():
+    """The rates table's version, read from the table itself
+
+    Any insert or update moves the latest ``updated_at`` and any delete
+    the row count, so every process sees a write from any other.
+    """
+    stamp = ExchangeRate.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+    return stamp['count'], stamp['updated']
+
+
+def rates():
+    """{currency: (date ordinals, rates)} of every stored rate, held in-process
+
+    The table is reloaded only when its version differs from the one it
+    was loaded at, so a check costs one indexed aggregate.
+    """
+    version_now = version()
+    if _cached['version'] != version_now:
+        table = {}
+        for currency, day, rate in ExchangeRate.objects.order_by('currency', 'date').values_list(
+            'currency', 'date', 'rate'
+        ):
+            ordinals, values = table.setdefault(currency, ([], []))
+            ordinals.append(day.toordinal())
+            values.append(rate)
+        _cached.update(version=version_now, rates=table)
+    return _cached['rates']
+
+
+def rate_on(currency, day, table=None):
+    """The cached rate of ``currency`` in force on ``day``, as ExchangeRate.rate_on picks it
+
+    Pass a ``table`` from rates() to look up many rates on one version check.
+    """
+    if currency == ExchangeRate.PIVOT_CURRENCY:
+        return Decimal('1')
+    ordinals, values = (rates() if table is None else table).get(currency, ((), ()))
+    if not values:
+        return None
+    return values[max(bisect.bisect_right(ordinals, day.toordinal()) - 1, 0)]
+
+
+def convert(amount, currency, day, base, table=None):
+    """``amount`` of ``currency`` in ``base`` on ``day``, or None without rates for both"""
+    table = rates() if table is None else table
+    rate, base_rate = rate_on(currency, day, table), rate_on(base, day, table)
+    if rate is None or base_rate is None:
+        return None
+    return (amount * rate / base_rate).quantize(CENTS)
+
+
+def load(stream, batch_size=1000):
+    """Upsert the rates of a ``date,currency,rate`` CSV stream, returning the row count
+
+    Rows for the pivot currency are skipped; its rate is always 1.
+    """
+    rows = {}
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        try:
+            day = date.fromisoformat(row['date'].strip())
+            currency = row['currency'].strip().upper()
+            rate = Decimal(row['rate'].strip())
+        except (KeyError, AttributeError, ValueError, InvalidOperation):
+            raise ValueError(f"line {line}: expected date,currency,rate")
+        if currency not in CURRENCIES or not rate > 0:
+            raise ValueError(f"line {line}: unknown currency '{currency}' or rate '{rate}'")
+        if currency != ExchangeRate.PIVOT_CURRENCY:
+            rows[currency, day] = ExchangeRate(currency=currency, date=day, rate=rate)
+    with transaction.atomic():
+        ExchangeRate.objects.bulk_create(
+            rows.values(),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['currency', 'date'],
+            update_fields=['rate', 'updated_at']
+        )
+    return len(rows)
@@ -0,0 +1,77 @@
+from decimal import Decimal
+import numpy as np
+from .models import Income
+
+COLUMNS = ('id', 'date', 'amount', 'currency', 'income_type', 'description', 'frequency')
+# One recurring stream; its latest row sets the amount and the date steps count from
+SERIES_FIELDS = ('income_type', 'description', 'currency', 'frequency')
+
+
+def latest_series(user):
+    """The latest row of each of ``user``'s recurring income streams, from one query
+
+    Rows recorded for every occurrence of the same stream collapse into
+    one, so a salary entered each month is projected once.
+    """
+    # Old anchors may have been archived; the view's filters reach both tables
+    rows = Income.get_history_model().objects.filter(
+        user=user, recurring=True, frequency__in=Income.FREQUENCY_STEPS
+    ).order_by('date', 'id').values(*COLUMNS)
+    latest = {}
+    for row in rows:
+        latest[tuple(row[field] for field in SERIES_FIELDS)] = row
+    return sorted(latest.values(), key=lambda row: row['id'])
+
+
+def expand(series, start_date, end_date):
+    """Every occurrence of ``series`` rows between two dates (inclusive), in date order
+
+    Occurrence k of a stream falls k steps after its row's date, with
+    month steps clamped to the end of shorter months the way relativedelta
+    does. Candidate step numbers are bounded per stream, then all of them
+    are dated in one set of NumPy operations and filtered to the window.
+    """
+    if not series:
+        return []
+    count = len(series)
+    steps = [Income.FREQUENCY_STEPS[row['frequency']] for row in series]
+    day_steps = np.fromiter((step.days for step in steps), dtype=np.int64, count=count)
+    month_steps = np.fromiter((step.years * 12 + step.months for step in steps), dtype=np.int64, count=count)
+    anchors = np.array([row['date'] for row in series], dtype='datetime64[D]')
+    start, end = np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D')
+
+    # Months last 28 to 31 days, which bounds the step numbers that can land in the window
+    longest = np.where(day_steps > 0, day_steps, month_steps * 31)
+    shortest = np.where(day_steps > 0, day_steps, month_steps * 28)
+    firsts = np.maximum((start - anchors).astype(np.int64) // longest, 1)
+    lasts = (end - anchors).astype(np.int64) // shortest
+    counts = np.maximum(lasts - firsts + 1, 0)
+    streams = np.repeat(np.arange(count), counts)
+    k = firsts[streams] + np.arange(len(streams)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    by_day = anchors[streams] + k * day_steps[streams]
+    months = anchors.astype('datetime64[M]')[streams] + k * month_steps[streams]
+    month_starts = months.astype('datetime64[D]')
+    month_lengths = ((months + 1).astype('datetime64[D]') - month_starts).astype(np.int64)
+    day_of_month = (anchors - anchors.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64)
+    by_month = month_starts + np.minimum(day_of_month[streams], month_lengths - 1)
+    dates = np.where(day_steps[streams] > 0, by_day, by_month)
+
+    inside = np.flatnonzero((dates >= start) & (dates <= end))
+    inside = inside[np.lexsort((streams[inside], dates[inside]))]
+    return [
+        {
+            'date': dates[index].item(),
+            'income': series[streams[index]]['id'],
+            **{field: series[streams[index]][field] for field in COLUMNS[2:]},
+        }
+        for index in inside
+    ]
+
+
+def totals(occurrences):
+    """{currency: total} of ``occurrences``"""
+    result = {}
+    for occurrence in occurrences:
+        result[occurrence['currency']] = result.get(occurrence['currency'], Decimal('0')) + occurrence['amount']
+    return result
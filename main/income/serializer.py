@@ -2,13 +2,11 @@ from rest_framework import serializers
 from .models import Income
 
 class IncomeSerializer(serializers.ModelSerializer):
-    net_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-    
     class Meta:
         model = Income
         fields = [
-            'id', 'amount', 'income_type', 'description', 'date',
-            'source', 'recurring', 'frequency'
+            'id', 'amount', 'income_type', 'currency', 'description', 'date',
+            'recurring', 'frequency', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
@@ -22,6 +20,7 @@ class IncomeSerializer(serializers.ModelSerializer):
 
 class IncomeAnalyticsSerializer(serializers.Serializer):
     income_type = serializers.CharField()
-    total = serializers.DecimalField(max_digits=10, decimal_places=2)
-    average = serializers.DecimalField(max_digits=10, decimal_places=2)
-    count = serializers.IntegerField()
\ No newline at end of file
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+    average = serializers.DecimalField(max_digits=14, decimal_places=2)
+    count = serializers.IntegerField()
+    unconverted = serializers.IntegerField()
\ No newline at end of file
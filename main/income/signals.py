@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from main.cache import bump_data_version_on_commit
+from .models import Income
+
+
+@receiver(post_save, sender=Income)
+def bump_version_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        bump_data_version_on_commit('income', [instance.user_id])
+
+
+@receiver(post_delete, sender=Income)
+def bump_version_on_delete(sender, instance, **kwargs):
+    bump_data_version_on_commit('income', [instance.user_id])
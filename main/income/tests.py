@@ -1,3 +1,310 @@
-from django.test import TestCase
+import random
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from io import StringIO
+from main.testing import QueryBudgetTestCase
+from . import rates, recurring
+from .models import ExchangeRate, Income
 
-# Create your tests here.
+INCOME_TYPES = [code for code, _ in Income.INCOME_TYPE_CHOICES]
+CURRENCIES = ['USD', 'EUR', 'GBP', 'INR']
+
+
+def seed_income(user, count=300, days=540, seed=1):
+    """Spread ``count`` income rows over the last ``days`` days, a quarter of them recurring"""
+    rng = random.Random(seed)
+    today = date.today()
+    rows = []
+    for _ in range(count):
+        recurring = rng.random() < 0.25
+        rows.append(Income(
+            user=user,
+            amount=Decimal(rng.randint(1000, 500000)) / 100,
+            income_type=rng.choice(INCOME_TYPES),
+            currency=rng.choice(CURRENCIES),
+            description=rng.choice(['Acme Corp', 'Client invoice', 'Dividends', '']),
+            date=today - timedelta(days=rng.randrange(days)),
+            recurring=recurring,
+            frequency=rng.choice(['WEEKLY', 'MONTHLY', 'ANNUALLY']) if recurring else None
+        ))
+    return Income.objects.bulk_create(rows)
+
+
+@override_settings(ROOT_URLCONF='income.urls')
+class IncomeViewSetQueryTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('earner', password='x')
+        cls.other = User.objects.create_user('other', password='x')
+        seed_income(cls.user)
+        seed_income(cls.other, count=100, seed=2)
+        cls.income = Income.objects.filter(user=cls.user).first()
+
+    def payload(self, **overrides):
+        return {
+            'amount': '2500.00',
+            'income_type': Income.SALARY,
+            'currency': 'USD',
+            'description': 'Acme Corp',
+            'date': date.today().isoformat(),
+            'recurring': True,
+            'frequency': 'MONTHLY',
+            **overrides
+        }
+
+    def test_list(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/income/', {'date__gte': date.today() - timedelta(days=60)})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Income, ['user', 'date'])
+
+    def test_list_by_type(self):
+        with self.assertMaxQueries(1) as captured:
+            response = self.client.get('/income/', {'income_type': Income.SALARY})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Income, ['user'])
+
+    def test_search(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get('/income/', {'search': 'acme'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(row['description'] == 'Acme Corp' for row in response.data['results']))
+
+    def test_retrieve(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(f'/income/{self.income.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_create(self):
+        with self.assertMaxQueries(1):
+            response = self.client.post('/income/', self.payload(), format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_update(self):
+        with self.assertMaxQueries(2):
+            response = self.client.put(
+                f'/income/{self.income.pk}/', self.payload(amount='3000.00'), format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_partial_update(self):
+        with self.assertMaxQueries(2):
+            response = self.client.patch(
+                f'/income/{self.income.pk}/', {'description': 'Raise'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_destroy(self):
+        with self.assertMaxQueries(2):
+            response = self.client.delete(f'/income/{self.income.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_export(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/income/export/', {'date__gte': date.today() - timedelta(days=90)})
+            body = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body.startswith(b'id,amount'))
+        self.assertUsesIndex(captured, Income, ['user', 'date'])
+
+    def test_analytics(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/income/analytics/', {'period': 6})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Income, ['user', 'date'])
+
+    def test_monthly_summary(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/income/monthly_summary/', {'months': 6})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Income, ['user', 'date'])
+
+    def test_monthly_summary_in_another_currency(self):
+        response = self.client.get('/income/monthly_summary/', {'months': 6, 'currency': 'eur'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/income/monthly_summary/', {'currency': 'XYZ'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_series(self):
+        with self.assertMaxQueries(2) as captured:
+            response = self.client.get('/income/series/', {'bucket': 'month', 'breakdown': 'currency'})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Income, ['user', 'date'])
+
+    def test_recurring_income(self):
+        with self.assertMaxQueries(1) as captured:
+            response = self.client.get('/income/recurring_income/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(row['recurring'] for row in response.data))
+        self.assertUsesIndex(captured, Income, ['user'])
+
+    def test_schedule(self):
+        # The rates version (for the cache key, then for the in-process table),
+        # the recurring rows, and the exchange rates unless already held in-process
+        with self.assertMaxQueries(4) as captured:
+            response = self.client.get('/income/schedule/', {'days': 60})
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndex(captured, Income, ['user'])
+        dates = [row['date'] for row in response.data['occurrences']]
+        self.assertEqual(dates, sorted(dates))
+        self.assertTrue(all(date.today() <= day <= date.today() + timedelta(days=60) for day in dates))
+
+        with self.assertMaxQueries(1):
+            self.client.get('/income/schedule/', {'days': 60})
+        # A write moves the user to a new data version once it commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/income/', self.payload(description='New client', frequency='DAILY'), format='json')
+        response = self.client.get('/income/schedule/', {'days': 60})
+        self.assertEqual(
+            sum(row['description'] == 'New client' for row in response.data['occurrences']), 60
+        )
+
+        response = self.client.get('/income/schedule/', {'days': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_schedule_follows_exchange_rates(self):
+        before = self.client.get('/income/schedule/', {'days': 60, 'currency': 'USD'}).data
+        # A new rate leaves the user's data version alone but not the cache key
+        ExchangeRate.objects.create(currency='EUR', date=date.today() - timedelta(days=1), rate=Decimal('1.10'))
+        after = self.client.get('/income/schedule/', {'days': 60, 'currency': 'USD'}).data
+        euros = [row['amount'] for row in after['occurrences'] if row['currency'] == 'EUR']
+        self.assertTrue(euros)
+        self.assertEqual(
+            after['total'],
+            before['total'] + sum((amount * Decimal('1.10')).quantize(Decimal('0.01')) for amount in euros)
+        )
+
+
+class RecurringScheduleTests(SimpleTestCase):
+
+    def naive(self, row, start_date, end_date):
+        step = Income.FREQUENCY_STEPS[row['frequency']]
+        days, k = [], 1
+        while row['date'] + step * k <= end_date:
+            if row['date'] + step * k >= start_date:
+                days.append(row['date'] + step * k)
+            k += 1
+        return days
+
+    def test_matches_relativedelta_for_every_frequency(self):
+        anchors = [date(2023, 1, 31), date(2023, 8, 29), date(2024, 2, 29), date(2025, 6, 15), date(2026, 3, 1)]
+        series = [
+            {
+                'id': n, 'date': anchor, 'amount': Decimal('100.00'), 'currency': 'USD',
+                'income_type': Income.SALARY, 'description': '', 'frequency': frequency
+            }
+            for n, (anchor, frequency) in enumerate(
+                (anchor, frequency) for anchor in anchors for frequency in Income.FREQUENCY_STEPS
+            )
+        ]
+        start_date, end_date = date(2025, 1, 10), date(2027, 4, 30)
+        occurrences = recurring.expand(series, start_date, end_date)
+        self.assertEqual(occurrences, sorted(occurrences, key=lambda row: (row['date'], row['income'])))
+        for row in series:
+            self.assertEqual(
+                [occurrence['date'] for occurrence in occurrences if occurrence['income'] == row['id']],
+                self.naive(row, start_date, end_date),
+                row['frequency']
+            )
+
+    def test_next_expected_date_covers_every_frequency(self):
+        income = Income(date=date(2024, 8, 31), recurring=True)
+        for frequency, step in Income.FREQUENCY_STEPS.items():
+            income.frequency = frequency
+            self.assertEqual(income.next_expected_date, date(2024, 8, 31) + step)
+        income.frequency = 'ONE_TIME'
+        self.assertIsNone(income.next_expected_date)
+
+
+def write_rates(rows):
+    """A temporary date,currency,rate file holding ``rows``"""
+    handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+    with handle:
+        handle.write('date,currency,rate\n')
+        handle.writelines(f'{day.isoformat()},{currency},{rate}\n' for day, currency, rate in rows)
+    return handle.name
+
+
+class ExchangeRateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = date.today()
+        call_command('load_exchange_rates', write_rates([
+            (cls.today - timedelta(days=90), 'EUR', '1.10'),
+            (cls.today - timedelta(days=30), 'EUR', '1.20'),
+            (cls.today - timedelta(days=90), 'GBP', '1.25'),
+            (cls.today - timedelta(days=90), 'USD', '1'),
+        ]), stdout=StringIO())
+        cls.user = User.objects.create_user('traveller', password='x')
+        for days_ago, currency, amount in [
+            (60, 'USD', '100.00'),
+            (60, 'EUR', '100.00'),
+            (10, 'EUR', '100.00'),
+            # Older than the table, so converted at its first rate
+            (120, 'GBP', '100.00'),
+            # No rates at all
+            (5, 'JPY', '1000.00'),
+        ]:
+            Income.objects.create(
+                user=cls.user, amount=Decimal(amount), income_type=Income.SALARY,
+                currency=currency, date=cls.today - timedelta(days=days_ago)
+            )
+
+    def test_summary_converts_in_sql(self):
+        start_date = self.today - timedelta(days=365)
+        # The archive horizon check, then one aggregate joining each row to its rates
+        with self.assertNumQueries(2):
+            summary, = Income.get_income_summary(self.user, start_date, self.today)
+        self.assertEqual(summary['total'], Decimal('455.00'))
+        # The JPY row has no rate; it's reported apart rather than counted
+        self.assertEqual((summary['count'], summary['unconverted']), (4, 1))
+        self.assertEqual(summary['average'], Decimal('113.75'))
+
+        summary, = Income.get_income_summary(self.user, start_date, self.today, currency='EUR')
+        # 100 / 1.10 + 100 + 100 + 125 / 1.10
+        self.assertEqual(summary['total'], Decimal('404.55'))
+
+    def test_monthly_income_converts_in_sql(self):
+        months = Income.get_monthly_income(self.user, months=6)
+        self.assertEqual(sum(month['total'] for month in months), Decimal('455.00'))
+        self.assertEqual(sum(month['one_time_income'] for month in months), Decimal('455.00'))
+
+    def test_series_converts_currencies(self):
+        series = Income.get_income_series(
+            self.user, self.today - timedelta(days=150), self.today, bucket='month', breakdown='currency'
+        )
+        # The same 455.00 as the summary, with the JPY row left out of the counts too
+        self.assertEqual(sum(point['total'] for point in series), Decimal('455.00'))
+        self.assertEqual(sum(point['count'] for point in series), 4)
+        by_currency = {
+            currency: sum(point['by_currency'][currency] for point in series)
+            for currency in ('USD', 'EUR', 'GBP', 'JPY')
+        }
+        self.assertEqual(by_currency, {
+            'USD': Decimal('100.00'), 'EUR': Decimal('230.00'), 'GBP': Decimal('125.00'), 'JPY': 0
+        })
+
+    def test_cached_rates_reload_on_new_version(self):
+        self.assertEqual(rates.rate_on('EUR', self.today), Decimal('1.2'))
+        # Each lookup only checks the table's version
+        with self.assertNumQueries(1):
+            self.assertEqual(rates.convert(Decimal('100'), 'EUR', self.today - timedelta(days=60), 'GBP'), Decimal('88.00'))
+        # As another process would find it, with nothing but the database shared
+        call_command('load_exchange_rates', write_rates([(self.today, 'EUR', '1.30')]), stdout=StringIO())
+        self.assertEqual(rates.rate_on('EUR', self.today), Decimal('1.3'))
+        self.assertIsNone(rates.convert(Decimal('100'), 'JPY', self.today, 'USD'))
+        self.assertEqual(ExchangeRate.objects.filter(currency='EUR').count(), 3)
+        ExchangeRate.objects.filter(currency='EUR', date=self.today).delete()
+        self.assertEqual(rates.rate_on('EUR', self.today), Decimal('1.2'))
+
+    def test_rejects_malformed_files(self):
+        with self.assertRaises(CommandError):
+            call_command('load_exchange_rates', write_rates([(self.today, 'XYZ', '1')]), stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('load_exchange_rates', '/nonexistent/rates.csv', stdout=StringIO())
@@ -1,28 +1,60 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from datetime import datetime, timedelta, timezone
+from datetime import date, timedelta
+from decimal import Decimal
 from django.db.models import Sum, Avg
+from django.utils import timezone
 from .serializer import IncomeSerializer, IncomeAnalyticsSerializer, Income
 from dateutil.relativedelta import relativedelta
 from rest_framework.permissions import IsAuthenticated
+from main.archive import requested_start_date
+from main.cache import cache_per_user
+from main.exports import StreamingExportMixin
+from main.pagination import KeysetPagination
+from main.serializers import FastListMixin
+from main.series import parse_series_params
+from main.search import FullTextSearchFilter
+from . import rates, recurring
+from .models import ExchangeRate
 
-class IncomeViewSet(viewsets.ModelViewSet):
+class IncomeViewSet(FastListMixin, StreamingExportMixin, viewsets.ModelViewSet):
     serializer_class = IncomeSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['income_type','recurring', 'date']
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
+    filterset_fields = {
+        'income_type': ['exact'],
+        'recurring': ['exact'],
+        'date': ['exact', 'gte', 'lte'],
+    }
     search_fields = ['description']
     ordering_fields = ['date', 'amount', 'created_at']
     ordering = ['-date']
+    export_filename = 'income'
 
     def get_queryset(self):
-        return Income.objects.filter(user=self.request.user)
+        model = Income
+        # Reads only include archived rows when the date filter reaches them
+        if self.action in ('list', 'export'):
+            model = Income.tier_for(
+                self.request.user,
+                requested_start_date(self.request.query_params)
+            )
+        return model.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def base_currency(self):
+        """The ?currency= aggregates are converted to, BASE_CURRENCY by default"""
+        try:
+            return ExchangeRate.base_currency(self.request.query_params.get('currency'))
+        except ValueError as exc:
+            raise ValidationError({'currency': str(exc)})
+
     @action(detail=False, methods=['get'])
     def analytics(self, request):
         period = request.query_params.get('period', '12')  # months
@@ -32,7 +64,8 @@ class IncomeViewSet(viewsets.ModelViewSet):
         summary = Income.get_income_summary(
             user=request.user,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            currency=self.base_currency()
         )
         
         serializer = IncomeAnalyticsSerializer(summary, many=True)
@@ -41,11 +74,56 @@ class IncomeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def monthly_summary(self, request):
         months = int(request.query_params.get('months', '12'))
-        summary = Income.get_monthly_income(request.user, months=months)
+        summary = Income.get_monthly_income(request.user, months=months, currency=self.base_currency())
         return Response(summary)
 
+    @action(detail=False, methods=['get'])
+    def series(self, request):
+        try:
+            params = parse_series_params(request.query_params, Income.SERIES_BREAKDOWNS)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        currency = self.base_currency()
+        series = Income.get_income_series(request.user, currency=currency, **params)
+        return Response({**params, 'currency': currency, 'series': series})
+
     @action(detail=False, methods=['get'])
     def recurring_income(self, request):
-        queryset = self.get_queryset().filter(recurring=True)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        reader = self.get_fast_serializer()
+        queryset = self.get_queryset().filter(recurring=True).values(*reader.columns)
+        return Response(reader.serialize(queryset))
+
+    @action(detail=False, methods=['get'])
+    @cache_per_user('income', shared_versions=[rates.version])
+    def schedule(self, request):
+        try:
+            days = int(request.query_params.get('days', 90))
+        except ValueError:
+            return Response(
+                {"detail": "'days' must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= days <= 1830:
+            return Response(
+                {"detail": "'days' must be between 1 and 1830."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        currency = self.base_currency()
+        start_date = date.today()
+        end_date = start_date + timedelta(days=days)
+        occurrences = recurring.expand(recurring.latest_series(request.user), start_date, end_date)
+        # Converted with the in-process rates at the day each amount is expected
+        table = rates.rates()
+        converted = [
+            rates.convert(row['amount'], row['currency'], row['date'], currency, table) for row in occurrences
+        ]
+        return Response({
+            'start_date': start_date,
+            'end_date': end_date,
+            'occurrences': occurrences,
+            'totals': recurring.totals(occurrences),
+            'currency': currency,
+            'total': sum((amount for amount in converted if amount is not None), Decimal('0')),
+        })
@@ -0,0 +1,125 @@
+from datetime import date
+from django.apps import apps
+from django.db import connections, migrations, transaction
+from django.db.models import Max
+from main.cache import bump_data_version_on_commit
+
+DATE_LOWER_BOUNDS = ('date', 'date__gte', 'date__gt')
+DATE_UPPER_BOUNDS = ('date__lte', 'date__lt')
+
+
+def history_view_operation(view, tables, columns):
+    """Migration operation that creates (or drops) a UNION ALL view over ``tables``"""
+    select = ', '.join(columns)
+    union = ' UNION ALL '.join(f'SELECT {select} FROM {table}' for table in tables)
+    return migrations.RunSQL(
+        f'CREATE VIEW {view} AS {union}',
+        f'DROP VIEW IF EXISTS {view}'
+    )
+
+
+def requested_start_date(params):
+    """Lower bound of the ``date`` filters in ``params``
+
+    Returns None when no date filter is given and ``date.min`` when only
+    an upper bound is, since that range is open towards the archive.
+    """
+    starts = []
+    for name in DATE_LOWER_BOUNDS:
+        try:
+            starts.append(date.fromisoformat(params[name]))
+        except (KeyError, ValueError):
+            continue
+    if starts:
+        return min(starts)
+    if any(params.get(name) for name in DATE_UPPER_BOUNDS):
+        return date.min
+    return None
+
+
+class ArchiveTierMixin:
+    """Hot model whose rows older than a horizon are moved to an archive table
+
+    ``archive_model`` names a model with the same columns and
+    ``history_model`` an unmanaged model over the view that UNIONs the two.
+    ``data_version_namespace`` is the cache namespace bumped for the users
+    whose rows are moved.
+    """
+    archive_model = None
+    history_model = None
+    data_version_namespace = None
+
+    @classmethod
+    def get_archive_model(cls):
+        return apps.get_model(cls.archive_model)
+
+    @classmethod
+    def get_history_model(cls):
+        return apps.get_model(cls.history_model)
+
+    @classmethod
+    def archive_horizon(cls, user=None):
+        """Latest archived date (of ``user``'s rows if given), or None when nothing is archived"""
+        archived = cls.get_archive_model().objects.all()
+        if user is not None:
+            archived = archived.filter(user=user)
+        return archived.aggregate(horizon=Max('date'))['horizon']
+
+    @classmethod
+    def tier_for(cls, user, start_date):
+        """The hot model, or the history view when ``start_date`` reaches the archive
+
+        With ``user`` None the check covers every user's archived rows.
+        """
+        if start_date is None:
+            return cls
+        if hasattr(start_date, 'date'):
+            start_date = start_date.date()
+        horizon = cls.archive_horizon(user)
+        if horizon is None or start_date > horizon:
+            return cls
+        return cls.get_history_model()
+
+    @classmethod
+    def archive_before(cls, cutoff, batch_size=1000, using='default'):
+        """Move rows dated before ``cutoff`` into the archive table, returning the count
+
+        Rows are copied and deleted with plain SQL, so no model signals fire:
+        derived tables such as the expense rollup keep covering archived rows.
+        Cached reads of the hot table do change, so the data versions of each
+        batch's users are bumped once it commits.
+        """
+        archive = cls.get_archive_model()
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in cls._meta.concrete_fields)
+        hot_table = quote(cls._meta.db_table)
+        archive_table = quote(archive._meta.db_table)
+        pk = quote(cls._meta.pk.column)
+
+        moved = 0
+        while True:
+            with transaction.atomic(using=using):
+                rows = list(
+                    cls.objects.using(using).filter(date__lt=cutoff)
+                    .order_by('pk').values_list('pk', 'user_id')[:batch_size]
+                )
+                if not rows:
+                    return moved
+                ids = [pk for pk, _ in rows]
+                placeholders = ', '.join(['%s'] * len(ids))
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {archive_table} ({columns}) '
+                        f'SELECT {columns} FROM {hot_table} WHERE {pk} IN ({placeholders})',
+                        ids
+                    )
+                    cursor.execute(
+                        f'DELETE FROM {hot_table} WHERE {pk} IN ({placeholders})',
+                        ids
+                    )
+                if cls.data_version_namespace:
+                    bump_data_version_on_commit(
+                        cls.data_version_namespace, [user_id for _, user_id in rows], using=using
+                    )
+            moved += len(ids)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import time
+from functools import partial, wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+_usage = {}
+
+
+class SizeBoundedLocMemCache(LocMemCache):
+    """LocMemCache that also evicts least recently used entries above MAX_BYTES
+
+    LocMemCache already keeps entries in LRU order and culls on
+    MAX_ENTRIES; this adds a cap on the total size of the pickled values.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        options = params.get('OPTIONS', {})
+        self._max_bytes = int(options.get('MAX_BYTES', 0)) or None
+        self._usage = _usage.setdefault(name, {'sizes': {}, 'bytes': 0})
+
+    def _forget(self, key):
+        self._usage['bytes'] -= self._usage['sizes'].pop(key, 0)
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        super()._set(key, value, timeout)
+        self._forget(key)
+        self._usage['sizes'][key] = len(value)
+        self._usage['bytes'] += len(value)
+        if self._max_bytes is None:
+            return
+        # The most recently used entries sit at the front of the OrderedDict
+        while self._usage['bytes'] > self._max_bytes and len(self._cache) > 1:
+            evicted, _ = self._cache.popitem()
+            del self._expire_info[evicted]
+            self._forget(evicted)
+
+    def _cull(self):
+        super()._cull()
+        for key in list(self._usage['sizes']):
+            if key not in self._cache:
+                self._forget(key)
+
+    def _delete(self, key):
+        self._forget(key)
+        return super()._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._usage['sizes'].clear()
+            self._usage['bytes'] = 0
+
+
+def get_cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def get_version_cache():
+    """Cache holding the data versions, which every process must share
+
+    Responses may stay in a per-process cache, but a write bumps the
+    version in whichever process served it, so the versions live in
+    DATA_VERSION_CACHE_ALIAS (the analytics cache when unset).
+    """
+    alias = getattr(settings, 'DATA_VERSION_CACHE_ALIAS', None)
+    return caches[alias] if alias else get_cache()
+
+
+def _version_key(namespace, user_id):
+    return f'data-version:{namespace}:{user_id}'
+
+
+def get_data_version(namespace, user_id):
+    """Current version of a user's data; changes whenever that data is written"""
+    cache = get_version_cache()
+    key = _version_key(namespace, user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+def bump_data_version(namespace, user_id):
+    # A fresh clock value rather than incr(), which the database backend
+    # implements as a read and a write that concurrent bumps can interleave
+    get_version_cache().set(_version_key(namespace, user_id), time.time_ns(), timeout=None)
+
+
+def bump_data_version_on_commit(namespace, user_ids, using=None):
+    """Bump the versions of ``user_ids`` once the current transaction commits
+
+    Bumping inside the transaction would let a concurrent read cache the
+    old data under the new version before the write becomes visible.
+    """
+    for user_id in set(user_ids):
+        transaction.on_commit(partial(bump_data_version, namespace, user_id), using=using)
+
+
+def cache_key(namespace, user_id, action, params, shared_versions=()):
+    normalized = sorted((name, sorted(params.getlist(name))) for name in params)
+    versions = [str(version) for version in shared_versions]
+    digest = hashlib.sha1(json.dumps([normalized, versions]).encode('utf-8')).hexdigest()
+    return ':'.join([
+        namespace,
+        str(user_id),
+        str(get_data_version(namespace, user_id)),
+        action,
+        # Default date windows are relative to today
+        timezone.now().date().isoformat(),
+        digest,
+    ])
+
+
+def cache_per_user(namespace, timeout=DEFAULT_TIMEOUT, shared_versions=()):
+    """Cache a viewset action's response data per user, action and query parameters
+
+    Entries are keyed on the user's data version for ``namespace``, so a
+    write that calls bump_data_version() makes earlier entries unreachable
+    and they age out of the cache. The versions are read from the shared
+    version cache, so a write served by one process invalidates the
+    entries cached by every other. ``shared_versions`` are callables
+    returning the versions of data shared by all users that the response
+    also depends on; they join the key the same way.
+    """
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            cache = get_cache()
+            key = cache_key(
+                namespace, request.user.pk, view_method.__name__, request.query_params,
+                [version() for version in shared_versions]
+            )
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                if isinstance(response.data, QuerySet):
+                    response.data = list(response.data)
+                cache.set(key, response.data, timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,153 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.utils.urls import replace_query_param
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else '-' + field
+        for field in ordering
+    )
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination that filters on the full ordering tuple
+
+    DRF's CursorPagination only filters on the first ordering field and
+    skips ties with an OFFSET. Here the cursor stores the value of every
+    ordering column, so each page is a single range scan regardless of
+    depth. Orderings picked through OrderingFilter are completed with the
+    default ordering as tie-breakers, ending on the primary key so that
+    every position is unique.
+    """
+    ordering = ('-date', '-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        seen = {field.lstrip('-') for field in ordering}
+        for field in self.ordering:
+            if field.lstrip('-') not in seen:
+                ordering.append(field)
+                seen.add(field.lstrip('-'))
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = bool(self.cursor and self.cursor.reverse)
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, self.cursor.position))
+
+        # Fetch one extra row to find out whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_keyset_filter(self, ordering, position):
+        """Rows strictly after ``position`` in ``ordering``"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        # Bound the leading column as well so the index range scan starts at the cursor
+        leading = ordering[0]
+        bound = 'lte' if leading.startswith('-') else 'gte'
+        return Q(**{f'{leading.lstrip("-")}__{bound}': position[0]}) & condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            tokens = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if tokens['o'] != list(self.ordering) or len(tokens['p']) != len(self.ordering):
+                raise ValueError('Cursor does not match the requested ordering')
+            position = [
+                self._get_field(field).to_python(value)
+                for field, value in zip(self.ordering, tokens['p'])
+            ]
+            reverse = bool(tokens.get('r', 0))
+        except (TypeError, ValueError, KeyError, BinasciiError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        tokens = {
+            'o': list(self.ordering),
+            'p': [self._serialize(value) for value in cursor.position],
+        }
+        if cursor.reverse:
+            tokens['r'] = 1
+        encoded = b64encode(json.dumps(tokens, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_field(self, field):
+        return self.model._meta.get_field(field.lstrip('-'))
+
+    @staticmethod
+    def _serialize(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return [
+            instance[field.lstrip('-')] if isinstance(instance, dict)
+            else getattr(instance, field.lstrip('-'))
+            for field in ordering
+        ]
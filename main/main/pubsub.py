@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_broker = None
+
+
+class LocalBroker:
+    """In-process publish/subscribe for async consumers
+
+    Subscribers are asyncio queues on whatever event loop subscribed, and
+    publish() may be called from any thread (sync views and signal
+    receivers run outside the loop under ASGI). A subscriber that stops
+    reading loses its oldest messages once ``max_queued`` are waiting.
+    """
+
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        for subscriber in list(self._subscribers.get(channel, ())):
+            loop, queue = subscriber
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+            except RuntimeError:
+                # The subscriber's event loop closed without unsubscribing
+                self._subscribers.get(channel, set()).discard(subscriber)
+
+    def _deliver(self, queue, message):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.max_queued))
+        self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            subscribers = self._subscribers.get(channel, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+
+class _Receiver(asyncio.DatagramProtocol):
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def datagram_received(self, data, addr):
+        try:
+            channel, message = json.loads(data)
+        except ValueError:
+            logger.warning("Dropped a malformed pub/sub datagram")
+            return
+        LocalBroker.publish(self.broker, channel, message)
+
+
+class SocketBroker(LocalBroker):
+    """LocalBroker shared by the worker processes of one host
+
+    Each process that has subscribers listens on a Unix datagram socket in
+    ``directory`` (PUBSUB_SOCKET_DIR), and publish() sends the message to
+    every socket there, so a write handled by one worker reaches clients
+    connected to another. It stands in for a network broker such as Redis
+    when all workers share a machine; messages must be JSON serializable.
+    """
+
+    def __init__(self, directory=None, max_queued=100):
+        super().__init__(max_queued)
+        self.directory = Path(directory or settings.PUBSUB_SOCKET_DIR)
+        self._transport = None
+
+    def publish(self, channel, message):
+        data = json.dumps([channel, message], cls=DjangoJSONEncoder).encode('utf-8')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            for path in self.directory.glob('*.sock'):
+                try:
+                    sender.sendto(data, str(path))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # The worker that owned this socket has exited
+                    path.unlink(missing_ok=True)
+                except BlockingIOError:
+                    logger.warning("Pub/sub socket %s is full; message dropped", path)
+
+    async def _listen(self):
+        if self._transport is not None and not self._transport.is_closing():
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock'
+        self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _Receiver(self), local_addr=str(path), family=socket.AF_UNIX
+        )
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        await self._listen()
+        async with super().subscribe(channel) as queue:
+            yield queue
+
+
+def get_broker():
+    """The process-wide broker named by the PUBSUB_BROKER setting"""
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'PUBSUB_BROKER', 'main.pubsub.LocalBroker'))()
+    return _broker
@@ -0,0 +1,211 @@
+import operator
+import re
+from functools import reduce
+from django.conf import settings
+from django.db import connections, migrations
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+    """Full-text index over some text columns of a model
+
+    ``scope`` names columns stored alongside the text, such as the owning
+    user, so a backend whose index is a separate table can narrow its
+    matches to ``{column: value}`` before they reach the base table.
+    """
+
+    def install(self, schema_editor, model, fields, scope=()):
+        pass
+
+    def uninstall(self, schema_editor, model, fields, scope=()):
+        pass
+
+    def search(self, queryset, fields, terms, scope=None):
+        raise NotImplementedError
+
+
+class ContainsSearchBackend(BaseSearchBackend):
+    """Fallback with the same semantics as DRF's SearchFilter (icontains)"""
+
+    def search(self, queryset, fields, terms, scope=None):
+        for term in terms:
+            queryset = queryset.filter(reduce(
+                operator.or_,
+                (Q(**{f'{field}__icontains': term}) for field in fields)
+            ))
+        return queryset
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """External-content FTS5 table kept in sync by triggers on the base table
+
+    Triggers rather than model signals keep the index correct for
+    bulk_create(), queryset.update() and raw deletes as well. Scope
+    columns are stored UNINDEXED and compared inside the FTS query, so
+    other users' matches never leave the index.
+
+    Only the base table is indexed: a queryset over another model, such
+    as the history view that also reaches archived rows, is answered by
+    the icontains fallback, with its substring semantics and a scan of
+    the rows the other filters leave.
+    """
+    fallback = ContainsSearchBackend()
+
+    def __init__(self):
+        self._installed = {}
+
+    @staticmethod
+    def index_table(model):
+        return f'{model._meta.db_table}_fts'
+
+    def install(self, schema_editor, model, fields, scope=()):
+        table = model._meta.db_table
+        index = self.index_table(model)
+        columns = ', '.join([*fields, *scope])
+        definitions = ', '.join([*fields, *(f'{column} UNINDEXED' for column in scope)])
+        new_values = ', '.join(f'new.{field}' for field in [*fields, *scope])
+        old_values = ', '.join(f'old.{field}' for field in [*fields, *scope])
+        statements = [
+            f"CREATE VIRTUAL TABLE {index} USING fts5({definitions}, content='{table}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER {index}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {index}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER {index}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER {index}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {index}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            f"INSERT INTO {index}({index}) VALUES ('rebuild')",
+        ]
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    def uninstall(self, schema_editor, model, fields, scope=()):
+        index = self.index_table(model)
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {index}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {index}')
+
+    def is_installed(self, queryset):
+        key = (queryset.db, queryset.model._meta.db_table)
+        if key not in self._installed:
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [self.index_table(queryset.model)]
+                )
+                self._installed[key] = cursor.fetchone() is not None
+        return self._installed[key]
+
+    def search(self, queryset, fields, terms, scope=None):
+        if not self.is_installed(queryset):
+            return self.fallback.search(queryset, fields, terms)
+
+        words = [word for term in terms for word in WORD_RE.findall(term)]
+        if not words:
+            return queryset
+        # Every word must match, as a prefix, in one of the searched columns
+        match = '{%s} : %s' % (
+            ' '.join(fields),
+            ' '.join('"%s"*' % word for word in words)
+        )
+        index = self.index_table(queryset.model)
+        scope = scope or {}
+        conditions = ''.join(f' AND {column} = %s' for column in scope)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {index} WHERE {index} MATCH %s{conditions}',
+            [match, *scope.values()]
+        ))
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """GIN expression index over to_tsvector(), queried with the same expression"""
+    config = 'simple'
+
+    def vector_sql(self, fields):
+        columns = " || ' ' || ".join(f"coalesce({field}, '')" for field in fields)
+        return f"to_tsvector('{self.config}', {columns})"
+
+    @staticmethod
+    def index_name(model):
+        return f'{model._meta.db_table}_fts_idx'
+
+    def install(self, schema_editor, model, fields, scope=()):
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {self.index_name(model)} '
+            f'ON {model._meta.db_table} USING GIN ({self.vector_sql(fields)})'
+        )
+
+    def uninstall(self, schema_editor, model, fields, scope=()):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {self.index_name(model)}')
+
+    def search(self, queryset, fields, terms, scope=None):
+        words = [word for term in terms for word in WORD_RE.findall(term)]
+        if not words:
+            return queryset
+        query = ' & '.join(f'{word}:*' for word in words)
+        return queryset.filter(RawSQL(
+            f"{self.vector_sql(fields)} @@ to_tsquery('{self.config}', %s)",
+            [query],
+            output_field=BooleanField()
+        ))
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backends = {}
+
+
+def get_backend(alias='default'):
+    """Backend from FULL_TEXT_SEARCH_BACKEND, or the default for the database vendor"""
+    if alias not in _backends:
+        path = getattr(settings, 'FULL_TEXT_SEARCH_BACKEND', None)
+        if path:
+            backend_class = import_string(path)
+        else:
+            backend_class = VENDOR_BACKENDS.get(connections[alias].vendor, ContainsSearchBackend)
+        _backends[alias] = backend_class()
+    return _backends[alias]
+
+
+def index_operation(app_label, model_name, fields, scope=(), drop=False):
+    """Migration operation that builds (or, with ``drop``, removes) the full-text index for a model"""
+
+    def forwards(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        get_backend(schema_editor.connection.alias).install(schema_editor, model, fields, scope)
+
+    def backwards(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        get_backend(schema_editor.connection.alias).uninstall(schema_editor, model, fields, scope)
+
+    if drop:
+        return migrations.RunPython(backwards, forwards)
+    return migrations.RunPython(forwards, backwards)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """SearchFilter that answers ?search= from the full-text index
+
+    The indexed models belong to one user each, and their indexes are
+    scoped by user_id, so matches are narrowed to the requesting user.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+
+        fields = [field.lstrip('^=@$') for field in search_fields]
+        return get_backend(queryset.db).search(
+            queryset, fields, search_terms, scope={'user_id': request.user.pk}
+        )
@@ -0,0 +1,101 @@
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+def _identity(value):
+    return value
+
+
+def _display(labels, field):
+    def convert(value):
+        return field.to_representation(labels.get(value, value))
+    return convert
+
+
+class FastReadSerializer:
+    """Read-only rendering of ``.values()`` rows for a ModelSerializer
+
+    Produces the same dicts as ``serializer_class(queryset, many=True).data``
+    without building model instances or walking the serializer field
+    machinery per row. Each output field is resolved once to a database
+    column and a converter; ``get_<field>_display`` sources become lookups
+    in a precomputed choice-label map.
+    """
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.fields = []
+        self.columns = []
+        self.converters = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if source.startswith('get_') and source.endswith('_display'):
+                column = source[len('get_'):-len('_display')]
+                labels = {
+                    key: str(label)
+                    for key, label in model._meta.get_field(column).flatchoices
+                }
+                converter = _display(labels, field)
+            else:
+                column = model._meta.get_field(source).attname
+                converter = self._converter_for(field)
+            self.fields.append(name)
+            self.converters.append((column, converter))
+            if column not in self.columns:
+                self.columns.append(column)
+
+    @staticmethod
+    def _converter_for(field):
+        # Plain strings and choice codes come back from the database as-is
+        if type(field) in (serializers.CharField, serializers.ChoiceField):
+            return _identity
+        if type(field) is serializers.IntegerField:
+            return int
+        if type(field) is serializers.DateField and \
+                getattr(field, 'format', api_settings.DATE_FORMAT).lower() == 'iso-8601':
+            return lambda value: value.isoformat()
+        return field.to_representation
+
+    def to_representation(self, row):
+        return {
+            name: None if row[column] is None else convert(row[column])
+            for name, (column, convert) in zip(self.fields, self.converters)
+        }
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+    def iter_representation(self, rows):
+        to_representation = self.to_representation
+        for row in rows:
+            yield to_representation(row)
+
+
+class FastListMixin:
+    """Serve the list action from ``.values()`` rows through FastReadSerializer"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # One cache per view class, built lazily by get_fast_serializer()
+        cls._fast_serializers = {}
+
+    def get_fast_serializer(self):
+        serializer_class = self.get_serializer_class()
+        if serializer_class not in self._fast_serializers:
+            self._fast_serializers[serializer_class] = FastReadSerializer(serializer_class)
+        return self._fast_serializers[serializer_class]
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_fast_serializer()
+        queryset = self.filter_queryset(self.get_queryset()).values(*reader.columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.serialize(page))
+        return Response(reader.serialize(queryset))
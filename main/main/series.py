@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.db.models import DateField
+from django.db.models.functions import Trunc
+
+BUCKETS = ('day', 'week', 'month', 'quarter')
+
+
+def bucket_expression(field, bucket):
+    """Database-side truncation of ``field`` to the start of its bucket (ISO weeks start Monday)"""
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'")
+    return Trunc(field, bucket, output_field=DateField())
+
+
+def bucket_start(value, bucket):
+    if bucket == 'day':
+        return value
+    if bucket == 'week':
+        return value - timedelta(days=value.weekday())
+    if bucket == 'month':
+        return value.replace(day=1)
+    if bucket == 'quarter':
+        return date(value.year, 3 * ((value.month - 1) // 3) + 1, 1)
+    raise ValueError(f"Unknown bucket '{bucket}'")
+
+
+STEPS = {
+    'day': relativedelta(days=1),
+    'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1),
+    'quarter': relativedelta(months=3),
+}
+
+
+def bucket_range(start_date, end_date, bucket):
+    """Every bucket start between two dates, including empty ones"""
+    current = bucket_start(start_date, bucket)
+    step = STEPS[bucket]
+    while current <= end_date:
+        yield current
+        current += step
+
+
+def bucket_count(start_date, end_date, bucket):
+    days = (end_date - start_date).days
+    return {
+        'day': days + 1,
+        'week': days // 7 + 2,
+        'month': days // 28 + 2,
+        'quarter': days // 90 + 2,
+    }[bucket]
+
+
+def fill_series(rows, start_date, end_date, bucket, breakdown=None, groups=()):
+    """Turn grouped ``{'bucket', 'total', 'count'[, breakdown]}`` rows into a gap-free series
+
+    Only the output periods are walked in Python; the rows themselves are
+    already aggregated per bucket by the database.
+    """
+    totals = {}
+    for row in rows:
+        period = totals.setdefault(row['bucket'], {'total': Decimal('0'), 'count': 0, 'groups': {}})
+        period['total'] += row['total'] or 0
+        period['count'] += row['count'] or 0
+        if breakdown:
+            period['groups'][row[breakdown]] = row['total'] or Decimal('0')
+
+    series = []
+    for period_start in bucket_range(start_date, end_date, bucket):
+        period = totals.get(period_start, {'total': Decimal('0'), 'count': 0, 'groups': {}})
+        point = {
+            'period': period_start,
+            'total': period['total'],
+            'count': period['count'],
+        }
+        if breakdown:
+            point[f'by_{breakdown}'] = {
+                group: period['groups'].get(group, Decimal('0')) for group in groups
+            }
+        series.append(point)
+    return series
+
+
+MAX_BUCKETS = 1100
+
+
+def parse_series_params(params, breakdowns, default_months=12):
+    """Validate ``start_date``, ``end_date``, ``bucket`` and ``breakdown`` query parameters
+
+    Raises ValueError with a message suitable for the API response.
+    """
+    try:
+        end_date = date.fromisoformat(params['end_date']) if params.get('end_date') else date.today()
+        start_date = (
+            date.fromisoformat(params['start_date']) if params.get('start_date')
+            else end_date - relativedelta(months=default_months)
+        )
+    except ValueError:
+        raise ValueError("Invalid date format. Ensure dates are in ISO format (YYYY-MM-DD).")
+    if start_date > end_date:
+        raise ValueError("Start date cannot be later than end date.")
+
+    bucket = params.get('bucket', 'month')
+    if bucket not in BUCKETS:
+        raise ValueError(f"Invalid bucket. Use one of: {', '.join(BUCKETS)}.")
+    if bucket_count(start_date, end_date, bucket) > MAX_BUCKETS:
+        raise ValueError(f"The date range covers more than {MAX_BUCKETS} {bucket} buckets.")
+
+    breakdown = params.get('breakdown') or None
+    if breakdown is not None and breakdown not in breakdowns:
+        raise ValueError(f"Invalid breakdown. Use one of: {', '.join(breakdowns)}.")
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'bucket': bucket,
+        'breakdown': breakdown,
+    }
@@ -129,6 +129,57 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# "analytics" holds per-user responses of the summary actions (see main.cache).
+# Point it at any Django cache backend (e.g. Redis) for multi-process deployments.
+# "data_versions" holds the per-user versions those responses are keyed on; it
+# must be shared by every process (create its table with createcachetable).
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "analytics": {
+        "BACKEND": "main.cache.SizeBoundedLocMemCache",
+        "LOCATION": "analytics",
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+            "MAX_BYTES": 64 * 1024 * 1024,
+        },
+    },
+    "data_versions": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "data_versions",
+        "TIMEOUT": None,
+    },
+}
+
+ANALYTICS_CACHE_ALIAS = "analytics"
+DATA_VERSION_CACHE_ALIAS = "data_versions"
+
+# Dotted path to a main.search backend for ?search= on expenses and income.
+# Left unset, SQLite uses FTS5 and PostgreSQL uses a GIN tsvector index.
+FULL_TEXT_SEARCH_BACKEND = None
+
+# Expenses and income dated more than this many months ago are moved to the
+# archive tables by the archive_old_records command.
+ARCHIVE_HORIZON_MONTHS = 24
+
+# Publish/subscribe broker behind the budget notification stream (see
+# main.pubsub). LocalBroker only reaches clients of the same process; with
+# several ASGI workers on one host use "main.pubsub.SocketBroker", which
+# relays messages through Unix sockets in PUBSUB_SOCKET_DIR.
+PUBSUB_BROKER = "main.pubsub.LocalBroker"
+PUBSUB_SOCKET_DIR = BASE_DIR / "run" / "pubsub"
+
+# Income aggregates are converted to BASE_CURRENCY (or ?currency=) with the
+# dated rates the load_exchange_rates command reads from EXCHANGE_RATES_FILE,
+# a CSV of date,currency,rate rows giving the USD value of one unit.
+BASE_CURRENCY = "USD"
+EXCHANGE_RATES_FILE = BASE_DIR / "data" / "exchange_rates.csv"
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
+from main.cache import get_cache
+
+
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def explain(sql):
+    """Query plan of an already executed statement, as one string"""
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def cache_tables():
+    """Quoted tables of the database cache backends in settings.CACHES"""
+    return tuple(
+        connection.ops.quote_name(caches[alias]._table)
+        for alias in settings.CACHES
+        if isinstance(caches[alias], BaseDatabaseCache)
+    )
+
+
+def index_names(model, fields):
+    """Names of the indexes and unique constraints of ``model`` that lead with ``fields``"""
+    fields = list(fields)
+    names = [
+        index.name for index in model._meta.indexes
+        if list(index.fields[:len(fields)]) == fields
+    ]
+    for constraint in model._meta.constraints:
+        if list(getattr(constraint, 'fields', ())[:len(fields)]) == fields:
+            names.append(constraint.name)
+            if connection.vendor == 'sqlite':
+                # SQLite backs inline UNIQUE constraints with unnamed autoindexes
+                names.append(f'sqlite_autoindex_{model._meta.db_table}')
+    return names
+
+
+class QueryBudgetTestCase(APITestCase):
+    """API test case with query-count and index-usage assertions
+
+    Every request made through ``self.client`` is authenticated as
+    ``self.user``. Savepoint statements and the queries of database cache
+    backends (such as the shared data versions) do not count against a
+    query budget, and the analytics cache is cleared before each test so
+    cached responses from other tests do not hide queries.
+    """
+
+    def setUp(self):
+        super().setUp()
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def executed(captured):
+        tables = cache_tables()
+        return [
+            query['sql'] for query in captured.captured_queries
+            if not query['sql'].startswith(TRANSACTION_CONTROL)
+            and not any(table in query['sql'] for table in tables)
+        ]
+
+    @contextmanager
+    def assertMaxQueries(self, limit):
+        with CaptureQueriesContext(connection) as captured:
+            yield captured
+        executed = self.executed(captured)
+        self.assertLessEqual(
+            len(executed), limit,
+            f"{len(executed)} queries executed, budget is {limit}:\n" + '\n'.join(executed)
+        )
+
+    @contextmanager
+    def assertExactQueries(self, count):
+        """assertNumQueries without the savepoints, for writes whose every query is accounted for"""
+        with CaptureQueriesContext(connection) as captured:
+            yield captured
+        executed = self.executed(captured)
+        self.assertEqual(
+            len(executed), count,
+            f"{len(executed)} queries executed, expected {count}:\n" + '\n'.join(executed)
+        )
+
+    def assertUsesIndex(self, captured, model, fields):
+        """Some SELECT on ``model``'s table in ``captured`` is planned with an index on ``fields``"""
+        names = index_names(model, fields)
+        self.assertTrue(names, f"{model.__name__} has no index leading with {fields}")
+        table = model._meta.db_table
+        plans = [
+            explain(query['sql'])
+            for query in captured.captured_queries
+            if query['sql'].startswith('SELECT') and table in query['sql']
+        ]
+        self.assertTrue(plans, f"No SELECT on {table} was executed")
+        self.assertTrue(
+            any(name in plan for plan in plans for name in names),
+            f"None of {names} used on {table}:\n" + '\n\n'.join(plans)
+        )